@@ -0,0 +1,243 @@
+# aggregation.py - Chart Data Reduction Module
+
+import numpy as np
+from correlation import correlation_matrix, heatmap_matrix, top_pairs
+
+# Output resolution of a 10x6 inch chart at 100 dpi
+PIXEL_WIDTH = 1000
+PIXEL_HEIGHT = 600
+
+# Above this many points a scatter is shown as a density grid
+MAX_SCATTER_POINTS = 5000
+
+
+def histogram(values, bins=30):
+    """Bin counts and edges for a float array that contains no NaN"""
+    counts, edges = np.histogram(values, bins=bins)
+    return counts, edges
+
+
+def minmax_decimate(x, y, buckets=PIXEL_WIDTH):
+    """Keep the minimum and maximum of y in each of ``buckets`` x-ranges
+
+    Preserves every spike a line chart would show at that width while
+    returning at most ``2 * buckets`` points. NaN values must be removed.
+    """
+    n = len(y)
+    if n <= 2 * buckets:
+        return x, y
+
+    size = -(-n // buckets)
+    rows = -(-n // size)
+    padded = np.full(rows * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(rows, size)
+
+    base = np.arange(rows) * size
+    lo = base + np.nanargmin(padded, axis=1)
+    hi = base + np.nanargmax(padded, axis=1)
+    idx = np.unique(np.concatenate([lo, hi]))
+    return x[idx], y[idx]
+
+
+def lttb(x, y, threshold=PIXEL_WIDTH):
+    """Largest-Triangle-Three-Buckets downsampling to ``threshold`` points
+
+    Picks, in each bucket, the point forming the largest triangle with the
+    previously kept point and the next bucket's average, which keeps the
+    visual shape of the series. NaN values must be removed.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    idx = np.empty(threshold, dtype=np.intp)
+    idx[0], idx[-1] = 0, n - 1
+    xf = np.asarray(x, dtype=np.float64)
+
+    prev = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        nxt_stop = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = xf[stop:nxt_stop].mean() if nxt_stop > stop else xf[-1]
+        avg_y = y[stop:nxt_stop].mean() if nxt_stop > stop else y[-1]
+
+        area = np.abs(
+            (xf[prev] - avg_x) * (y[start:stop] - y[prev])
+            - (xf[prev] - xf[start:stop]) * (avg_y - y[prev])
+        )
+        prev = start + int(np.argmax(area))
+        idx[i + 1] = prev
+    return x[idx], y[idx]
+
+
+def density_grid(x, y, bins=(PIXEL_WIDTH // 5, PIXEL_HEIGHT // 5)):
+    """2-D point counts for a density scatter; returns counts, xedges, yedges"""
+    keep = ~(np.isnan(x) | np.isnan(y))
+    return np.histogram2d(x[keep], y[keep], bins=bins)
+
+
+def binned_kde(values, edges, grid_size=512):
+    """Gaussian KDE evaluated on a grid by smoothing a fine histogram
+
+    Cost depends on ``grid_size`` instead of the number of values. The
+    bandwidth follows Scott's rule, as seaborn's default does. Returns
+    ``(grid, density)`` with density integrating to one.
+    """
+    n = len(values)
+    std = values.std(ddof=1) if n > 1 else 0.0
+    if n < 2 or std == 0:
+        return None, None
+
+    bandwidth = std * n ** (-1 / 5)
+    lo, hi = edges[0] - 3 * bandwidth, edges[-1] + 3 * bandwidth
+    counts, fine = np.histogram(values, bins=grid_size, range=(lo, hi))
+    step = fine[1] - fine[0]
+    grid = (fine[:-1] + fine[1:]) / 2
+
+    half = int(np.ceil(4 * bandwidth / step))
+    offsets = np.arange(-half, half + 1) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    smoothed = np.convolve(counts, kernel / kernel.sum(), mode="full")
+    density = smoothed[half : half + grid_size] / (n * step)
+    return grid, density
+
+
+def _floats(values):
+    """JSON-safe list of floats with NaN/inf as None"""
+    values = np.asarray(values, dtype=np.float64)
+    return [float(v) if np.isfinite(v) else None for v in values]
+
+
+def chart_data(df, chart_type, column=None, numeric_columns=None, top_n=10, corr=None):
+    """Pre-aggregated data for drawing a chart in the browser
+
+    Returns a JSON-ready dict whose size depends on the chart resolution,
+    not on the number of rows. ``corr`` may pass an already computed
+    correlation matrix for the correlation chart. Raises ValueError for an
+    unknown chart type.
+    """
+    if chart_type == "correlation":
+        if corr is None:
+            corr = correlation_matrix(df, columns=numeric_columns or None)
+        shown = heatmap_matrix(corr)
+        return {
+            "type": "correlation",
+            "columns": list(shown.columns),
+            "matrix": [_floats(row) for row in shown.to_numpy()],
+            "total_columns": len(corr),
+            "pairs": top_pairs(corr, top_n),
+        }
+
+    if chart_type == "scatter":
+        if not numeric_columns:
+            raise ValueError("No numeric columns")
+        x_col = numeric_columns[0]
+        y_col = numeric_columns[1] if len(numeric_columns) > 1 else x_col
+        x = df[x_col].to_numpy(dtype=np.float64)
+        y = df[y_col].to_numpy(dtype=np.float64)
+        result = {"type": "scatter", "x_column": x_col, "y_column": y_col}
+        if len(x) > MAX_SCATTER_POINTS:
+            counts, xedges, yedges = density_grid(x, y, bins=(100, 60))
+            result.update(
+                {
+                    "mode": "density",
+                    "xedges": _floats(xedges),
+                    "yedges": _floats(yedges),
+                    "counts": counts.T.astype(int).tolist(),
+                }
+            )
+        else:
+            keep = ~(np.isnan(x) | np.isnan(y))
+            result.update(
+                {"mode": "points", "x": _floats(x[keep]), "y": _floats(y[keep])}
+            )
+        return result
+
+    if not column or column not in df.columns:
+        raise ValueError(f"Invalid chart type: {chart_type}")
+    series = df[column]
+
+    if chart_type == "bar":
+        counts = series.value_counts().head(top_n)
+        return {
+            "type": "bar",
+            "column": column,
+            "labels": [str(label) for label in counts.index],
+            "counts": counts.astype(int).tolist(),
+        }
+
+    values = series.dropna().to_numpy(dtype=np.float64)
+
+    if chart_type == "histogram":
+        counts, edges = histogram(values, bins=30)
+        return {
+            "type": "histogram",
+            "column": column,
+            "edges": _floats(edges),
+            "counts": counts.tolist(),
+        }
+
+    if chart_type == "distribution":
+        edges = np.histogram_bin_edges(values, bins="auto")
+        if len(edges) > 201:
+            edges = np.histogram_bin_edges(values, bins=200)
+        counts, edges = histogram(values, bins=edges)
+        grid, density = binned_kde(values, edges, grid_size=256)
+        result = {
+            "type": "distribution",
+            "column": column,
+            "edges": _floats(edges),
+            "counts": counts.tolist(),
+        }
+        if grid is not None:
+            inside = (grid >= edges[0]) & (grid <= edges[-1])
+            scale = len(values) * (edges[1] - edges[0])
+            result["kde"] = {
+                "x": _floats(grid[inside]),
+                "y": _floats(density[inside] * scale),
+            }
+        return result
+
+    if chart_type == "boxplot":
+        if len(values) == 0:
+            raise ValueError(f"No values in column: {column}")
+        q1, median, q3 = np.percentile(values, [25, 50, 75])
+        iqr = q3 - q1
+        inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+        outliers = np.sort(
+            values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+        )
+        outlier_count = len(outliers)
+        if outlier_count > 100:
+            # The most extreme outliers are the ones worth drawing
+            outliers = np.concatenate([outliers[:50], outliers[-50:]])
+        return {
+            "type": "boxplot",
+            "column": column,
+            "count": int(len(values)),
+            "min": float(values.min()),
+            "q1": float(q1),
+            "median": float(median),
+            "q3": float(q3),
+            "max": float(values.max()),
+            "whisker_low": float(inside.min()),
+            "whisker_high": float(inside.max()),
+            "outlier_count": int(outlier_count),
+            "outliers": _floats(outliers),
+        }
+
+    if chart_type == "line":
+        y = series.to_numpy(dtype=np.float64)
+        x = np.arange(len(y))
+        keep = ~np.isnan(y)
+        x, y = lttb(x[keep], y[keep], threshold=PIXEL_WIDTH)
+        return {
+            "type": "line",
+            "column": column,
+            "x": np.asarray(x).astype(int).tolist(),
+            "y": _floats(y),
+        }
+
+    raise ValueError(f"Invalid chart type: {chart_type}")
@@ -1,37 +1,284 @@
 # analyzer.py - Data Analysis Module
 
+import os
 import pandas as pd
 import numpy as np
 import logging
+from cache import dataset_cache, file_key
+from columnar import ColumnarStore
+from csvformat import csv_options
+from correlation import dataset_correlation, top_pairs
+from grouping import cached_aggregate, parse_query, query_columns
+from metrics import timed, count_bytes, count_rows
+from schema import SAMPLE_ROWS, infer_categories, downcast
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Default for DataAnalyzer(optimize=None): load frames in compact dtypes
+OPTIMIZE_DTYPES = os.environ.get("OPTIMIZE_DTYPES", "0") == "1"
+
+def _is_numeric(dtype):
+    """Numeric but not boolean, matching select_dtypes(include=[np.number])"""
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+def _is_categorical(dtype):
+    """Text-like columns: plain object or pandas category"""
+    return dtype == object or isinstance(dtype, pd.CategoricalDtype)
+
+def load_options(optimize=False, dtype=None, usecols=None):
+    """Cache key options for a load; the plain default load has none"""
+    options = ()
+    if optimize:
+        options += ('optimize',)
+    if dtype:
+        options += ('dtype',) + tuple(sorted((col, str(t)) for col, t in dtype.items()))
+    if usecols is not None:
+        options += ('usecols',) + tuple(usecols)
+    return options
+
+def seed_cache(filepath, df, cache=dataset_cache):
+    """Cache a frame parsed elsewhere as the default load of filepath"""
+    if OPTIMIZE_DTYPES:
+        df = downcast(df)
+    cache.put(file_key(filepath, *load_options(OPTIMIZE_DTYPES)), df)
+
+def _describe_sorted(values):
+    """describe() statistics for an already sorted float array without NaN"""
+    count = len(values)
+    if count == 0:
+        return {key: (0.0 if key == 'count' else np.nan)
+                for key in ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']}
+    
+    def quantile(q):
+        # Linear interpolation between closest ranks, as numpy/pandas default
+        pos = (count - 1) * q
+        lo = int(np.floor(pos))
+        hi = min(lo + 1, count - 1)
+        return float(values[lo] + (values[hi] - values[lo]) * (pos - lo))
+    
+    return {
+        'count': float(count),
+        'mean': float(values.mean()),
+        'std': float(values.std(ddof=1)) if count > 1 else np.nan,
+        'min': float(values[0]),
+        '25%': quantile(0.25),
+        '50%': quantile(0.5),
+        '75%': quantile(0.75),
+        'max': float(values[-1])
+    }
+
 class DataAnalyzer:
-    """Main class for data analysis operations"""
+    """Main class for data analysis operations
+    
+    With ``optimize=True`` the frame is loaded in compact dtypes: repetitive
+    string columns (picked from a sample of the file) are parsed straight
+    into category and numbers are downcast where no value changes.
+    ``dtype`` and ``usecols`` are passed on to ``read_csv``; columns with an
+    explicit dtype are never downcast.
+    
+    With ``lazy=True`` only the schema is read up front: column names and
+    dtypes (and the row count) from the columnar copy, or names and dtypes
+    from a sample of the CSV. Columns are loaded on first use through
+    ``frame()``, one ``usecols`` parse or memory map per batch, and are
+    cached per column so later analyzers of the file reuse them. ``df``
+    still works and loads every column.
+    """
     
-    def __init__(self, filepath):
+    def __init__(self, filepath, cache=dataset_cache, optimize=None, dtype=None, usecols=None,
+                 lazy=False):
         self.filepath = filepath
+        self.cache = cache
+        self.optimize = OPTIMIZE_DTYPES if optimize is None else optimize
+        self.dtype = dtype
+        self.usecols = usecols
+        self.lazy = lazy
         self.df = None
+        self._profile = None
+        # Set once the frame no longer matches the file, e.g. after drop_missing()
+        self._modified = False
+        self._schema = None
+        self._columns = {}
         self.load_data()
     
+    @property
+    def df(self):
+        if self._df is None and self._schema is not None:
+            # A lazy analyzer materializes every column on first use of df
+            self._df = self.frame()
+        return self._df
+    
+    @df.setter
+    def df(self, value):
+        self._df = value
+    
+    @property
+    def loaded(self):
+        """Whether the data (or, for a lazy analyzer, its schema) was read"""
+        return self._df is not None or self._schema is not None
+    
+    @property
+    def columns(self):
+        """Column names, without loading any data in lazy mode"""
+        if self._df is None and self._schema is not None:
+            return list(self._schema['columns'])
+        return list(self.df.columns)
+    
+    @property
+    def rows(self):
+        """Row count; a lazy analyzer of a CSV without columnar copy loads one column"""
+        if self._df is None and self._schema is not None:
+            if self._schema['rows'] is None and self._schema['columns']:
+                self.frame(self._schema['columns'][:1])
+            return self._schema['rows'] or 0
+        return len(self.df)
+    
+    @property
+    def dtypes(self):
+        """Column dtypes; unloaded columns of a lazy CSV report their sampled dtype
+        
+        Sampled dtypes are provisional: a column numeric in the first
+        SAMPLE_ROWS rows may turn out to hold text once it is loaded.
+        """
+        if self._df is None and self._schema is not None:
+            dtypes = dict(self._schema['dtypes'])
+            dtypes.update((col, series.dtype) for col, series in self._columns.items())
+            return dtypes
+        return dict(self.df.dtypes.items())
+    
+    @timed('analyzer.load_data')
     def load_data(self):
-        """Load CSV file with error handling"""
+        """Load CSV file with error handling, reusing a cached parse when possible"""
         try:
-            self.df = pd.read_csv(self.filepath)
-            logger.info(f"✓ Data loaded successfully: {self.filepath}")
-            logger.info(f"  Shape: {self.df.shape}")
+            if self.lazy:
+                self._schema = self._read_schema()
+                logger.info("✓ Schema loaded: %s", self.filepath)
+                logger.info("  Columns: %s", len(self._schema['columns']))
+                return True
+            if self.cache is not None:
+                options = load_options(self.optimize, self.dtype, self.usecols)
+                self.df = self.cache.get_or_load(self.filepath, self._read, options)
+            else:
+                self.df = self._read()
+            logger.info("✓ Data loaded successfully: %s", self.filepath)
+            logger.info("  Shape: %s", self.df.shape)
             return True
         except FileNotFoundError:
-            logger.error(f"✗ File not found: {self.filepath}")
+            logger.error("✗ File not found: %s", self.filepath)
             return False
         except pd.errors.EmptyDataError:
             logger.error("✗ File is empty")
             return False
         except Exception as e:
-            logger.error(f"✗ Error loading file: {str(e)}")
+            logger.error("✗ Error loading file: %s", e)
             return False
     
+    def _read(self, usecols=None):
+        """Read from the columnar copy when it is current, else parse the CSV"""
+        usecols = self.usecols if usecols is None else usecols
+        with timed('parse'):
+            store = ColumnarStore.open(self.filepath)
+            if store is not None:
+                logger.info("✓ Using columnar copy: %s", store.path)
+                df = store.to_frame(usecols)
+                count_bytes('columnar', int(df.memory_usage(index=False).sum()))
+                if self.dtype:
+                    df = df.astype({col: t for col, t in self.dtype.items() if col in df.columns})
+            else:
+                options = csv_options(self.filepath)
+                dtype = dict(self.dtype or {})
+                if self.optimize:
+                    for col in infer_categories(self.filepath, options, usecols):
+                        dtype.setdefault(col, 'category')
+                df = pd.read_csv(self.filepath, usecols=usecols, dtype=dtype or None, **options)
+                count_bytes('csv', os.path.getsize(self.filepath))
+            count_rows('parse', len(df))
+        
+        if self.optimize:
+            with timed('downcast'):
+                df = downcast(df, keep=self.dtype or {}, categorize=store is not None)
+        return df
+    
+    def _read_schema(self):
+        store = ColumnarStore.open(self.filepath)
+        if store is not None:
+            dtypes, rows = store.dtypes, store.rows
+        else:
+            sample = pd.read_csv(self.filepath, nrows=SAMPLE_ROWS, usecols=self.usecols,
+                                 **csv_options(self.filepath))
+            dtypes, rows = {col: str(t) for col, t in sample.dtypes.items()}, None
+        if self.usecols is not None:
+            dtypes = {col: t for col, t in dtypes.items() if col in self.usecols}
+        dtypes.update((col, str(t)) for col, t in (self.dtype or {}).items() if col in dtypes)
+        return {
+            'columns': list(dtypes),
+            'dtypes': {col: pd.api.types.pandas_dtype(t) for col, t in dtypes.items()},
+            'rows': rows
+        }
+    
+    def frame(self, columns=None):
+        """DataFrame of the given columns (all by default)
+        
+        A lazy analyzer loads only the columns it has not loaded yet.
+        Raises KeyError for an unknown column.
+        """
+        names = self.columns if columns is None else list(columns)
+        if self._df is not None or not self.lazy:
+            return self.df if columns is None else self.df[names]
+        
+        missing = [col for col in names if col not in self._columns]
+        unknown = set(missing) - set(self._schema['columns'])
+        if unknown:
+            raise KeyError(', '.join(sorted(map(str, unknown))))
+        if missing:
+            self._load_columns(missing)
+        return pd.DataFrame({col: self._columns[col] for col in names}, columns=names, copy=False)
+    
+    def frame_of(self, pick):
+        """frame() of the columns ``pick()`` names, picked again as they load
+        
+        Loading a column of a lazy CSV replaces its sampled dtype with the
+        real one, which can change what a dtype-based pick such as
+        get_numeric_columns() returns, so the columns are re-picked until
+        the pick holds for the loaded dtypes.
+        """
+        columns = pick()
+        while True:
+            df = self.frame(columns)
+            again = pick()
+            if again == columns:
+                return df
+            logger.info("⚠ Sampled dtypes changed on load, re-picking columns")
+            columns = again
+    
+    def _load_columns(self, names):
+        """Load columns from the dataset cache, else read them in one pass"""
+        options = load_options(self.optimize, self.dtype, self.usecols)
+        whole = self.cache.get(file_key(self.filepath, *options)) if self.cache is not None else None
+        
+        todo = []
+        for col in names:
+            if whole is not None:
+                self._columns[col] = whole[col]
+                continue
+            cached = None
+            if self.cache is not None:
+                cached = self.cache.get(file_key(self.filepath, *options, 'column', col))
+            if cached is None:
+                todo.append(col)
+            else:
+                self._columns[col] = cached[col]
+        
+        if todo:
+            df = self._read(usecols=todo)
+            for col in todo:
+                self._columns[col] = df[col]
+                if self.cache is not None:
+                    self.cache.put(file_key(self.filepath, *options, 'column', col), df[[col]])
+            logger.info("✓ Loaded %s of %s columns", len(todo), len(self._schema['columns']))
+        if self._schema['rows'] is None:
+            self._schema['rows'] = len(self._columns[names[0]])
+    
+    @timed('analyzer.get_overview')
     def get_overview(self):
         """Get comprehensive data overview"""
         if self.df is None:
@@ -47,65 +294,110 @@ class DataAnalyzer:
                 'duplicate_rows': int(self.df.duplicated().sum()),
                 'memory_usage': f"{self.df.memory_usage(deep=True).sum() / 1024:.2f} KB"
             }
-            logger.info("✓ Overview generated")
+            logger.debug("✓ Overview generated")
             return overview
         except Exception as e:
-            logger.error(f"✗ Error generating overview: {str(e)}")
+            logger.error("✗ Error generating overview: %s", e)
             return None
     
+    @timed('analyzer.get_statistics')
     def get_statistics(self):
         """Get descriptive statistics for numeric columns"""
         try:
             stats = self.df.describe().to_dict()
-            logger.info("✓ Statistics calculated")
+            logger.debug("✓ Statistics calculated")
             return stats
         except Exception as e:
-            logger.error(f"✗ Error calculating statistics: {str(e)}")
+            logger.error("✗ Error calculating statistics: %s", e)
             return None
     
-    def get_correlation(self):
+    @timed('analyzer.correlation_matrix')
+    def correlation_matrix(self, method='pearson'):
+        """Correlation matrix of the numeric columns as a DataFrame
+        
+        Shared through the dataset cache with every other user of this
+        version of the file, unless the frame has been modified since loading.
+        """
+        cache = None if self._modified else self.cache
+        options = load_options(dtype=self.dtype, usecols=self.usecols)
+        df = self.frame_of(self.get_numeric_columns)
+        return dataset_correlation(self.filepath, df, method, cache, options)
+    
+    def get_correlation(self, method='pearson'):
         """Get correlation matrix for numeric columns"""
         try:
-            numeric_df = self.df.select_dtypes(include=[np.number])
-            if numeric_df.empty:
+            if not self.get_numeric_columns():
                 logger.warning("⚠ No numeric columns found")
                 return None
             
-            corr = numeric_df.corr().to_dict()
-            logger.info("✓ Correlation matrix calculated")
+            corr = self.correlation_matrix(method).to_dict()
+            logger.debug("✓ Correlation matrix calculated")
             return corr
         except Exception as e:
-            logger.error(f"✗ Error calculating correlation: {str(e)}")
+            logger.error("✗ Error calculating correlation: %s", e)
+            return None
+    
+    def get_top_correlations(self, n=10, method='pearson'):
+        """The n most strongly correlated pairs of numeric columns"""
+        try:
+            return top_pairs(self.correlation_matrix(method), n)
+        except Exception as e:
+            logger.error("✗ Error ranking correlations: %s", e)
             return None
     
+    @timed('analyzer.aggregate')
+    def aggregate(self, query):
+        """Group-by aggregation of the frame, cached per file version and query
+        
+        See grouping.aggregate() for the query format. Raises ValueError
+        for an invalid query.
+        """
+        cache = None if self._modified else self.cache
+        options = load_options(dtype=self.dtype, usecols=self.usecols)
+        query = parse_query(query)
+        df = self.frame([col for col in query_columns(query) if col in self.columns])
+        return cached_aggregate(self.filepath, df, query, cache, options)
+    
+    @timed('analyzer.pivot')
+    def pivot(self, index, columns, values, aggregation='mean'):
+        """Pivot table of one aggregation of ``values`` by ``index`` and ``columns``"""
+        return self.aggregate({
+            'by': index,
+            'pivot': columns,
+            'aggregations': {values: [aggregation]}
+        })
+    
+    @timed('analyzer.get_head')
     def get_head(self, n=5):
         """Get first n rows"""
         try:
             head = self.df.head(n).to_dict(orient='records')
-            logger.info(f"✓ First {n} rows retrieved")
+            logger.debug("✓ First %s rows retrieved", n)
             return head
         except Exception as e:
-            logger.error(f"✗ Error getting head: {str(e)}")
+            logger.error("✗ Error getting head: %s", e)
             return None
     
+    @timed('analyzer.get_tail')
     def get_tail(self, n=5):
         """Get last n rows"""
         try:
             tail = self.df.tail(n).to_dict(orient='records')
-            logger.info(f"✓ Last {n} rows retrieved")
+            logger.debug("✓ Last %s rows retrieved", n)
             return tail
         except Exception as e:
-            logger.error(f"✗ Error getting tail: {str(e)}")
+            logger.error("✗ Error getting tail: %s", e)
             return None
     
+    @timed('analyzer.get_column_stats')
     def get_column_stats(self, column):
         """Get detailed stats for specific column"""
         try:
-            if column not in self.df.columns:
-                logger.warning(f"⚠ Column not found: {column}")
+            if column not in self.columns:
+                logger.warning("⚠ Column not found: %s", column)
                 return None
             
-            col_data = self.df[column]
+            col_data = self.frame([column])[column]
             stats = {
                 'unique': int(col_data.nunique()),
                 'null_count': int(col_data.isnull().sum()),
@@ -113,52 +405,118 @@ class DataAnalyzer:
                 'dtype': str(col_data.dtype),
                 'value_counts': col_data.value_counts().head(10).to_dict()
             }
-            logger.info(f"✓ Stats for column '{column}' retrieved")
+            logger.debug("✓ Stats for column '%s' retrieved", column)
             return stats
         except Exception as e:
-            logger.error(f"✗ Error getting column stats: {str(e)}")
+            logger.error("✗ Error getting column stats: %s", e)
             return None
     
     def get_numeric_columns(self):
         """Get list of numeric columns"""
         try:
-            cols = self.df.select_dtypes(include=[np.number]).columns.tolist()
-            logger.info(f"✓ Found {len(cols)} numeric columns")
+            cols = [col for col, dtype in self.dtypes.items() if _is_numeric(dtype)]
+            logger.debug("✓ Found %s numeric columns", len(cols))
             return cols
         except Exception as e:
-            logger.error(f"✗ Error getting numeric columns: {str(e)}")
+            logger.error("✗ Error getting numeric columns: %s", e)
             return []
     
     def get_categorical_columns(self):
         """Get list of categorical columns"""
         try:
-            cols = self.df.select_dtypes(include=['object']).columns.tolist()
-            logger.info(f"✓ Found {len(cols)} categorical columns")
+            cols = [col for col, dtype in self.dtypes.items() if _is_categorical(dtype)]
+            logger.debug("✓ Found %s categorical columns", len(cols))
             return cols
         except Exception as e:
-            logger.error(f"✗ Error getting categorical columns: {str(e)}")
+            logger.error("✗ Error getting categorical columns: %s", e)
             return []
     
+    @timed('analyzer.profile')
+    def profile(self, n=10):
+        """Compute everything the analysis page needs in one pass per column
+        
+        Returns the overview, descriptive statistics, head/tail previews and
+        column groupings together. Each column's null mask is computed once
+        and its non-null values are sorted once; count, mean, std, min, max
+        and the quartiles are all read off that sorted array.
+        """
+        if self.df is None:
+            return None
+        if self._profile is not None and self._profile[0] == n:
+            return self._profile[1]
+        
+        try:
+            df = self.df
+            dtypes, missing, statistics = {}, {}, {}
+            numeric, categorical = [], []
+            memory = int(df.index.memory_usage(deep=True))
+            
+            for col in df.columns:
+                series = df[col]
+                mask = series.isnull().to_numpy()
+                dtypes[col] = str(series.dtype)
+                missing[col] = int(mask.sum())
+                memory += int(series.memory_usage(index=False, deep=True))
+                
+                if _is_numeric(series.dtype):
+                    numeric.append(col)
+                    values = np.sort(series.to_numpy(dtype=np.float64)[~mask])
+                    statistics[col] = _describe_sorted(values)
+                elif _is_categorical(series.dtype):
+                    categorical.append(col)
+            
+            if not numeric:
+                statistics = df.describe().to_dict()
+            
+            result = {
+                'overview': {
+                    'rows': int(df.shape[0]),
+                    'columns': int(df.shape[1]),
+                    'column_names': list(df.columns),
+                    'dtypes': dtypes,
+                    'missing_values': missing,
+                    'duplicate_rows': int(df.duplicated().sum()),
+                    'memory_usage': f"{memory / 1024:.2f} KB"
+                },
+                'statistics': statistics,
+                'head': df.head(n).to_dict(orient='records'),
+                'tail': df.tail(n).to_dict(orient='records'),
+                'numeric_columns': numeric,
+                'categorical_columns': categorical
+            }
+            self._profile = (n, result)
+            logger.info("✓ Profile generated")
+            return result
+        except Exception as e:
+            logger.error("✗ Error generating profile: %s", e)
+            return None
+    
+    @timed('analyzer.drop_missing')
     def drop_missing(self):
         """Remove rows with missing values"""
         try:
             before = len(self.df)
             self.df = self.df.dropna()
+            self._profile = None
+            self._modified = True
             after = len(self.df)
-            logger.info(f"✓ Dropped {before - after} rows with missing values")
+            logger.info("✓ Dropped %s rows with missing values", before - after)
             return before - after
         except Exception as e:
-            logger.error(f"✗ Error dropping missing values: {str(e)}")
+            logger.error("✗ Error dropping missing values: %s", e)
             return 0
     
+    @timed('analyzer.drop_duplicates')
     def drop_duplicates(self):
         """Remove duplicate rows"""
         try:
             before = len(self.df)
             self.df = self.df.drop_duplicates()
+            self._profile = None
+            self._modified = True
             after = len(self.df)
-            logger.info(f"✓ Dropped {before - after} duplicate rows")
+            logger.info("✓ Dropped %s duplicate rows", before - after)
             return before - after
         except Exception as e:
-            logger.error(f"✗ Error dropping duplicates: {str(e)}")
+            logger.error("✗ Error dropping duplicates: %s", e)
             return 0
\ No newline at end of file
@@ -1,27 +1,104 @@
-from flask import Flask, render_template, request, jsonify
+from flask import (
+    Flask,
+    Response,
+    render_template,
+    request,
+    jsonify,
+    g,
+    stream_with_context,
+)
 from werkzeug.utils import secure_filename
 import os
+import json
 import logging
-from analyzer import DataAnalyzer
-from visualizer import DataVisualizer
+import functools
+from analyzer import DataAnalyzer, seed_cache
+from cache import dataset_cache, chart_cache, remember_content_hash
+from render_pool import RenderPool, RenderPoolBusy, RENDER_WORKERS, chart_columns
+from aggregation import chart_data
+from jobs import JobManager, JobQueueFull
+from ingest import ingest_upload
+from incremental import SummaryStore, append_rows
+from rows import read_window, column_arrays, dumps
+from columnar import ColumnarStore
+from correlation import METHODS, top_pairs
+from grouping import parse_query
+from column_index import ColumnIndex, index_columns
+from streaming import StreamingAnalyzer
+from visualizer import load_plotting, IMAGE_FORMATS, MIMETYPES, CHART_FORMAT
+from logconfig import configure_logging
+from flask.json.provider import DefaultJSONProvider
+from httpcache import (
+    dataset_validators,
+    fresh_etag,
+    set_validators,
+    compress,
+    CONTENT_ADDRESSED,
+    IMMUTABLE,
+)
+from metrics import (
+    registry,
+    timed,
+    cache_collector,
+    RequestTrace,
+    SLOW_REQUEST_SECONDS,
+    PROFILE_SLOW_REQUESTS,
+    PROFILE_DIR,
+)
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, with serialization timed as a request stage"""
+
+    def dumps(self, obj, **kwargs):
+        with timed("serialize"):
+            return super().dumps(obj, **kwargs)
+
+
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 
 # Configuration
 UPLOAD_FOLDER = "uploads"
+CHART_FOLDER = "static/images"
 ALLOWED_EXTENSIONS = {"csv"}
-MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
+MAX_BATCH_CHARTS = 20
+MAX_PAGE_ROWS = 1000
+MAX_AGGREGATE_ROWS = 10000
+# Files larger than this are analyzed in chunks instead of loaded whole
+STREAMING_THRESHOLD = int(os.environ.get("STREAMING_THRESHOLD", 64 * 1024 * 1024))
+# Uploads are streamed to disk, so this only bounds disk use; it must stay
+# above STREAMING_THRESHOLD for large files to reach the streaming path
+MAX_FILE_SIZE = int(os.environ.get("MAX_FILE_SIZE", 4 * 1024**3))  # 4GB
+if MAX_FILE_SIZE <= STREAMING_THRESHOLD:
+    logger.warning(
+        "⚠ MAX_FILE_SIZE (%s) is not above STREAMING_THRESHOLD (%s); "
+        "large files will be rejected before they can be streamed",
+        MAX_FILE_SIZE,
+        STREAMING_THRESHOLD,
+    )
+# Load the plotting libraries at import, e.g. in a pre-fork server's master
+PREWARM = os.environ.get("PREWARM", "0") == "1"
 
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+app.config["CHART_FOLDER"] = CHART_FOLDER
 app.config["MAX_CONTENT_LENGTH"] = MAX_FILE_SIZE
+app.config["STREAMING_THRESHOLD"] = STREAMING_THRESHOLD
+app.config["RENDER_WORKERS"] = RENDER_WORKERS
+app.config["SLOW_REQUEST_SECONDS"] = SLOW_REQUEST_SECONDS
+app.config["PROFILE_SLOW_REQUESTS"] = PROFILE_SLOW_REQUESTS
+app.config["PROFILE_DIR"] = PROFILE_DIR
+
+registry.register_collector(cache_collector("dataset", dataset_cache))
+registry.register_collector(cache_collector("chart", chart_cache))
 
 # Create necessary directories
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs("static/images", exist_ok=True)
+os.makedirs(CHART_FOLDER, exist_ok=True)
 
 logger.info("✓ App initialized successfully")
 
@@ -31,11 +108,207 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def upload_path(filename):
+    """Path of an uploaded dataset, or None when there is no such file"""
+    with timed("resolve"):
+        filepath = os.path.join(app.config["UPLOAD_FOLDER"], secure_filename(filename))
+        return filepath if os.path.exists(filepath) else None
+
+
+def conditional(view):
+    """Answer GET requests for a dataset with 304 when the client's copy is current
+
+    The ETag hashes the dataset's content with the request path and query
+    string, so it is checked before the view runs. Successful responses
+    carry the ETag and Last-Modified and must be revalidated before reuse.
+    """
+
+    @functools.wraps(view)
+    def wrapper(filename, **kwargs):
+        filepath = upload_path(filename)
+        if filepath is None:
+            return view(filename, **kwargs)
+        with timed("validate"):
+            etag, last_modified = dataset_validators(filepath, request.full_path)
+        current = fresh_etag(request, etag, last_modified)
+        if current is not None:
+            logger.debug("✓ Not modified: %s", request.path)
+            return set_validators(Response(status=304), current, last_modified)
+
+        response = app.make_response(view(filename, **kwargs))
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+        return response
+
+    return wrapper
+
+
+_render_pool = None
+job_manager = JobManager()
+
+
+def get_render_pool():
+    """Return the process-wide render pool, created from app config on first use"""
+    global _render_pool
+    workers = app.config["RENDER_WORKERS"]
+    if _render_pool is None or _render_pool.workers != workers:
+        if _render_pool is not None:
+            _render_pool.shutdown()
+        _render_pool = RenderPool(workers=workers)
+    return _render_pool
+
+
+def prewarm(start_pool=True):
+    """Pay the plotting import and renderer start-up before traffic arrives
+
+    Meant for server hooks: call with ``start_pool=False`` in a pre-fork
+    master, so forked workers share the imported modules, and with the
+    default in each worker to also spawn its renderer processes.
+    """
+    load_plotting()
+    if start_pool:
+        get_render_pool().start()
+    logger.info("✓ App pre-warmed")
+
+
+def get_chart_data(filepath, chart_type, column):
+    """Aggregated chart data for client-side rendering, cached per dataset version"""
+
+    def build():
+        analyzer = DataAnalyzer(filepath, lazy=True)
+        if not analyzer.loaded:
+            raise ValueError("Failed to load data")
+        corr = analyzer.correlation_matrix() if chart_type == "correlation" else None
+        df = analyzer.frame_of(lambda: chart_columns(analyzer, chart_type, column))
+        return chart_data(
+            df, chart_type, column, analyzer.get_numeric_columns(), corr=corr
+        )
+
+    return dataset_cache.get_or_load(
+        filepath, build, options=("chart-data", chart_type, column)
+    )
+
+
+def open_analyzer(filepath):
+    """Load small files into memory and summarize large ones chunk by chunk
+
+    Summaries of large files are kept on disk, so each version of a file
+    is streamed at most once.
+    """
+    if os.path.getsize(filepath) > app.config["STREAMING_THRESHOLD"]:
+        logger.info("Streaming large file: %s", filepath)
+        return SummaryStore.load_or_build(filepath)
+    return DataAnalyzer(filepath)
+
+
+def analyzer_loaded(analyzer):
+    """Check whether an analyzer from open_analyzer() holds data"""
+    if isinstance(analyzer, StreamingAnalyzer):
+        return analyzer.loaded
+    return analyzer.df is not None
+
+
+def get_column_index(filepath, column):
+    """Index of one column, built from that column alone if missing or stale"""
+    index = ColumnIndex.open(filepath, column)
+    if index is None:
+        analyzer = DataAnalyzer(filepath, cache=None, usecols=[column])
+        if analyzer.df is None:
+            return None
+        index = ColumnIndex.build(filepath, column, analyzer.df[column])
+    return index
+
+
+def take_rows(filepath, row_ids):
+    """Records of the given rows, or None if that needs a full load of a large file"""
+    store = ColumnarStore.open(filepath)
+    if store is not None:
+        frame = store.take(row_ids)
+    elif os.path.getsize(filepath) <= app.config["STREAMING_THRESHOLD"]:
+        analyzer = DataAnalyzer(filepath)
+        if analyzer.df is None:
+            return None
+        frame = analyzer.df.iloc[row_ids]
+    else:
+        return None
+    return frame.to_dict(orient="records")
+
+
+def get_profile(filepath, analyzer=None, approximate=False):
+    """Analysis page data for filepath, cached per dataset version
+
+    ``approximate`` answers from the stored sketches, with error bounds,
+    instead of loading the data.
+    """
+
+    def build():
+        if approximate:
+            loaded = SummaryStore.load_or_build(filepath)
+            if not loaded.loaded:
+                raise ValueError("Failed to load data")
+            return loaded.approximate_profile(10)
+        loaded = analyzer or open_analyzer(filepath)
+        if not analyzer_loaded(loaded):
+            raise ValueError("Failed to load data")
+        return loaded.profile(10)
+
+    kind = "approx-profile" if approximate else "profile"
+    return dataset_cache.get_or_load(filepath, build, options=(kind, 10))
+
+
+def analyze_upload(job, filepath, filename, chart_folder=None, analyzer=None):
+    """Parse, convert and profile an uploaded file, optionally pre-rendering charts
+
+    ``job`` receives progress reports and may be None. ``analyzer`` may
+    carry summaries already streamed during the upload. Raises ValueError
+    if the file cannot be loaded. Returns the upload response payload.
+    """
+    progress = job.progress if job else (lambda stage, percent: None)
+
+    progress("parsing", 10)
+    analyzer = analyzer or open_analyzer(filepath)
+    if not analyzer_loaded(analyzer):
+        raise ValueError("Failed to load data")
+
+    # Later loads memory-map this copy instead of re-parsing the CSV
+    if ColumnarStore.open(filepath) is None:
+        progress("converting", 30)
+        if isinstance(analyzer, DataAnalyzer):
+            ColumnarStore.convert(filepath, analyzer.df)
+            progress("indexing", 40)
+            index_columns(filepath, analyzer.df)
+        else:
+            # Large files are converted chunk by chunk; their column
+            # indexes are built from the copy on first use
+            ColumnarStore.convert_chunks(filepath, analyzer.dtypes, analyzer.rows)
+
+    progress("profiling", 55)
+    profile = get_profile(filepath, analyzer)
+    overview = profile["overview"]
+    logger.info(
+        "✓ Analysis completed: %s rows, %s columns",
+        overview["rows"],
+        overview["columns"],
+    )
+    result = {"status": "success", "filename": filename, "overview": overview}
+
+    if chart_folder:
+        progress("rendering", 75)
+        specs = [("correlation", None)]
+        specs += [("histogram", col) for col in profile["numeric_columns"][:3]]
+        rendered = get_render_pool().render_many(
+            filepath, filename, specs, chart_folder
+        )
+        result["charts"] = [chart for _, chart, _ in rendered if chart]
+
+    return result
+
+
 @app.route("/")
 def index():
     """Home page"""
     logger.info("GET / - Home page accessed")
-    return render_template("index.html")
+    return render_template("index.html", max_file_size=app.config["MAX_CONTENT_LENGTH"])
 
 
 @app.route("/upload", methods=["POST"])
@@ -54,70 +327,130 @@ def upload_file():
             return jsonify({"error": "No file selected"}), 400
 
         if not allowed_file(file.filename):
-            logger.warning(f"⚠ Invalid file type: {file.filename}")
+            logger.warning("⚠ Invalid file type: %s", file.filename)
             return jsonify({"error": "Only CSV files allowed"}), 400
 
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(filepath)
+        return accept_upload(file.stream, secure_filename(file.filename))
 
-        logger.info(f"✓ File uploaded: {filename}")
+    except Exception as e:
+        logger.error("✗ Upload error: %s", e)
+        return jsonify({"error": str(e)}), 400
 
-        # Analyze data
-        analyzer = DataAnalyzer(filepath)
-        if analyzer.df is None:
-            logger.error("✗ Failed to load data")
-            return jsonify({"error": "Failed to load data"}), 400
 
-        overview = analyzer.get_overview()
+@app.route("/upload/<filename>", methods=["PUT"])
+def upload_stream(filename):
+    """Handle a raw CSV request body, parsed while it arrives"""
+    logger.info("PUT /upload/%s - Streaming upload initiated", filename)
 
-        logger.info(
-            f"✓ Analysis completed: {overview['rows']} rows, {overview['columns']} columns"
-        )
+    try:
+        if not allowed_file(filename):
+            logger.warning("⚠ Invalid file type: %s", filename)
+            return jsonify({"error": "Only CSV files allowed"}), 400
 
-        return jsonify(
-            {"status": "success", "filename": filename, "overview": overview}
-        )
+        return accept_upload(request.stream, secure_filename(filename))
 
     except Exception as e:
-        logger.error(f"✗ Upload error: {str(e)}")
+        logger.error("✗ Upload error: %s", e)
         return jsonify({"error": str(e)}), 400
 
 
+def accept_upload(stream, filename):
+    """Store an upload stream and answer with its analysis or a job id
+
+    With ``async=1`` the analysis runs in the background and the response
+    carries a job id to poll at ``/api/jobs/<job_id>``.
+    """
+    filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
+    upload = ingest_upload(stream, filepath, app.config["STREAMING_THRESHOLD"])
+    # Validators of responses about this file hash its content; reuse the
+    # hash computed while storing it
+    remember_content_hash(filepath, upload.sha256)
+    if not upload.unchanged:
+        dataset_cache.invalidate(filepath)
+        chart_cache.invalidate(filepath)
+        ColumnarStore.remove(filepath)
+        ColumnIndex.remove(filepath)
+        SummaryStore.remove(filepath)
+    if upload.frame is not None:
+        # The frame parsed during the upload is the parse a reload would produce
+        seed_cache(filepath, upload.frame)
+    if upload.analyzer is not None:
+        SummaryStore.save(filepath, upload.analyzer)
+
+    logger.info("✓ File uploaded: %s", filename)
+
+    if request.values.get("async") in ("1", "true"):
+        try:
+            job_id = job_manager.submit(
+                analyze_upload,
+                filepath,
+                filename,
+                app.config["CHART_FOLDER"],
+                upload.analyzer,
+            )
+        except JobQueueFull:
+            logger.warning("⚠ Analysis queue full")
+            return jsonify({"error": "Server busy, try again"}), 503
+        return (
+            jsonify(
+                {
+                    "status": "accepted",
+                    "filename": filename,
+                    "job_id": job_id,
+                    "status_url": f"/api/jobs/{job_id}",
+                }
+            ),
+            202,
+        )
+
+    # Analyze data
+    try:
+        return jsonify(
+            analyze_upload(None, filepath, filename, analyzer=upload.analyzer)
+        )
+    except ValueError:
+        logger.error("✗ Failed to load data")
+        return jsonify({"error": "Failed to load data"}), 400
+
+
 @app.route("/analysis/<filename>")
+@conditional
 def analysis(filename):
-    """Get data analysis"""
-    logger.info(f"GET /analysis/{filename}")
+    """Get data analysis; ``?mode=approx`` serves sketch estimates with error bounds"""
+    logger.info("GET /analysis/%s", filename)
 
     try:
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], secure_filename(filename))
+        filepath = upload_path(filename)
 
-        if not os.path.exists(filepath):
-            logger.warning(f"⚠ File not found: {filename}")
+        if filepath is None:
+            logger.warning("⚠ File not found: %s", filename)
             return jsonify({"error": "File not found"}), 404
 
-        analyzer = DataAnalyzer(filepath)
-
-        analysis_data = {
-            "overview": analyzer.get_overview(),
-            "statistics": analyzer.get_statistics(),
-            "head": analyzer.get_head(10),
-            "tail": analyzer.get_tail(10),
-            "numeric_columns": analyzer.get_numeric_columns(),
-            "categorical_columns": analyzer.get_categorical_columns(),
-        }
+        approximate = request.args.get("mode") == "approx"
+        try:
+            analysis_data = get_profile(filepath, approximate=approximate)
+        except ValueError:
+            logger.error("✗ Failed to load data")
+            return jsonify({"error": "Failed to load data"}), 400
 
         logger.info("✓ Analysis data retrieved")
         return render_template("analysis.html", data=analysis_data, filename=filename)
 
     except Exception as e:
-        logger.error(f"✗ Analysis error: {str(e)}")
+        logger.error("✗ Analysis error: %s", e)
         return jsonify({"error": str(e)}), 400
 
 
 @app.route("/api/visualize", methods=["POST"])
 def api_visualize():
-    """API endpoint for visualizations"""
+    """API endpoint for visualizations
+
+    By default renders an image and returns its file name; ``image_format``
+    picks png, webp, jpg or svg (``"format": "image"`` is the same). With
+    ``"format": "bytes"`` the image is returned as the response body
+    without being stored, and with ``"format": "data"`` the aggregated plot
+    data is returned as JSON, for the browser to draw.
+    """
     logger.info("POST /api/visualize")
 
     try:
@@ -125,81 +458,518 @@ def api_visualize():
         filename = data.get("filename")
         chart_type = data.get("chart_type")
         column = data.get("column")
+        image_format = data.get("image_format", CHART_FORMAT)
+        if image_format not in IMAGE_FORMATS:
+            return jsonify({"error": "Invalid image format"}), 400
+        in_memory = data.get("format") == "bytes"
 
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], secure_filename(filename))
+        filepath = upload_path(filename)
 
-        if not os.path.exists(filepath):
-            logger.warning(f"⚠ File not found: {filename}")
+        if filepath is None:
+            logger.warning("⚠ File not found: %s", filename)
             return jsonify({"error": "File not found"}), 404
 
-        analyzer = DataAnalyzer(filepath)
-        visualizer = DataVisualizer(analyzer.df)
+        if data.get("format") == "data":
+            try:
+                payload = get_chart_data(filepath, chart_type, column)
+            except ValueError:
+                logger.warning("⚠ Invalid chart type or missing column: %s", chart_type)
+                return jsonify({"error": "Invalid chart type"}), 400
+            logger.info("✓ Chart data served: %s", chart_type)
+            return jsonify({"status": "success", "data": payload})
+
+        try:
+            chart_file = get_render_pool().render(
+                filepath,
+                filename,
+                chart_type,
+                column,
+                None if in_memory else app.config["CHART_FOLDER"],
+                image_format,
+            )
+        except RenderPoolBusy:
+            logger.warning("⚠ Render queue full")
+            return jsonify({"error": "Server busy, try again"}), 503
+        except TimeoutError:
+            logger.error("✗ Chart render timed out: %s", chart_type)
+            return jsonify({"error": "Chart generation timed out"}), 504
+        except ValueError:
+            logger.warning("⚠ Invalid chart type or missing column: %s", chart_type)
+            return jsonify({"error": "Invalid chart type"}), 400
+
+        if not chart_file:
+            logger.error("✗ Chart generation failed")
+            return jsonify({"error": "Chart generation failed"}), 400
+
+        if in_memory:
+            mimetype = MIMETYPES[IMAGE_FORMATS[image_format]]
+            return Response(chart_file, mimetype=mimetype)
+
+        logger.info("✓ Chart created: %s", chart_file)
+        return jsonify({"status": "success", "chart": chart_file})
+
+    except Exception as e:
+        logger.error("✗ Visualization error: %s", e)
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/visualize/batch", methods=["POST"])
+def api_visualize_batch():
+    """Render several charts for one dataset in a single request
+
+    Body: ``{"filename": ..., "charts": [{"chart_type": ..., "column": ...}],
+    "stream": false, "image_format": "png"}``. With ``stream`` set, results are sent as
+    newline-delimited JSON in completion order; otherwise one JSON document
+    lists them in request order.
+    """
+    logger.info("POST /api/visualize/batch")
+
+    try:
+        data = request.json
+        filename = data.get("filename")
+        charts = data.get("charts") or []
+
+        if not isinstance(charts, list) or not charts:
+            return jsonify({"error": "No charts requested"}), 400
+        if len(charts) > MAX_BATCH_CHARTS:
+            return jsonify({"error": f"At most {MAX_BATCH_CHARTS} charts"}), 400
+
+        image_format = data.get("image_format", CHART_FORMAT)
+        if image_format not in IMAGE_FORMATS:
+            return jsonify({"error": "Invalid image format"}), 400
+
+        filepath = upload_path(filename)
 
-        chart_file = None
+        if filepath is None:
+            logger.warning("⚠ File not found: %s", filename)
+            return jsonify({"error": "File not found"}), 404
+
+        specs = [(spec.get("chart_type"), spec.get("column")) for spec in charts]
+        results = get_render_pool().render_many(
+            filepath, filename, specs, app.config["CHART_FOLDER"], image_format
+        )
 
-        if chart_type == "histogram" and column:
-            chart_file = visualizer.histogram(column, f"hist_{filename}_{column}.png")
+        def describe(index, chart_file, error):
+            chart_type, column = specs[index]
+            result = {"index": index, "chart_type": chart_type, "column": column}
+            if chart_file:
+                result.update({"status": "success", "chart": chart_file})
+            else:
+                result["error"] = error or "Chart generation failed"
+            return result
 
-        elif chart_type == "scatter" and analyzer.get_numeric_columns():
-            cols = analyzer.get_numeric_columns()
-            chart_file = visualizer.scatter_plot(
-                cols[0],
-                cols[1] if len(cols) > 1 else cols[0],
-                f"scatter_{filename}.png",
+        if data.get("stream"):
+
+            def generate():
+                for outcome in results:
+                    yield json.dumps(describe(*outcome)) + "\n"
+
+            return Response(
+                stream_with_context(generate()), mimetype="application/x-ndjson"
             )
 
-        elif chart_type == "correlation":
-            chart_file = visualizer.correlation_heatmap(f"heatmap_{filename}.png")
+        ordered = sorted(
+            (describe(*outcome) for outcome in results), key=lambda r: r["index"]
+        )
+        logger.info("✓ Batch rendered: %s charts", len(ordered))
+        return jsonify({"status": "success", "charts": ordered})
+
+    except Exception as e:
+        logger.error("✗ Batch visualization error: %s", e)
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/columns/<filename>/<column>/stats")
+@conditional
+def api_column_stats(filename, column):
+    """Stats for one column; ``?mode=approx`` answers from sketches with error bounds
+
+    Exact stats come from the column index, so they never load the other
+    columns.
+    """
+    logger.info("GET /api/columns/%s/%s/stats", filename, column)
+
+    try:
+        filepath = upload_path(filename)
+        if filepath is None:
+            logger.warning("⚠ File not found: %s", filename)
+            return jsonify({"error": "File not found"}), 404
+
+        if request.args.get("mode") == "approx":
+            analyzer = SummaryStore.load_or_build(filepath)
+            if not analyzer.loaded:
+                logger.error("✗ Failed to load data")
+                return jsonify({"error": "Failed to load data"}), 400
+            mode, stats = "approx", analyzer.column_summary(column)
+        else:
+            index = get_column_index(filepath, column)
+            mode, stats = "exact", index.stats() if index else None
+        if stats is None:
+            return jsonify({"error": f"Column not found: {column}"}), 404
+
+        return jsonify({"status": "success", "mode": mode, "stats": stats})
+
+    except Exception as e:
+        logger.error("✗ Column stats error: %s", e)
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/columns/<filename>/<column>/top")
+@conditional
+def api_column_top(filename, column):
+    """Most frequent values of one column, from the column index"""
+    logger.info("GET /api/columns/%s/%s/top", filename, column)
 
-        elif chart_type == "boxplot" and column:
-            chart_file = visualizer.box_plot(column, f"box_{filename}_{column}.png")
+    try:
+        filepath = upload_path(filename)
+        if filepath is None:
+            logger.warning("⚠ File not found: %s", filename)
+            return jsonify({"error": "File not found"}), 404
+
+        index = get_column_index(filepath, column)
+        if index is None:
+            return jsonify({"error": f"Column not found: {column}"}), 404
 
-        elif chart_type == "line" and column:
-            chart_file = visualizer.line_chart(column, f"line_{filename}_{column}.png")
+        n = min(max(int(request.args.get("n", 10)), 0), 1000)
+        top = [{"value": value, "count": count} for value, count in index.top(n)]
+        return jsonify({"status": "success", "column": column, "top": top})
+
+    except Exception as e:
+        logger.error("✗ Column top error: %s", e)
+        return jsonify({"error": str(e)}), 400
 
-        elif chart_type == "bar" and column:
-            chart_file = visualizer.bar_chart(column, f"bar_{filename}_{column}.png")
 
-        elif chart_type == "distribution" and column:
-            chart_file = visualizer.distribution_plot(
-                column, f"dist_{filename}_{column}.png"
+@app.route("/api/columns/<filename>/<column>/filter")
+@conditional
+def api_column_filter(filename, column):
+    """Rows where one column matches ``op`` (eq, lt, le, gt, ge, between, null, notnull)
+
+    ``value`` is the operand, and ``between`` also takes ``high``. Matches are
+    found in the column index. The response carries the match count and one
+    page of row ids and rows, selected by ``offset`` and ``limit``.
+    """
+    logger.info("GET /api/columns/%s/%s/filter", filename, column)
+
+    try:
+        filepath = upload_path(filename)
+        if filepath is None:
+            logger.warning("⚠ File not found: %s", filename)
+            return jsonify({"error": "File not found"}), 404
+
+        index = get_column_index(filepath, column)
+        if index is None:
+            return jsonify({"error": f"Column not found: {column}"}), 404
+
+        args = request.args
+        try:
+            matches = index.filter(
+                args.get("op", "eq"), args.get("value"), args.get("high")
             )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        offset = max(int(args.get("offset", 0)), 0)
+        limit = min(max(int(args.get("limit", 100)), 0), MAX_PAGE_ROWS)
+        page = matches[offset : offset + limit]
+        return jsonify(
+            {
+                "status": "success",
+                "column": column,
+                "count": int(len(matches)),
+                "row_ids": page.tolist(),
+                "rows": take_rows(filepath, page),
+            }
+        )
+
+    except Exception as e:
+        logger.error("✗ Column filter error: %s", e)
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/correlations/<filename>")
+@conditional
+def api_correlations(filename):
+    """The ``top`` most strongly correlated column pairs
+
+    ``method`` is pearson or spearman. Large files answer Pearson from
+    their streamed summaries; Spearman needs the ranks of the whole file.
+    """
+    logger.info("GET /api/correlations/%s", filename)
+
+    try:
+        filepath = upload_path(filename)
+        if filepath is None:
+            logger.warning("⚠ File not found: %s", filename)
+            return jsonify({"error": "File not found"}), 404
+
+        method = request.args.get("method", "pearson")
+        if method not in METHODS:
+            return jsonify({"error": f"Invalid correlation method: {method}"}), 400
+        top = min(max(int(request.args.get("top", 20)), 0), 1000)
 
+        analyzer = open_analyzer(filepath)
+        if not analyzer_loaded(analyzer):
+            logger.error("✗ Failed to load data")
+            return jsonify({"error": "Failed to load data"}), 400
+        if isinstance(analyzer, DataAnalyzer):
+            corr = analyzer.correlation_matrix(method)
+        elif method == "pearson":
+            corr = analyzer.comoments.correlation(analyzer.get_numeric_columns())
         else:
-            logger.warning(f"⚠ Invalid chart type or missing column: {chart_type}")
-            return jsonify({"error": "Invalid chart type"}), 400
+            return jsonify({"error": "Spearman is not available for large files"}), 400
 
-        if not chart_file:
-            logger.error("✗ Chart generation failed")
-            return jsonify({"error": "Chart generation failed"}), 400
+        return jsonify(
+            {
+                "status": "success",
+                "method": method,
+                "columns": int(len(corr)),
+                "pairs": top_pairs(corr, top),
+            }
+        )
 
-        logger.info(f"✓ Chart created: {chart_file}")
-        return jsonify({"status": "success", "chart": chart_file})
+    except Exception as e:
+        logger.error("✗ Correlation error: %s", e)
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/aggregate", methods=["POST"])
+def api_aggregate():
+    """Group-by, pivot and time-bucket aggregation of a dataset
+
+    Body: ``{"filename": ..., "by": [...], "aggregations": {column: [...]},
+    "bucket": {"column": ..., "freq": ...}, "pivot": ..., "sort": ...,
+    "limit": ..., "chart": "bar" | "line"}``; see grouping.parse_query().
+    Results are cached per dataset version and query. With ``chart`` the
+    result is also rendered and its file name returned.
+    """
+    logger.info("POST /api/aggregate")
+
+    try:
+        data = request.json
+        filename = data.get("filename")
+        filepath = upload_path(filename)
+        if filepath is None:
+            logger.warning("⚠ File not found: %s", filename)
+            return jsonify({"error": "File not found"}), 404
+
+        spec = {key: value for key, value in data.items() if key != "filename"}
+        try:
+            query = parse_query(spec)
+        except (ValueError, KeyError, TypeError) as e:
+            return jsonify({"error": f"Invalid query: {e}"}), 400
+
+        # Only the columns the query reads are loaded
+        analyzer = DataAnalyzer(filepath, lazy=True)
+        if not analyzer.loaded:
+            logger.error("✗ Failed to load data")
+            return jsonify({"error": "Failed to load data"}), 400
+
+        try:
+            result = analyzer.aggregate(query)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        shown = result.head(MAX_AGGREGATE_ROWS)
+        payload = {
+            "status": "success",
+            "groups": int(len(result)),
+            "truncated": len(shown) < len(result),
+            "columns": [str(col) for col in shown.columns],
+            "data": column_arrays(shown),
+        }
+        if data.get("chart"):
+            try:
+                payload["chart"] = get_render_pool().render(
+                    filepath,
+                    filename,
+                    "aggregate",
+                    dict(spec, chart=data["chart"]),
+                    app.config["CHART_FOLDER"],
+                )
+            except RenderPoolBusy:
+                logger.warning("⚠ Render queue full")
+                return jsonify({"error": "Server busy, try again"}), 503
+            except TimeoutError:
+                logger.error("✗ Aggregate chart render timed out: %s", filename)
+                return jsonify({"error": "Chart generation timed out"}), 504
+
+        logger.info("✓ Aggregated %s into %s groups", filename, len(result))
+        return Response(dumps(payload), mimetype="application/json")
+
+    except Exception as e:
+        logger.error("✗ Aggregation error: %s", e)
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/rows/<filename>")
+@conditional
+def api_rows(filename):
+    """A window of rows as one array per column
+
+    Takes ``offset``, ``limit`` (at most MAX_PAGE_ROWS) and an optional
+    comma-separated ``columns`` projection.
+    """
+    logger.info("GET /api/rows/%s", filename)
+
+    try:
+        filepath = upload_path(filename)
+        if filepath is None:
+            logger.warning("⚠ File not found: %s", filename)
+            return jsonify({"error": "File not found"}), 404
+
+        offset = max(int(request.args.get("offset", 0)), 0)
+        limit = min(max(int(request.args.get("limit", 100)), 0), MAX_PAGE_ROWS)
+        columns = request.args.get("columns")
+        columns = [col for col in columns.split(",") if col] if columns else None
+
+        load_whole = os.path.getsize(filepath) <= app.config["STREAMING_THRESHOLD"]
+        try:
+            frame, total = read_window(filepath, offset, limit, columns, load_whole)
+        except KeyError as e:
+            return jsonify({"error": f"Column not found: {e.args[0]}"}), 404
+
+        payload = {
+            "status": "success",
+            "offset": offset,
+            "limit": limit,
+            "total_rows": total,
+            "columns": list(frame.columns),
+            "dtypes": {col: str(dtype) for col, dtype in frame.dtypes.items()},
+            "data": column_arrays(frame),
+        }
+        return Response(dumps(payload), mimetype="application/json")
+
+    except Exception as e:
+        logger.error("✗ Rows error: %s", e)
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/datasets/<filename>/append", methods=["POST"])
+def api_append(filename):
+    """Append CSV rows to a dataset, updating its summaries from the new rows only
+
+    The rows come as a multipart ``file`` or as the raw request body and
+    must start with a header line naming the dataset's columns.
+    """
+    logger.info("POST /api/datasets/%s/append", filename)
+
+    try:
+        filepath = upload_path(filename)
+        if filepath is None:
+            logger.warning("⚠ File not found: %s", filename)
+            return jsonify({"error": "File not found"}), 404
+
+        if "file" in request.files:
+            data = request.files["file"].read()
+        else:
+            data = request.get_data()
+
+        try:
+            analyzer, added = append_rows(filepath, data)
+        except ValueError as e:
+            logger.warning("⚠ Append rejected: %s", e)
+            return jsonify({"error": str(e)}), 400
+
+        if added:
+            dataset_cache.invalidate(filepath)
+            chart_cache.invalidate(filepath)
+            ColumnarStore.remove(filepath)
+            ColumnIndex.remove(filepath)
+
+        # The summaries hold sketches; exact profiles rebuild from the data
+        overview = analyzer.get_overview()
+        logger.info("✓ Appended %s rows to %s", added, filename)
+        return jsonify(
+            {
+                "status": "success",
+                "filename": filename,
+                "appended_rows": added,
+                "overview": overview,
+            }
+        )
 
     except Exception as e:
-        logger.error(f"✗ Visualization error: {str(e)}")
+        logger.error("✗ Append error: %s", e)
         return jsonify({"error": str(e)}), 400
 
 
+@app.route("/api/jobs/<job_id>")
+def api_job_status(job_id):
+    """Stage, progress and result of a background job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
 @app.route("/health")
 def health():
     """Health check endpoint"""
     logger.info("GET /health")
-    return jsonify({"status": "healthy", "message": "App is running"})
+    return jsonify(
+        {
+            "status": "healthy",
+            "message": "App is running",
+            "dataset_cache": dataset_cache.stats(),
+            "chart_cache": chart_cache.stats(),
+        }
+    )
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Latency histograms, throughput counters and cache statistics for Prometheus"""
+    return Response(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.before_request
+def start_trace():
+    g.trace = RequestTrace(profile=app.config["PROFILE_SLOW_REQUESTS"])
+
+
+@app.after_request
+def finish_trace(response):
+    """Record the request's latency; slow ones are logged with their stages"""
+    trace = g.pop("trace", None)
+    if trace is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        seconds = trace.finish(
+            request.method,
+            route,
+            response.status_code,
+            slow_seconds=app.config["SLOW_REQUEST_SECONDS"],
+            profile_dir=app.config["PROFILE_DIR"],
+        )
+        response.headers["Server-Timing"] = f"app;dur={seconds * 1000:.1f}"
+    return response
+
+
+@app.after_request
+def http_caching(response):
+    """Mark content-addressed chart files immutable and compress large text bodies"""
+    if request.endpoint == "static" and CONTENT_ADDRESSED.search(request.path):
+        response.headers["Cache-Control"] = IMMUTABLE
+    return compress(request, response)
 
 
 @app.errorhandler(404)
 def not_found(error):
-    logger.warning(f"⚠ 404 error: {request.path}")
+    logger.warning("⚠ 404 error: %s", request.path)
     return jsonify({"error": "Not found"}), 404
 
 
 @app.errorhandler(500)
 def internal_error(error):
-    logger.error(f"✗ 500 error: {str(error)}")
+    logger.error("✗ 500 error: %s", error)
     return jsonify({"error": "Internal server error"}), 500
 
 
+if PREWARM:
+    prewarm(start_pool=False)
+
+
 if __name__ == "__main__":
     logger.info("=" * 50)
     logger.info("🚀 Starting Data Analytics App")
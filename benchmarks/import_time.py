@@ -0,0 +1,93 @@
+# import_time.py - Import Time Benchmark
+#
+# Measures how long a fresh interpreter takes to import the app (or any
+# module), and which imports dominate, using ``python -X importtime``.
+#
+#     python benchmarks/import_time.py                 # import app
+#     python benchmarks/import_time.py visualizer -n 10 --top 15
+#     python benchmarks/import_time.py --json --max-seconds 1.5
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules the app should not import until a chart is rendered
+HEAVY_MODULES = ("matplotlib", "matplotlib.pyplot", "seaborn", "scipy")
+
+
+def measure(module):
+    """Import module in a fresh interpreter; returns (seconds, {name: cumulative us}, heavy)"""
+    code = (
+        "import sys, time; t = time.perf_counter(); "
+        f"import {module}; "
+        "print(time.perf_counter() - t); "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PREWARM="0"),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    lines = proc.stdout.splitlines()
+    seconds, heavy = float(lines[-2]), [m for m in lines[-1].split(",") if m]
+
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line[len("import time:") :].split("|")
+        if cum.strip().isdigit():
+            cumulative[name.strip()] = int(cum)
+    return seconds, cumulative, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time")
+    parser.add_argument("module", nargs="?", default="app")
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    parser.add_argument(
+        "--max-seconds", type=float, help="exit 1 if the median import is slower"
+    )
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    times = [seconds for seconds, _, _ in runs]
+    _, cumulative, heavy = runs[-1]
+    slowest = sorted(cumulative.items(), key=lambda item: -item[1])[: args.top]
+    result = {
+        "module": args.module,
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "median_seconds": statistics.median(times),
+        "min_seconds": min(times),
+        "heavy_modules_loaded": heavy,
+        "slowest_imports_ms": {name: us / 1000 for name, us in slowest},
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(
+            f"import {args.module}: median {result['median_seconds']:.3f}s, "
+            f"min {result['min_seconds']:.3f}s over {args.repeat} runs"
+        )
+        print(f"heavy modules loaded: {', '.join(heavy) or 'none'}")
+        for name, ms in result["slowest_imports_ms"].items():
+            print(f"  {ms:9.1f} ms  {name}")
+
+    if args.max_seconds is not None and result["median_seconds"] > args.max_seconds:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+# run.py - Benchmark Suite
+#
+# Times DataAnalyzer, DataVisualizer and the Flask routes on synthetic
+# datasets and compares the results with a stored baseline.
+#
+#     python benchmarks/run.py                           # 10K and 100K rows
+#     python benchmarks/run.py --rows 10000 1000000 --suite analyzer charts
+#     python benchmarks/run.py --save-baseline           # record a baseline
+#     python benchmarks/run.py --fail-on-regression      # compare, exit 1 if slower
+#
+# Each benchmark runs once to warm up, ``--repeat`` times timed, and once
+# more under tracemalloc for its peak memory, so tracing does not slow the
+# timed runs. Timings are only comparable on the same machine.
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import DatasetSpec, dataset  # noqa: E402
+
+DATA_DIR = os.path.join(ROOT, "benchmarks", "data")
+RESULTS = os.path.join(ROOT, "benchmarks", "results.json")
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+SUITES = ("analyzer", "charts", "routes")
+# Default slowdown (or memory growth) over the baseline counted as a regression
+TOLERANCE = 0.25
+
+
+class Benchmark:
+    """One timed operation; ``setup`` runs untimed before every call"""
+
+    def __init__(self, name, func, setup=None):
+        self.name = name
+        self.func = func
+        self.setup = setup
+
+    def call(self):
+        state = self.setup() if self.setup else None
+        start = time.perf_counter()
+        self.func(state)
+        return time.perf_counter() - start
+
+    def measure(self, repeat):
+        self.call()
+        times = [self.call() for _ in range(repeat)]
+        state = self.setup() if self.setup else None
+        tracemalloc.start()
+        try:
+            self.func(state)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            "median_seconds": statistics.median(times),
+            "min_seconds": min(times),
+            "peak_bytes": peak,
+        }
+
+
+def analyzer_benchmarks(path):
+    from analyzer import DataAnalyzer
+
+    loaded = DataAnalyzer(path, cache=None)
+    if loaded.df is None:
+        raise RuntimeError(f"Failed to load {path}")
+    return [
+        Benchmark("analyzer.load_data", lambda _: DataAnalyzer(path, cache=None)),
+        Benchmark("analyzer.get_overview", lambda _: loaded.get_overview()),
+        Benchmark("analyzer.get_statistics", lambda _: loaded.get_statistics()),
+        Benchmark("analyzer.get_correlation", lambda _: loaded.get_correlation()),
+    ]
+
+
+def chart_benchmarks(path, output_dir):
+    from analyzer import DataAnalyzer
+    from visualizer import DataVisualizer
+
+    analyzer = DataAnalyzer(path, cache=None)
+    numeric = analyzer.get_numeric_columns()
+    categorical = analyzer.get_categorical_columns()
+    visualizer = DataVisualizer(analyzer.df, output_dir=output_dir)
+    charts = {
+        "histogram": lambda: visualizer.histogram(numeric[0]),
+        "scatter_plot": lambda: visualizer.scatter_plot(numeric[0], numeric[1]),
+        "correlation_heatmap": lambda: visualizer.correlation_heatmap(),
+        "box_plot": lambda: visualizer.box_plot(numeric[0]),
+        "line_chart": lambda: visualizer.line_chart(numeric[0]),
+        "bar_chart": lambda: visualizer.bar_chart(categorical[0]),
+        "distribution_plot": lambda: visualizer.distribution_plot(numeric[0]),
+        "aggregate_chart": lambda: visualizer.aggregate_chart(
+            {"by": [categorical[0]], "aggregations": {numeric[0]: ["mean"]}}
+        ),
+    }
+    return [
+        Benchmark(f"chart.{name}", lambda _, draw=draw: _check_chart(draw()))
+        for name, draw in charts.items()
+    ]
+
+
+def _check_chart(result):
+    if not result:
+        raise RuntimeError("Chart generation failed")
+
+
+def route_benchmarks(path, upload_dir):
+    from app import app
+    from cache import dataset_cache, chart_cache
+    from analyzer import DataAnalyzer
+
+    app.config.update(
+        TESTING=True,
+        UPLOAD_FOLDER=upload_dir,
+        CHART_FOLDER=os.path.join(upload_dir, "charts"),
+        RENDER_WORKERS=0,
+        MAX_CONTENT_LENGTH=None,
+    )
+    client = app.test_client()
+    name = os.path.basename(path)
+    target = os.path.join(upload_dir, name)
+    columns = DataAnalyzer(path, cache=None, lazy=True)
+    numeric, categorical = (
+        columns.get_numeric_columns(),
+        columns.get_categorical_columns(),
+    )
+
+    def upload(_):
+        with open(path, "rb") as f:
+            return _check(client.put(f"/upload/{name}", data=f))
+
+    # Later routes read the upload, so it runs first
+    upload(None)
+
+    def cold():
+        # Drop in-memory results; on-disk copies made at upload stay, as after a restart
+        dataset_cache.clear()
+        chart_cache.invalidate(target)
+
+    routes = {
+        "PUT /upload": upload,
+        "GET /analysis": lambda _: client.get(f"/analysis/{name}"),
+        "GET /api/columns/stats": lambda _: client.get(
+            f"/api/columns/{name}/{categorical[0]}/stats"
+        ),
+        "GET /api/correlations": lambda _: client.get(f"/api/correlations/{name}"),
+        "GET /api/rows": lambda _: client.get(f"/api/rows/{name}?offset=0&limit=1000"),
+        "POST /api/aggregate": lambda _: client.post(
+            "/api/aggregate",
+            json={
+                "filename": name,
+                "by": [categorical[0]],
+                "aggregations": {numeric[0]: ["mean", "max"]},
+            },
+        ),
+        "POST /api/visualize": lambda _: client.post(
+            "/api/visualize",
+            json={"filename": name, "chart_type": "histogram", "column": numeric[0]},
+        ),
+        "POST /api/visualize data": lambda _: client.post(
+            "/api/visualize",
+            json={
+                "filename": name,
+                "chart_type": "histogram",
+                "column": numeric[0],
+                "format": "data",
+            },
+        ),
+    }
+    return [
+        Benchmark(f"route.{route}", lambda state, call=call: _check(call(state)), cold)
+        for route, call in routes.items()
+    ]
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.get_data()[:200]}")
+    return response
+
+
+def run(specs, suites, repeat, only=None):
+    """Run the suites on each dataset; returns the list of result records"""
+    workdir = tempfile.mkdtemp(prefix="benchmarks-")
+    results = []
+    try:
+        for spec in specs:
+            path = dataset(DATA_DIR, spec)
+            benchmarks = []
+            if "analyzer" in suites:
+                benchmarks += analyzer_benchmarks(path)
+            if "charts" in suites:
+                benchmarks += chart_benchmarks(path, os.path.join(workdir, "charts"))
+            if "routes" in suites:
+                upload_dir = os.path.join(workdir, f"uploads-{spec.rows}")
+                os.makedirs(upload_dir, exist_ok=True)
+                benchmarks += route_benchmarks(path, upload_dir)
+
+            for benchmark in benchmarks:
+                if only and not any(part in benchmark.name for part in only):
+                    continue
+                record = {
+                    "id": f"{benchmark.name}[{spec.rows}]",
+                    "name": benchmark.name,
+                    "rows": spec.rows,
+                    "repeat": repeat,
+                }
+                try:
+                    record.update(benchmark.measure(repeat))
+                except Exception as e:
+                    record["error"] = str(e)
+                results.append(record)
+                _print_record(record)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def environment():
+    import numpy
+    import pandas
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "commit": commit or None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Ratios of results to the baseline; sets ``regression`` on each record
+
+    A benchmark regresses when its median time, or its peak memory, grows
+    by more than ``tolerance`` over the baseline run of the same id.
+    """
+    previous = {record["id"]: record for record in baseline["results"]}
+    regressions = []
+    for record in results:
+        base = previous.get(record["id"])
+        if base is None or "error" in record or "error" in base:
+            continue
+        record["time_ratio"] = record["median_seconds"] / base["median_seconds"]
+        record["memory_ratio"] = record["peak_bytes"] / max(base["peak_bytes"], 1)
+        record["regression"] = (
+            record["time_ratio"] > 1 + tolerance
+            or record["memory_ratio"] > 1 + tolerance
+        )
+        if record["regression"]:
+            regressions.append(record)
+    return regressions
+
+
+def _print_record(record):
+    if "error" in record:
+        print(f"{record['id']:<44} ERROR {record['error']}")
+        return
+    print(
+        f"{record['id']:<44} {record['median_seconds'] * 1000:10.1f} ms"
+        f" {record['peak_bytes'] / 2**20:9.1f} MiB peak"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--numeric", type=int, default=6)
+    parser.add_argument("--categorical", type=int, default=2)
+    parser.add_argument("--datetime", type=int, default=1)
+    parser.add_argument("--cardinality", type=int, default=50)
+    parser.add_argument("--null-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--suite", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument(
+        "--only", nargs="+", help="run benchmarks whose name contains one of these"
+    )
+    parser.add_argument("-n", "--repeat", type=int, default=3)
+    parser.add_argument("--output", default=RESULTS, help="results JSON file")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store results as the baseline"
+    )
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="exit 1 if any benchmark regressed",
+    )
+    args = parser.parse_args()
+    # Log lines from every call would dominate the output and the timings
+    logging.disable(logging.WARNING)
+
+    specs = [
+        DatasetSpec(
+            rows,
+            args.numeric,
+            args.categorical,
+            args.datetime,
+            args.cardinality,
+            args.null_rate,
+            args.seed,
+        )
+        for rows in args.rows
+    ]
+    report = {
+        "environment": environment(),
+        "datasets": [spec.as_dict() for spec in specs],
+        "results": run(specs, args.suite, args.repeat, args.only),
+    }
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["baseline"] = baseline["environment"]
+        regressions = compare(report["results"], baseline, args.tolerance)
+        for record in report["results"]:
+            if "time_ratio" in record:
+                flag = "  REGRESSION" if record["regression"] else ""
+                print(
+                    f"{record['id']:<44} time x{record['time_ratio']:.2f}"
+                    f"  memory x{record['memory_ratio']:.2f}{flag}"
+                )
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+
+    failed = [record["id"] for record in report["results"] if "error" in record]
+    if failed:
+        print(f"{len(failed)} benchmark(s) failed: {', '.join(failed)}")
+    if args.fail_on_regression and (regressions or failed):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
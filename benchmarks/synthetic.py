@@ -0,0 +1,149 @@
+# synthetic.py - Synthetic Dataset Generator
+#
+# Writes reproducible CSVs for the benchmarks: the same arguments and seed
+# always give the same bytes. Rows are generated and written in chunks, so
+# 10M-row files need no more memory than 10K-row ones.
+#
+#     python benchmarks/synthetic.py data.csv --rows 1000000
+#     python benchmarks/synthetic.py data.csv --rows 100000 --numeric 20 \
+#         --categorical 5 --cardinality 1000 --null-rate 0.05
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 250_000
+# Numeric columns are mixtures of this many shared factors plus noise, so
+# correlations between them are neither all zero nor all one
+FACTORS = 3
+
+
+class DatasetSpec:
+    """Shape of a synthetic dataset
+
+    ``numeric`` columns alternate between floats and integers,
+    ``categorical`` columns hold ``cardinality`` distinct labels with a
+    skewed (Zipf-like) frequency, and ``datetime`` columns hold minute
+    timestamps in row order. Every column except the first numeric one is
+    null with probability ``null_rate``.
+    """
+
+    def __init__(
+        self,
+        rows=10_000,
+        numeric=6,
+        categorical=2,
+        datetime=1,
+        cardinality=50,
+        null_rate=0.0,
+        seed=0,
+    ):
+        self.rows = int(rows)
+        self.numeric = int(numeric)
+        self.categorical = int(categorical)
+        self.datetime = int(datetime)
+        self.cardinality = max(int(cardinality), 1)
+        self.null_rate = float(null_rate)
+        self.seed = int(seed)
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def filename(self):
+        """File name encoding every parameter, for reuse across runs"""
+        return (
+            f"synthetic_{self.rows}r_{self.numeric}n_{self.categorical}c_"
+            f"{self.datetime}d_{self.cardinality}k_{self.null_rate:g}null_"
+            f"s{self.seed}.csv"
+        )
+
+    def columns(self):
+        """Names of the numeric, categorical and datetime columns"""
+        numeric = [
+            f"float_{i}" if i % 2 == 0 else f"int_{i}" for i in range(self.numeric)
+        ]
+        categorical = [f"cat_{i}" for i in range(self.categorical)]
+        datetime = [f"time_{i}" for i in range(self.datetime)]
+        return numeric, categorical, datetime
+
+
+def _chunk(spec, start, rows, rng, loadings, weights):
+    numeric, categorical, datetime = spec.columns()
+    factors = rng.standard_normal((rows, FACTORS))
+    data = {}
+    for i, col in enumerate(numeric):
+        values = factors @ loadings[i] + rng.standard_normal(rows)
+        data[col] = values * 100 if col.startswith("float") else np.rint(values * 1000)
+    labels = np.array([f"c{k}" for k in range(spec.cardinality)], dtype=object)
+    for col in categorical:
+        data[col] = labels[rng.choice(spec.cardinality, size=rows, p=weights)]
+    base = pd.Timestamp("2024-01-01")
+    for i, col in enumerate(datetime):
+        minutes = np.arange(start, start + rows) * (i + 1)
+        data[col] = base + pd.to_timedelta(minutes, unit="min")
+
+    frame = pd.DataFrame(data)
+    if spec.null_rate > 0:
+        for col in list(frame.columns)[1:]:
+            mask = rng.random(rows) < spec.null_rate
+            frame[col] = frame[col].mask(mask)
+    for col in numeric[1::2]:
+        # Integers stay integers in the CSV, even with nulls
+        frame[col] = frame[col].astype("Int64")
+    return frame
+
+
+def generate_csv(path, spec):
+    """Write the dataset described by spec to path; returns path"""
+    rng = np.random.default_rng(spec.seed)
+    loadings = rng.uniform(-1, 1, (max(spec.numeric, 1), FACTORS))
+    weights = 1.0 / np.arange(1, spec.cardinality + 1)
+    weights /= weights.sum()
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="") as f:
+        for start in range(0, max(spec.rows, 1), CHUNK_ROWS):
+            rows = min(CHUNK_ROWS, spec.rows - start)
+            frame = _chunk(spec, start, rows, rng, loadings, weights)
+            frame.to_csv(f, index=False, header=start == 0, float_format="%.6g")
+    os.replace(tmp, path)
+    return path
+
+
+def dataset(folder, spec):
+    """Path of the dataset for spec in folder, generated on first use"""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, spec.filename())
+    if not os.path.exists(path):
+        generate_csv(path, spec)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic CSV")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--numeric", type=int, default=6)
+    parser.add_argument("--categorical", type=int, default=2)
+    parser.add_argument("--datetime", type=int, default=1)
+    parser.add_argument("--cardinality", type=int, default=50)
+    parser.add_argument("--null-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    spec = DatasetSpec(
+        args.rows,
+        args.numeric,
+        args.categorical,
+        args.datetime,
+        args.cardinality,
+        args.null_rate,
+        args.seed,
+    )
+    generate_csv(args.path, spec)
+    print(f"{args.path}: {os.path.getsize(args.path)} bytes")
+
+
+if __name__ == "__main__":
+    main()
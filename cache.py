@@ -0,0 +1,297 @@
+# cache.py - Shared Cache Module
+
+import os
+import re
+import json
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_BYTES = int(os.environ.get("DATASET_CACHE_MB", 256)) * 1024 * 1024
+DEFAULT_CHART_CACHE_BYTES = int(os.environ.get("CHART_CACHE_MB", 512)) * 1024 * 1024
+DEFAULT_CHART_CACHE_ENTRIES = int(os.environ.get("CHART_CACHE_ENTRIES", 5000))
+# Chart file names end in their cache key
+CHART_KEY = re.compile(r"_([0-9a-f]{16})\.\w+$")
+# Content hashes remembered per file version
+MAX_CONTENT_HASHES = 1024
+HASH_BLOCK_BYTES = 1024 * 1024
+
+_content_hashes = OrderedDict()
+_content_hashes_lock = threading.Lock()
+
+
+def file_key(filepath, *options):
+    """Build a cache key that changes whenever the file on disk changes"""
+    st = os.stat(filepath)
+    return (os.path.abspath(filepath), st.st_mtime_ns, st.st_size) + tuple(options)
+
+
+def dataset_version(filepath):
+    """Short digest identifying the current contents of a dataset file"""
+    return hashlib.sha1(repr(file_key(filepath)).encode()).hexdigest()[:16]
+
+
+def content_hash(filepath):
+    """SHA-256 of a dataset file's bytes, hashed once per version of the file"""
+    key = file_key(filepath)
+    with _content_hashes_lock:
+        digest = _content_hashes.get(key)
+        if digest is not None:
+            _content_hashes.move_to_end(key)
+            return digest
+
+    sha256 = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            sha256.update(block)
+    return remember_content_hash(filepath, sha256.hexdigest(), key)
+
+
+def remember_content_hash(filepath, digest, key=None):
+    """Record the content hash of filepath, e.g. one computed while it was written"""
+    key = key or file_key(filepath)
+    with _content_hashes_lock:
+        _content_hashes[key] = digest
+        _content_hashes.move_to_end(key)
+        while len(_content_hashes) > MAX_CONTENT_HASHES:
+            _content_hashes.popitem(last=False)
+    return digest
+
+
+class DatasetCache:
+    """Process-wide LRU cache of parsed DataFrames bounded by a memory budget
+
+    Cached frames are shared between callers and must be treated as
+    read-only; methods that change the data should rebind, not mutate.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-key locks of loads in progress
+        self._loading = {}
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes=None):
+        """Store value under key, evicting least recently used entries"""
+        if nbytes is None:
+            nbytes = self._sizeof(value)
+        if nbytes > self.max_bytes:
+            logger.info("⚠ Not caching %s: %s bytes exceeds budget", key[0], nbytes)
+            return False
+
+        with self._lock:
+            # A new version of a file replaces every older version of it;
+            # entries for the same version under other options are kept
+            for stale in [
+                k for k in self._entries if k[0] == key[0] and k[1:3] != key[1:3]
+            ]:
+                self._remove(stale)
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self.current_bytes + nbytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+        return True
+
+    def get_or_load(self, filepath, loader, options=()):
+        """Return the cached frame for filepath, calling loader() on a miss
+
+        Concurrent misses on one key wait for the first caller's load
+        instead of each running loader().
+        """
+        key = file_key(filepath, *options)
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            lock = self._loading.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is not None:
+                    return entry[0]
+                value = loader()
+                if value is not None:
+                    self.put(key, value)
+                return value
+        finally:
+            with self._lock:
+                if self._loading.get(key) is lock:
+                    del self._loading[key]
+
+    def invalidate(self, filepath):
+        """Drop every cached version of filepath"""
+        path = os.path.abspath(filepath)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                self._remove(key)
+
+    def clear(self):
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return hit/miss counters and memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key):
+        _, nbytes = self._entries.pop(key)
+        self.current_bytes -= nbytes
+
+    @staticmethod
+    def _sizeof(value):
+        if hasattr(value, "memory_usage"):
+            return int(value.memory_usage(deep=True).sum())
+        # Derived results such as chart data are plain JSON-like objects
+        return len(json.dumps(value, default=str))
+
+
+class ChartCache:
+    """Size-bounded LRU index of rendered chart files
+
+    Keys are content hashes of the dataset version, chart type, columns and
+    render parameters, and the key is part of the chart's file name. A file
+    that already exists under that name is therefore always current, even
+    when another worker process rendered it.
+
+    With ``indexed=False``, as in render workers, lookups only check the
+    disk and nothing is recorded or evicted; the process that serves the
+    charts indexes them by the key in their file names and keeps the one
+    budget.
+    """
+
+    def __init__(
+        self,
+        max_bytes=DEFAULT_CHART_CACHE_BYTES,
+        max_entries=DEFAULT_CHART_CACHE_ENTRIES,
+        indexed=True,
+    ):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.indexed = indexed
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(version, chart_type, params):
+        """Content hash for one rendered chart"""
+        payload = json.dumps([version, chart_type, params], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def key_of(chart_file):
+        """Cache key of a chart file name, or None for other names"""
+        match = CHART_KEY.search(chart_file)
+        return match.group(1) if match else None
+
+    def lookup(self, key, path, dataset=None):
+        """Check whether the chart for key is already rendered at path"""
+        with self._lock:
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+            stale = self._entries.pop(key, None)
+            if stale is not None:
+                self.current_bytes -= stale[1]
+
+        if os.path.exists(path):
+            # Rendered by another process, or before this index was built
+            with self._lock:
+                self.hits += 1
+            self.add(key, path, dataset)
+            return True
+
+        with self._lock:
+            self.misses += 1
+        return False
+
+    def add(self, key, path, dataset=None):
+        """Record a freshly rendered chart and evict to stay within bounds"""
+        if not self.indexed:
+            return
+        nbytes = os.path.getsize(path)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (path, nbytes, dataset)
+            self.current_bytes += nbytes
+            while len(self._entries) > 1 and (
+                self.current_bytes > self.max_bytes
+                or len(self._entries) > self.max_entries
+            ):
+                self._delete(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, dataset):
+        """Delete every chart rendered from dataset"""
+        with self._lock:
+            for key in [k for k, v in self._entries.items() if v[2] == dataset]:
+                self._delete(key)
+
+    def stats(self):
+        """Return hit/miss counters and disk usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _delete(self, key):
+        path, nbytes, _ = self._entries.pop(key)
+        self.current_bytes -= nbytes
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+dataset_cache = DatasetCache()
+chart_cache = ChartCache()
@@ -0,0 +1,249 @@
+# column_index.py - Per-Dataset Column Index Module
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIRNAME = ".index"
+FILTER_OPS = ("eq", "lt", "le", "gt", "ge", "between", "null", "notnull")
+
+
+def _kind(dtype):
+    if pd.api.types.is_bool_dtype(dtype):
+        return "boolean"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    return "text"
+
+
+def _scalar(value):
+    """Plain Python value for JSON output"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _json_bytes(value):
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    return json.dumps(value).encode()
+
+
+def _write_atomic(folder, name, write):
+    """Write a file through a temporary name in folder, then rename it into place"""
+    tmp = os.path.join(folder, f"{name}.tmp-{os.getpid()}-{threading.get_ident()}")
+    try:
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, os.path.join(folder, name))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class ColumnIndex:
+    """Sorted value dictionary, row order and null bitmap of one column
+
+    ``values`` holds the distinct non-null values in ascending order and
+    ``counts`` how often each occurs. ``order`` lists the row ids grouped
+    by value in the same order, ascending within each group, so every
+    equality or range predicate selects one contiguous slice of it.
+    Text columns are indexed on their string form.
+    """
+
+    def __init__(self, path, key, meta):
+        self.path = path
+        self.key = key
+        self.meta = meta
+        self._arrays = {}
+
+    @staticmethod
+    def index_dir(csv_path):
+        """Directory holding the column indexes of csv_path"""
+        folder, name = os.path.split(os.path.abspath(csv_path))
+        return os.path.join(folder, INDEX_DIRNAME, name)
+
+    @staticmethod
+    def _key(column):
+        return hashlib.sha1(str(column).encode()).hexdigest()[:16]
+
+    @classmethod
+    def build(cls, csv_path, column, series):
+        """Index one column of csv_path from its values"""
+        st = os.stat(csv_path)
+        path = cls.index_dir(csv_path)
+        os.makedirs(path, exist_ok=True)
+        key = cls._key(column)
+
+        present = series.notna().to_numpy()
+        row_ids = np.flatnonzero(present)
+        kind = _kind(series.dtype)
+        data = series.to_numpy()[present]
+        if kind == "text":
+            data = data.astype(str).astype(object)
+        values, inverse, counts = np.unique(
+            data, return_inverse=True, return_counts=True
+        )
+        id_dtype = np.int32 if len(series) < 2**31 else np.int64
+        order = row_ids[np.argsort(inverse, kind="stable")].astype(id_dtype)
+
+        arrays = {
+            "counts": counts.astype(np.int64),
+            "order": order,
+            "nulls": np.packbits(~present),
+        }
+        if kind != "text":
+            arrays["values"] = values
+        # Each file is written aside and renamed into place, so requests
+        # holding the previous arrays as memory maps keep reading them
+        for name, array in arrays.items():
+            _write_atomic(path, f"{key}.{name}.npy", lambda f: np.save(f, array))
+        if kind == "text":
+            _write_atomic(
+                path, f"{key}.values.json", lambda f: f.write(_json_bytes(values))
+            )
+
+        meta = {
+            "source_mtime_ns": st.st_mtime_ns,
+            "source_size": st.st_size,
+            "column": str(column),
+            "kind": kind,
+            "dtype": str(series.dtype),
+            "rows": int(len(series)),
+            "null_count": int(len(series) - len(row_ids)),
+        }
+        # The meta file goes last: its presence marks a complete index
+        _write_atomic(path, f"{key}.json", lambda f: f.write(_json_bytes(meta)))
+        return cls(path, key, meta)
+
+    @classmethod
+    def open(cls, csv_path, column):
+        """Open the index of one column, or None if missing or stale"""
+        path = cls.index_dir(csv_path)
+        key = cls._key(column)
+        try:
+            with open(os.path.join(path, f"{key}.json")) as f:
+                meta = json.load(f)
+            st = os.stat(csv_path)
+        except (OSError, ValueError):
+            return None
+        if (meta["source_mtime_ns"], meta["source_size"]) != (
+            st.st_mtime_ns,
+            st.st_size,
+        ):
+            return None
+        return cls(path, key, meta)
+
+    @classmethod
+    def remove(cls, csv_path):
+        """Delete every column index of csv_path"""
+        shutil.rmtree(cls.index_dir(csv_path), ignore_errors=True)
+
+    @property
+    def values(self):
+        if "values" not in self._arrays:
+            if self.meta["kind"] == "text":
+                with open(os.path.join(self.path, f"{self.key}.values.json")) as f:
+                    self._arrays["values"] = np.array(json.load(f), dtype=object)
+            else:
+                self._arrays["values"] = self._load("values")
+        return self._arrays["values"]
+
+    @property
+    def counts(self):
+        return self._load("counts")
+
+    @property
+    def order(self):
+        return self._load("order")
+
+    @property
+    def offsets(self):
+        """Start of each value's group in ``order``, plus the total"""
+        if "offsets" not in self._arrays:
+            self._arrays["offsets"] = np.concatenate([[0], np.cumsum(self.counts)])
+        return self._arrays["offsets"]
+
+    def stats(self, top_n=10):
+        """The same figures as DataAnalyzer.get_column_stats()"""
+        rows, nulls = self.meta["rows"], self.meta["null_count"]
+        return {
+            "unique": int(len(self.counts)),
+            "null_count": nulls,
+            "null_percentage": float(nulls / rows * 100) if rows else 0.0,
+            "dtype": self.meta["dtype"],
+            "value_counts": dict(self.top(top_n)),
+        }
+
+    def top(self, n=10):
+        """Most frequent values as (value, count) pairs, ties in row order"""
+        counts = self.counts
+        first_row = self.order[self.offsets[:-1]]
+        picked = np.lexsort((first_row, -counts))[:n]
+        values = self.values
+        return [(_scalar(values[i]), int(counts[i])) for i in picked]
+
+    def filter(self, op, value=None, high=None):
+        """Ascending row ids matching ``<column> <op> value``
+
+        ``between`` takes ``value`` and ``high`` as inclusive bounds;
+        ``null`` and ``notnull`` take no value. Raises ValueError for an
+        unknown operator or a value of the wrong type.
+        """
+        if op not in FILTER_OPS:
+            raise ValueError(f"Invalid filter operator: {op}")
+        if op in ("null", "notnull"):
+            nulls = np.unpackbits(self._load("nulls"), count=self.meta["rows"])
+            return np.flatnonzero(nulls if op == "null" else nulls == 0)
+
+        lo, hi = self._value_range(op, self._coerce(value), high)
+        return np.sort(self.order[self.offsets[lo] : self.offsets[hi]])
+
+    def _value_range(self, op, value, high):
+        values = self.values
+        if op == "eq":
+            return (
+                np.searchsorted(values, value, side="left"),
+                np.searchsorted(values, value, side="right"),
+            )
+        if op == "between":
+            return (
+                np.searchsorted(values, value, side="left"),
+                np.searchsorted(values, self._coerce(high), side="right"),
+            )
+        end = len(values)
+        cut = np.searchsorted(
+            values, value, side="left" if op in ("lt", "ge") else "right"
+        )
+        return (0, cut) if op in ("lt", "le") else (cut, end)
+
+    def _coerce(self, value):
+        if value is None:
+            raise ValueError("Filter value is required")
+        kind = self.meta["kind"]
+        if kind == "numeric":
+            return float(value)
+        if kind == "boolean":
+            if str(value).lower() not in ("true", "false", "1", "0"):
+                raise ValueError(f"Not a boolean: {value}")
+            return str(value).lower() in ("true", "1")
+        return str(value)
+
+    def _load(self, name):
+        if name not in self._arrays:
+            path = os.path.join(self.path, f"{self.key}.{name}.npy")
+            self._arrays[name] = np.load(path, mmap_mode="r")
+        return self._arrays[name]
+
+
+def index_columns(csv_path, df):
+    """Index every column of a dataset, as done at upload time"""
+    for column in df.columns:
+        ColumnIndex.build(csv_path, column, df[column])
+    logger.info("✓ Indexed %s columns of %s", len(df.columns), csv_path)
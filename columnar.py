@@ -0,0 +1,256 @@
+# columnar.py - Columnar Binary Store Module
+
+import os
+import json
+import shutil
+import logging
+import pandas as pd
+import numpy as np
+from csvformat import csv_options
+
+logger = logging.getLogger(__name__)
+
+STORE_DIRNAME = ".columnar"
+META_FILE = "meta.json"
+# Rows parsed at a time when converting a file too large to load whole
+CHUNK_ROWS = 100_000
+
+
+def _is_binary(dtype):
+    """Whether a column of dtype is stored as a raw array rather than codes"""
+    return pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype)
+
+
+def _encode(series, lookup):
+    """Codes of series in lookup, adding values not seen in earlier chunks"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    mapping = [lookup.setdefault(value, len(lookup)) for value in uniques]
+    # Code -1 indexes the trailing -1, keeping missing values missing
+    return np.array(mapping + [-1], dtype=np.int32)[codes]
+
+
+class ColumnarStore:
+    """Per-column NumPy copy of an uploaded CSV that is memory-mapped on read
+
+    Numeric and boolean columns are saved as raw ``.npy`` arrays and opened
+    with ``mmap_mode='r'``, so several worker processes share the same pages
+    through the OS cache. String columns are dictionary-encoded as int32
+    codes (-1 for missing) plus a JSON list of distinct values.
+    """
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self._arrays = {}
+
+    @staticmethod
+    def store_dir(csv_path):
+        """Directory holding the columnar copy of csv_path"""
+        folder, name = os.path.split(os.path.abspath(csv_path))
+        return os.path.join(folder, STORE_DIRNAME, name)
+
+    @classmethod
+    def convert(cls, csv_path, df=None):
+        """Write the columnar copy of csv_path, parsing it unless df is given"""
+        if df is None:
+            df = pd.read_csv(csv_path, **csv_options(csv_path))
+
+        st = os.stat(csv_path)
+        tmp = cls._staging(csv_path)
+        columns = []
+        for i, name in enumerate(df.columns):
+            columns.append(cls._write_column(tmp, i, name, df[name]))
+        return cls._publish(csv_path, tmp, st, len(df), columns)
+
+    @classmethod
+    def convert_chunks(cls, csv_path, dtypes, rows, chunksize=CHUNK_ROWS):
+        """Write the columnar copy of a CSV too large to parse whole
+
+        ``dtypes`` and ``rows`` describe the whole file, as summarized by a
+        StreamingAnalyzer, so each column is preallocated as a ``.npy``
+        file and filled chunk by chunk. String codes are assigned in order
+        of first appearance, as pd.factorize() does for a whole column.
+        """
+        options = csv_options(csv_path)
+        strings = [name for name, dtype in dtypes.items() if not _is_binary(dtype)]
+        st = os.stat(csv_path)
+        tmp = cls._staging(csv_path)
+
+        columns, arrays, lookups = [], {}, {}
+        for i, (name, dtype) in enumerate(dtypes.items()):
+            spec = {"name": name, "dtype": str(dtype), "file": f"{i}.npy"}
+            if name in strings:
+                spec["kind"] = "string"
+                spec["categories"] = f"{i}.categories.json"
+                dtype = np.int32
+                lookups[name] = {}
+            else:
+                spec["kind"] = "numeric"
+            arrays[name] = np.lib.format.open_memmap(
+                os.path.join(tmp, spec["file"]), mode="w+", dtype=dtype, shape=(rows,)
+            )
+            columns.append(spec)
+
+        start = 0
+        # Strings stay strings in every chunk, even where a chunk looks numeric
+        chunks = pd.read_csv(
+            csv_path,
+            chunksize=chunksize,
+            dtype={name: object for name in strings},
+            **options,
+        )
+        for chunk in chunks:
+            end = start + len(chunk)
+            if end > rows:
+                raise ValueError("File changed while converting")
+            for name, array in arrays.items():
+                if name in lookups:
+                    array[start:end] = _encode(chunk[name], lookups[name])
+                else:
+                    array[start:end] = chunk[name].to_numpy(dtype=array.dtype)
+            start = end
+        if start != rows:
+            raise ValueError("File changed while converting")
+
+        for name, array in arrays.items():
+            array.flush()
+        for spec in columns:
+            if spec["kind"] == "string":
+                with open(os.path.join(tmp, spec["categories"]), "w") as f:
+                    json.dump(list(lookups[spec["name"]]), f, default=str)
+        return cls._publish(csv_path, tmp, st, rows, columns)
+
+    @classmethod
+    def _staging(cls, csv_path):
+        tmp = f"{cls.store_dir(csv_path)}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        return tmp
+
+    @classmethod
+    def _publish(cls, csv_path, tmp, st, rows, columns):
+        meta = {
+            "source_mtime_ns": st.st_mtime_ns,
+            "source_size": st.st_size,
+            "rows": int(rows),
+            "columns": columns,
+        }
+        with open(os.path.join(tmp, META_FILE), "w") as f:
+            json.dump(meta, f)
+
+        target = cls.store_dir(csv_path)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+        logger.info("✓ Columnar copy written: %s", target)
+        return cls(target, meta)
+
+    @classmethod
+    def open(cls, csv_path):
+        """Open the columnar copy of csv_path, or None if missing or stale"""
+        path = cls.store_dir(csv_path)
+        try:
+            with open(os.path.join(path, META_FILE)) as f:
+                meta = json.load(f)
+            st = os.stat(csv_path)
+        except (OSError, ValueError):
+            return None
+
+        if (meta["source_mtime_ns"], meta["source_size"]) != (
+            st.st_mtime_ns,
+            st.st_size,
+        ):
+            return None
+        return cls(path, meta)
+
+    @classmethod
+    def remove(cls, csv_path):
+        """Delete the columnar copy of csv_path if there is one"""
+        shutil.rmtree(cls.store_dir(csv_path), ignore_errors=True)
+
+    @property
+    def rows(self):
+        return self.meta["rows"]
+
+    @property
+    def columns(self):
+        return [col["name"] for col in self.meta["columns"]]
+
+    @property
+    def dtypes(self):
+        return {col["name"]: col["dtype"] for col in self.meta["columns"]}
+
+    def column(self, name):
+        """Return the values of one column, memory-mapping it on first use"""
+        if name not in self._arrays:
+            self._arrays[name] = self._read_column(self._spec(name))
+        return self._arrays[name]
+
+    def to_frame(self, columns=None):
+        """The requested columns (all by default) as a DataFrame
+
+        Numeric columns are the memory maps themselves, not copies, so the
+        frame is read-only and its pages are shared between processes.
+        """
+        names = self.columns if columns is None else list(columns)
+        return pd.DataFrame(
+            {name: self.column(name) for name in names},
+            index=pd.RangeIndex(self.rows),
+            columns=names,
+            copy=False,
+        )
+
+    def take(self, rows, columns=None):
+        """DataFrame of the given row ids, reading only those rows"""
+        names = self.columns if columns is None else list(columns)
+        rows = np.asarray(rows, dtype=np.intp)
+        data = {}
+        for name in names:
+            spec = self._spec(name)
+            if spec["kind"] != "string":
+                data[name] = np.asarray(self.column(name)[rows])
+                continue
+            codes = np.load(os.path.join(self.path, spec["file"]), mmap_mode="r")[rows]
+            data[name] = self._decode(spec, codes)
+        return pd.DataFrame(
+            data, index=pd.RangeIndex(len(rows)), columns=names, copy=False
+        )
+
+    def _spec(self, name):
+        for col in self.meta["columns"]:
+            if col["name"] == name:
+                return col
+        raise KeyError(name)
+
+    def _read_column(self, spec):
+        data = np.load(os.path.join(self.path, spec["file"]), mmap_mode="r")
+        if spec["kind"] != "string":
+            return data
+        return self._decode(spec, data)
+
+    def _decode(self, spec, data):
+        with open(os.path.join(self.path, spec["categories"])) as f:
+            categories = json.load(f)
+        if spec["dtype"] == "category":
+            return pd.Categorical.from_codes(data, categories)
+        # Code -1 selects the trailing NaN, matching pandas' missing marker
+        lookup = np.array(categories + [np.nan], dtype=object)
+        return lookup[data]
+
+    @staticmethod
+    def _write_column(folder, i, name, series):
+        spec = {"name": name, "dtype": str(series.dtype), "file": f"{i}.npy"}
+        if _is_binary(series.dtype):
+            spec["kind"] = "numeric"
+            np.save(os.path.join(folder, spec["file"]), series.to_numpy())
+        else:
+            spec["kind"] = "string"
+            spec["categories"] = f"{i}.categories.json"
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Keep the category order so the column reads back unchanged
+                codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+            else:
+                codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            np.save(os.path.join(folder, spec["file"]), codes.astype(np.int32))
+            with open(os.path.join(folder, spec["categories"]), "w") as f:
+                json.dump(np.asarray(uniques, dtype=object).tolist(), f, default=str)
+        return spec
@@ -0,0 +1,141 @@
+# correlation.py - Correlation Engine Module
+
+import os
+import logging
+import numpy as np
+import pandas as pd
+from sketches import PairwiseMoments
+
+logger = logging.getLogger(__name__)
+
+METHODS = ("pearson", "spearman")
+# Rows converted to float64 and multiplied at a time; Pearson never holds
+# more than one such block of the frame (Spearman ranks the whole frame)
+BLOCK_ROWS = int(os.environ.get("CORRELATION_BLOCK_ROWS", 65_536))
+# Wider matrices are cut to their most correlated columns for the heatmap
+MAX_HEATMAP_COLUMNS = int(os.environ.get("MAX_HEATMAP_COLUMNS", 40))
+# Cells are labelled with their value up to this many columns
+MAX_ANNOTATED_COLUMNS = 15
+
+
+def _numeric(df, columns=None):
+    if columns is None:
+        # select_dtypes() would copy the frame just to name its columns
+        columns = [
+            col
+            for col, dtype in df.dtypes.items()
+            if pd.api.types.is_numeric_dtype(dtype)
+            and not pd.api.types.is_bool_dtype(dtype)
+        ]
+    # A view of the columns; df[columns] would copy them
+    return pd.DataFrame({col: df[col] for col in columns}, copy=False)
+
+
+def correlation_matrix(df, method="pearson", columns=None, block_rows=BLOCK_ROWS):
+    """Correlation matrix of the numeric columns of df, as DataFrame.corr() gives
+
+    Pearson is computed as matrix products over blocks of ``block_rows``
+    rows. Without missing values each block is standardized and
+    multiplied once; otherwise pairwise counts and sums are accumulated
+    with null masks, so each pair uses the rows where both are present.
+    Spearman is Pearson on average ranks; ranks are taken over each
+    column's non-null values. Raises ValueError for an unknown method.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Invalid correlation method: {method}")
+    numeric = _numeric(df, columns)
+    if method == "spearman":
+        numeric = numeric.rank()
+
+    names = list(numeric.columns)
+    if not any(numeric[col].hasnans for col in names):
+        return _frame(_dense_pearson(numeric, block_rows), names)
+
+    moments = PairwiseMoments()
+    for start in range(0, len(numeric), block_rows):
+        moments.update(numeric.iloc[start : start + block_rows])
+    return moments.correlation(names)
+
+
+def _blocks(frame, block_rows):
+    for start in range(0, len(frame), block_rows):
+        yield frame.iloc[start : start + block_rows].to_numpy(dtype=np.float64)
+
+
+def _dense_pearson(frame, block_rows):
+    n, k = frame.shape
+    if n < 2:
+        return np.full((k, k), np.nan)
+    total = np.zeros(k)
+    for block in _blocks(frame, block_rows):
+        total += block.sum(axis=0)
+    mean = total / n
+    product = np.zeros((k, k))
+    for block in _blocks(frame, block_rows):
+        centered = block - mean
+        product += centered.T @ centered
+
+    # Constant columns get a zero scale here and NaN correlations below
+    constant = (frame.min() == frame.max()).to_numpy(dtype=bool)
+    scale = 1.0 / np.sqrt(np.where(constant, np.inf, np.diag(product)))
+    product *= np.outer(scale, scale)
+    product[:, constant] = np.nan
+    product[constant, :] = np.nan
+    np.fill_diagonal(product, np.where(constant, np.nan, 1.0))
+    return np.clip(product, -1.0, 1.0)
+
+
+def _frame(matrix, names):
+    return pd.DataFrame(matrix, index=names, columns=names)
+
+
+def dataset_correlation(filepath, df, method="pearson", cache=None, options=()):
+    """correlation_matrix() of a loaded dataset, cached per version of filepath
+
+    ``options`` distinguishes loads of the same file with other columns.
+    """
+    if cache is None:
+        return correlation_matrix(df, method)
+    return cache.get_or_load(
+        filepath,
+        lambda: correlation_matrix(df, method),
+        options=("correlation", method) + tuple(options),
+    )
+
+
+def top_pairs(corr, n=20):
+    """The n column pairs with the largest absolute correlation
+
+    Returns dicts with ``x``, ``y`` and ``r``; pairs without a defined
+    correlation are skipped.
+    """
+    matrix = corr.to_numpy(dtype=np.float64)
+    i, j = np.triu_indices(len(matrix), k=1)
+    r = matrix[i, j]
+    keep = ~np.isnan(r)
+    i, j, r = i[keep], j[keep], r[keep]
+    picked = np.argsort(-np.abs(r), kind="stable")[:n]
+    names = list(corr.columns)
+    return [{"x": names[i[p]], "y": names[j[p]], "r": float(r[p])} for p in picked]
+
+
+def heatmap_matrix(corr, max_columns=MAX_HEATMAP_COLUMNS):
+    """Columns of corr cut to a readable heatmap and ordered by similarity
+
+    Beyond ``max_columns`` only the columns with the largest mean absolute
+    correlation are kept. Columns are then ordered along the Fiedler
+    vector of the |r| similarity graph, which places strongly correlated
+    columns next to each other so blocks show up on the diagonal.
+    """
+    strength = np.nan_to_num(np.abs(corr.to_numpy(dtype=np.float64)))
+    np.fill_diagonal(strength, 0.0)
+    if len(strength) > max_columns:
+        keep = np.sort(np.argsort(-strength.mean(axis=1), kind="stable")[:max_columns])
+        strength = strength[np.ix_(keep, keep)]
+        corr = corr.iloc[keep, keep]
+    if len(strength) > 2:
+        laplacian = np.diag(strength.sum(axis=1)) - strength
+        _, vectors = np.linalg.eigh(laplacian)
+        order = np.argsort(vectors[:, 1], kind="stable")
+        corr = corr.iloc[order, order]
+    return corr
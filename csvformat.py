@@ -0,0 +1,45 @@
+# csvformat.py - CSV Dialect Detection Module
+
+import csv
+
+SNIFF_BYTES = 64 * 1024
+DELIMITERS = ",;\t|"
+
+
+def sniff(sample):
+    """read_csv options (sep, quotechar, encoding) guessed from leading bytes"""
+    if sample.startswith(b"\xef\xbb\xbf"):
+        encoding = "utf-8-sig"
+    elif sample.startswith((b"\xff\xfe", b"\xfe\xff")):
+        encoding = "utf-16"
+    else:
+        try:
+            # Ignore a multi-byte character cut off at the end of the sample
+            sample.decode("utf-8")
+            encoding = "utf-8"
+        except UnicodeDecodeError as e:
+            encoding = "utf-8" if e.start >= len(sample) - 3 else "latin-1"
+
+    text = sample.decode(encoding, errors="ignore")
+    lines = text.splitlines()
+    options = {"sep": ",", "quotechar": '"', "encoding": encoding}
+    if len(lines) > 1:
+        # The last line of a sample is usually cut short
+        text = "\n".join(lines[:-1]) if len(lines) > 2 else text
+    try:
+        dialect = csv.Sniffer().sniff(text, delimiters=DELIMITERS)
+    except csv.Error:
+        return options
+
+    # Commas in the header beat a sniffed alternative from free-text fields
+    header = lines[0] if lines else ""
+    if dialect.delimiter == "," or "," not in header:
+        options["sep"] = dialect.delimiter
+    options["quotechar"] = dialect.quotechar or '"'
+    return options
+
+
+def csv_options(filepath):
+    """read_csv options for the CSV file at filepath"""
+    with open(filepath, "rb") as f:
+        return sniff(f.read(SNIFF_BYTES))
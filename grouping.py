@@ -0,0 +1,285 @@
+# grouping.py - Group-By Aggregation Module
+
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+AGGREGATIONS = ("count", "sum", "mean", "min", "max", "median", "std", "nunique")
+# Aggregations that also apply to text columns
+TEXT_AGGREGATIONS = ("count", "nunique")
+# Bucket widths for time columns: fixed spans are floored, calendar ones use periods
+TIME_FLOORS = {
+    "minute": pd.Timedelta(minutes=1),
+    "hour": pd.Timedelta(hours=1),
+    "day": pd.Timedelta(days=1),
+}
+TIME_PERIODS = {"week": "W", "month": "M", "quarter": "Q", "year": "Y"}
+MAX_PIVOT_COLUMNS = 100
+
+
+def parse_query(spec):
+    """Validated, canonical form of an aggregation query
+
+    ``spec`` is a dict with ``by`` (column names), ``aggregations``
+    (column name to a list of AGGREGATIONS), and optionally ``bucket``
+    (``{"column": ..., "freq": ...}``), ``pivot`` (a column whose values
+    become output columns), ``sort`` (an output column), ``ascending``
+    and ``limit``. Raises ValueError for a malformed query.
+    """
+    by = spec.get("by") or []
+    by = [by] if isinstance(by, str) else list(by)
+
+    aggregations = {}
+    for column, funcs in (spec.get("aggregations") or {}).items():
+        funcs = [funcs] if isinstance(funcs, str) else list(funcs)
+        for func in funcs:
+            if func not in AGGREGATIONS:
+                raise ValueError(f"Invalid aggregation: {func}")
+        aggregations[column] = funcs
+    if not aggregations:
+        aggregations = {"*": ["count"]}
+
+    bucket = spec.get("bucket")
+    if bucket:
+        freq = bucket.get("freq", "day")
+        if freq not in TIME_FLOORS and freq not in TIME_PERIODS:
+            raise ValueError(f"Invalid time bucket: {freq}")
+        bucket = {"column": bucket["column"], "freq": freq}
+
+    pivot = spec.get("pivot")
+    if pivot and not (by or bucket):
+        raise ValueError("A pivot needs at least one group-by column")
+
+    limit = spec.get("limit")
+    if limit is not None:
+        limit = int(limit)
+        if limit < 0:
+            raise ValueError(f"Invalid limit: {limit}")
+    return {
+        "by": by,
+        "aggregations": aggregations,
+        "bucket": bucket or None,
+        "pivot": pivot or None,
+        "sort": spec.get("sort"),
+        "ascending": bool(spec.get("ascending", spec.get("sort") is None)),
+        "limit": limit,
+    }
+
+
+def query_key(query):
+    """Stable string form of a parsed query, for cache keys"""
+    return json.dumps(query, sort_keys=True, default=str)
+
+
+def query_columns(query):
+    """Source columns a parsed query reads"""
+    columns = list(query["by"])
+    if query["bucket"]:
+        columns.append(query["bucket"]["column"])
+    if query["pivot"]:
+        columns.append(query["pivot"])
+    columns += [col for col in query["aggregations"] if col != "*"]
+    return list(dict.fromkeys(columns))
+
+
+def key_columns(query):
+    """Output columns of a parsed query that hold group keys, pivot excluded"""
+    columns = list(query["by"])
+    if query["bucket"]:
+        columns.append(query["bucket"]["column"])
+    return list(dict.fromkeys(columns))
+
+
+def time_bucket(series, freq):
+    """Start of the ``freq`` bucket (minute ... year) holding each timestamp"""
+    if not pd.api.types.is_datetime64_any_dtype(series.dtype):
+        series = pd.to_datetime(series, errors="coerce")
+    if freq in TIME_FLOORS:
+        return series.dt.floor(TIME_FLOORS[freq])
+    return series.dt.to_period(TIME_PERIODS[freq]).dt.start_time
+
+
+def _codes(series):
+    """Integer codes and their labels for one key column; -1 marks a null"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy().astype(np.int64), series.cat.categories
+    codes, labels = pd.factorize(series, sort=True)
+    return codes.astype(np.int64), labels
+
+
+def _group_ids(codes, sizes):
+    """Dense group id per row, in key order, and the mask of rows with no null key
+
+    Key codes are packed into one integer per row (mixed radix), and the
+    packed values are renumbered by counting or, when too many keys are
+    possible, by hashing, so grouping costs one pass however many key
+    columns there are.
+    """
+    present = np.logical_and.reduce([c >= 0 for c in codes])
+    packed = np.zeros(len(codes[0]), dtype=np.int64)
+    span = 1
+    for c, size in zip(codes, sizes):
+        size = max(size, 1)
+        if span * size >= 2**62:
+            # Re-number the combinations seen so far before the radix overflows
+            packed, seen = pd.factorize(packed, sort=True)
+            span = len(seen)
+        packed = packed * size + np.where(c < 0, 0, c)
+        span *= size
+    packed = packed[present]
+    if span <= 4 * len(packed):
+        # Few possible keys: renumber the ones in use with a counting pass
+        used = np.bincount(packed, minlength=span) > 0
+        return (np.cumsum(used) - 1)[packed], present
+    ids, _ = pd.factorize(packed, sort=True)
+    return ids, present
+
+
+def _reduce(series, ids, groups, func, order, starts):
+    """One aggregation of one value column over every group"""
+    if func == "median":
+        return series.groupby(ids, sort=True).median().reindex(range(groups)).to_numpy()
+
+    if func == "nunique":
+        # Distinct (group, value) pairs, counted per group
+        codes, uniques = pd.factorize(series)
+        keep = codes >= 0
+        pairs = pd.unique(ids[keep].astype(np.int64) * len(uniques) + codes[keep])
+        return np.bincount(pairs // max(len(uniques), 1), minlength=groups)
+
+    if func == "count":
+        valid = series.notna().to_numpy()
+        return np.bincount(ids, weights=valid, minlength=groups).astype(np.int64)
+
+    # Integer columns have no nulls, so their sums and extremes stay integers
+    exact = pd.api.types.is_integer_dtype(series.dtype)
+    if func == "sum" and exact:
+        # bincount weights are float64, which rounds sums past 2**53
+        total = np.zeros(groups, dtype=np.int64)
+        np.add.at(total, ids, series.to_numpy(dtype=np.int64, na_value=0))
+        return total
+
+    x = series.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(x)
+    count = np.bincount(ids, weights=valid, minlength=groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if func in ("min", "max"):
+            if groups == 0:
+                return x[:0]
+            # fmin/fmax skip NaN, so each group reduces over its present values
+            ufunc = np.fmin if func == "min" else np.fmax
+            extreme = ufunc.reduceat(x[order], starts)
+            return extreme.astype(np.int64) if exact else extreme
+        if func == "std":
+            # Centered on the column mean to keep the sums well conditioned
+            shift = np.nanmean(x) if valid.any() else 0.0
+            d = np.where(valid, x - shift, 0.0)
+            s1 = np.bincount(ids, weights=d, minlength=groups)
+            s2 = np.bincount(ids, weights=d * d, minlength=groups)
+            var = np.maximum(s2 - s1 * s1 / count, 0.0) / (count - 1)
+            return np.where(count > 1, np.sqrt(var), np.nan)
+        total = np.bincount(ids, weights=np.where(valid, x, 0.0), minlength=groups)
+        if func == "sum":
+            return total
+        return np.where(count > 0, total / count, np.nan)
+
+
+def aggregate(df, query):
+    """Group df by the query's keys and compute its aggregations
+
+    Returns a DataFrame with one row per group, sorted by key unless the
+    query sorts by an output column. Output columns are named
+    ``<column>_<aggregation>`` (``count`` for ``"*"``); with a pivot, one
+    column per pivot value follows each of them. Rows with a null key are
+    left out, as DataFrame.groupby() does. Raises ValueError for unknown
+    columns or an aggregation that does not fit a column's type.
+    """
+    query = parse_query(query)
+    for col in query_columns(query):
+        if col not in df.columns:
+            raise ValueError(f"Column not found: {col}")
+
+    keys = {col: df[col] for col in query["by"]}
+    if query["bucket"]:
+        bucket = query["bucket"]
+        keys[bucket["column"]] = time_bucket(df[bucket["column"]], bucket["freq"])
+    pivot = query["pivot"]
+    if pivot:
+        keys[pivot] = df[pivot]
+    if not keys:
+        raise ValueError("Nothing to group by")
+
+    codes, labels = zip(*(_codes(series) for series in keys.values()))
+    ids, present = _group_ids(codes, [len(l) for l in labels])
+    groups = int(ids.max()) + 1 if len(ids) else 0
+
+    # Rows sorted by group, for the sort-based reductions
+    order = np.argsort(ids, kind="stable")
+    starts = np.searchsorted(ids[order], np.arange(groups))
+    first = order[starts]
+
+    result = {}
+    for col, c, label in zip(keys, codes, labels):
+        result[col] = np.asarray(label)[c[present][first]]
+    for col, funcs in query["aggregations"].items():
+        series = (
+            pd.Series(np.ones(len(ids))) if col == "*" else df[col][present]
+        ).reset_index(drop=True)
+        numeric = col == "*" or (
+            pd.api.types.is_numeric_dtype(series.dtype)
+            and not pd.api.types.is_bool_dtype(series.dtype)
+        )
+        for func in funcs:
+            if not numeric and func not in TEXT_AGGREGATIONS:
+                raise ValueError(f"Cannot compute {func} of non-numeric column {col}")
+            name = "count" if col == "*" else f"{col}_{func}"
+            result[name] = _reduce(series, ids, groups, func, order, starts)
+
+    # Not copied: consolidating a wide result can cost more than the grouping
+    frame = pd.DataFrame(result, copy=False)
+    if pivot:
+        frame = _pivot(frame, key_columns(query), pivot)
+
+    if query["sort"]:
+        if query["sort"] not in frame.columns:
+            raise ValueError(f"Column not found: {query['sort']}")
+        frame = frame.sort_values(
+            query["sort"],
+            ascending=query["ascending"],
+            kind="stable",
+            ignore_index=True,
+        )
+    if query["limit"] is not None:
+        frame = frame.head(query["limit"])
+    logger.info("✓ Aggregated %s rows into %s groups", len(df), len(frame))
+    return frame
+
+
+def _pivot(frame, index, pivot):
+    if frame[pivot].nunique() > MAX_PIVOT_COLUMNS:
+        raise ValueError(f"Pivot column has more than {MAX_PIVOT_COLUMNS} values")
+    values = [col for col in frame.columns if col not in index and col != pivot]
+    wide = frame.pivot(index=index, columns=pivot, values=values)
+    wide.columns = [
+        str(value) if len(values) == 1 else f"{name} {value}"
+        for name, value in wide.columns
+    ]
+    return wide.reset_index()
+
+
+def cached_aggregate(filepath, df, query, cache=None, options=()):
+    """aggregate() of a loaded dataset, cached per version of filepath and query
+
+    ``options`` distinguishes loads of the same file with other columns.
+    """
+    query = parse_query(query)
+    if cache is None:
+        return aggregate(df, query)
+    return cache.get_or_load(
+        filepath,
+        lambda: aggregate(df, query),
+        options=("aggregate", query_key(query)) + tuple(options),
+    )
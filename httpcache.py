@@ -0,0 +1,124 @@
+# httpcache.py - HTTP Caching Module
+#
+# Validators and compression for responses derived from a dataset. ETags
+# hash the dataset's content, so a client that already has a response can
+# be answered with 304 Not Modified before any of the work is redone.
+
+import os
+import re
+import gzip
+import hashlib
+import logging
+from datetime import datetime, timezone
+from cache import content_hash
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when a response's format changes without its dataset changing
+RESPONSE_VERSION = 1
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+COMPRESSIBLE = {
+    "application/json",
+    "application/x-ndjson",
+    "text/html",
+    "text/plain",
+    "text/csv",
+    "text/css",
+    "text/javascript",
+    "image/svg+xml",
+}
+# Chart files named by their cache key never change once written
+IMMUTABLE = "public, max-age=31536000, immutable"
+CONTENT_ADDRESSED = re.compile(r"_[0-9a-f]{16}\.(png|webp|jpe?g|svg)$")
+# Clients may keep dataset responses but must revalidate them before use
+REVALIDATE = "no-cache"
+
+
+def dataset_validators(filepath, *parts):
+    """ETag and Last-Modified time of a response derived from filepath
+
+    The ETag covers the dataset's content hash and ``parts``, such as the
+    request path and query string, so it changes with either.
+    """
+    digest = hashlib.sha1(
+        repr((RESPONSE_VERSION, content_hash(filepath)) + parts).encode()
+    ).hexdigest()[:20]
+    # HTTP dates have whole-second precision
+    mtime = int(os.stat(filepath).st_mtime)
+    return digest, datetime.fromtimestamp(mtime, timezone.utc)
+
+
+def _encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def fresh_etag(request, etag, last_modified=None):
+    """ETag of the client's copy when it is current, else None
+
+    Compressed responses carry the ETag with an encoding suffix, and a 304
+    must repeat the exact tag the client holds, so the matching variant is
+    returned. If-Modified-Since only counts without If-None-Match.
+    """
+    if request.if_none_match:
+        tags = [etag] + [f"{etag}-{encoding}" for encoding in _encodings()]
+        return next(
+            (tag for tag in tags if request.if_none_match.contains_weak(tag)), None
+        )
+    if request.if_modified_since and last_modified is not None:
+        if last_modified <= request.if_modified_since:
+            return etag
+    return None
+
+
+def set_validators(response, etag, last_modified=None, cache_control=REVALIDATE):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def compress(request, response):
+    """Compress a large text response with brotli or gzip, if the client accepts it
+
+    The ETag gets the encoding as a suffix, since the bytes differ from
+    the uncompressed response's.
+    """
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+
+    accepted = request.accept_encodings
+    encoding = next((name for name in _encodings() if accepted[name] > 0), None)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    if encoding == "br":
+        body = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        body = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    logger.debug("✓ Compressed %s to %s bytes (%s)", len(data), len(body), encoding)
+    return response
@@ -0,0 +1,158 @@
+# incremental.py - Incremental Append Module
+
+import io
+import os
+import pickle
+import shutil
+import logging
+import threading
+import pandas as pd
+from csvformat import csv_options
+from streaming import StreamingAnalyzer
+
+logger = logging.getLogger(__name__)
+
+STATE_DIRNAME = ".summary"
+# Bump when StreamingAnalyzer gains state, so older pickles are rebuilt
+STATE_VERSION = 3
+
+# Appends rewrite the file and its state, so they take turns
+_append_lock = threading.Lock()
+
+
+class SummaryStore:
+    """Pickled StreamingAnalyzer state kept next to each stored dataset
+
+    The state records the size and mtime of the file it summarizes and is
+    ignored once the file changes by any other route than append_rows().
+    """
+
+    @staticmethod
+    def state_path(csv_path):
+        """File holding the summary state of csv_path"""
+        folder, name = os.path.split(os.path.abspath(csv_path))
+        return os.path.join(folder, STATE_DIRNAME, f"{name}.pkl")
+
+    @classmethod
+    def load(cls, csv_path):
+        """The summaries of csv_path, or None if missing or stale"""
+        try:
+            with open(cls.state_path(csv_path), "rb") as f:
+                version, source, analyzer = pickle.load(f)
+            st = os.stat(csv_path)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if version != STATE_VERSION or source != (st.st_mtime_ns, st.st_size):
+            return None
+        analyzer.filepath = csv_path
+        return analyzer
+
+    @classmethod
+    def save(cls, csv_path, analyzer):
+        """Persist the summaries of csv_path as it is on disk now"""
+        path = cls.state_path(csv_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        st = os.stat(csv_path)
+        tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp, "wb") as f:
+            pickle.dump((STATE_VERSION, (st.st_mtime_ns, st.st_size), analyzer), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def remove(cls, csv_path):
+        """Delete the summary state of csv_path if there is one"""
+        try:
+            os.remove(cls.state_path(csv_path))
+        except OSError:
+            pass
+
+    @classmethod
+    def load_or_build(cls, csv_path):
+        """Current summaries of csv_path, streaming the file once if needed
+
+        Check ``loaded`` on the result: it is False if the file could not
+        be read.
+        """
+        analyzer = cls.load(csv_path)
+        if analyzer is None:
+            analyzer = StreamingAnalyzer(csv_path)
+            if analyzer.loaded:
+                cls.save(csv_path, analyzer)
+        return analyzer
+
+
+def append_rows(csv_path, data):
+    """Append CSV rows (with a header line) to csv_path and fold them in
+
+    Only the new rows are parsed: they update the stored summaries, and
+    their bytes, minus the header, are appended to the file. Raises
+    ValueError when the columns differ from the dataset's. Returns the
+    updated StreamingAnalyzer and the number of rows added.
+    """
+    with _append_lock:
+        analyzer = SummaryStore.load_or_build(csv_path)
+        if not analyzer.loaded:
+            raise ValueError("Failed to load data")
+
+        options = csv_options(csv_path)
+        # Text columns stay text: read alone, "02134" would become 2134
+        text = {
+            col: object
+            for col, dtype in analyzer.dtypes.items()
+            if not pd.api.types.is_numeric_dtype(dtype)
+        }
+        rows = pd.read_csv(io.BytesIO(data), dtype=text, **options)
+        if list(rows.columns) != analyzer.columns:
+            raise ValueError("Appended columns do not match the dataset")
+        if len(rows) == 0:
+            return analyzer, 0
+
+        body = data[data.index(b"\n") + 1 :]
+        if not body.endswith(b"\n"):
+            body += b"\n"
+        _append_bytes(csv_path, body)
+
+        if _same_kinds(analyzer.dtypes, rows.dtypes):
+            analyzer.update(rows)
+        else:
+            # A numeric or boolean column now holds text, which turns the
+            # whole column into text; only a new pass gives its summaries
+            logger.info("Column types changed, re-streaming %s", csv_path)
+            analyzer = StreamingAnalyzer(csv_path)
+            if not analyzer.loaded:
+                raise ValueError("Failed to load data")
+        SummaryStore.save(csv_path, analyzer)
+        logger.info("✓ Appended %s rows to %s", len(rows), csv_path)
+        return analyzer, len(rows)
+
+
+def _same_kinds(stored, appended):
+    """Whether appended columns fold into the stored ones without retyping them"""
+    for col, dtype in stored.items():
+        new = appended[col]
+        if pd.api.types.is_bool_dtype(dtype) != pd.api.types.is_bool_dtype(new):
+            return False
+        if pd.api.types.is_numeric_dtype(dtype) != pd.api.types.is_numeric_dtype(new):
+            return False
+    return True
+
+
+def _append_bytes(csv_path, body):
+    with open(csv_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                body = b"\n" + body
+
+    if os.stat(csv_path).st_nlink == 1:
+        with open(csv_path, "ab") as f:
+            f.write(body)
+        return
+
+    # The file shares its bytes with a deduplicated upload blob; copy on write
+    tmp = f"{csv_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    shutil.copyfile(csv_path, tmp)
+    with open(tmp, "ab") as f:
+        f.write(body)
+    os.replace(tmp, csv_path)
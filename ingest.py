@@ -0,0 +1,237 @@
+# ingest.py - Streaming Upload Ingest Module
+
+import io
+import os
+import time
+import uuid
+import hashlib
+import logging
+import threading
+import pandas as pd
+from streaming import StreamingAnalyzer
+from csvformat import SNIFF_BYTES, sniff
+from metrics import timed, count_bytes, count_rows
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIRNAME = ".blobs"
+READ_BYTES = 1024 * 1024
+# Parse once this many complete lines have arrived
+PARSE_BYTES = int(os.environ.get("INGEST_PARSE_BYTES", 4 * 1024 * 1024))
+# Unlinked blobs younger than this may be about to be linked by another upload
+BLOB_GRACE_SECONDS = 60
+
+_link_lock = threading.Lock()
+
+
+class Upload:
+    """Outcome of ingesting one uploaded file
+
+    ``frame`` holds the parsed data for files up to the frame limit and
+    ``analyzer`` the streamed summaries of larger ones; both are None
+    when the bytes could not be parsed while they arrived.
+    """
+
+    def __init__(self, filepath, sha256, size, options, unchanged, frame, analyzer):
+        self.filepath = filepath
+        self.sha256 = sha256
+        self.size = size
+        self.options = options
+        self.unchanged = unchanged
+        self.frame = frame
+        self.analyzer = analyzer
+
+
+class _ChunkParser:
+    """Splits arriving CSV bytes on record boundaries and parses each batch"""
+
+    def __init__(self, options, frame_limit):
+        self.options = options
+        self.frame_limit = frame_limit
+        self.quote = options["quotechar"].encode()
+        self.header = None
+        self.pending = b""
+        self.parsed_bytes = 0
+        self.frames = []
+        self.dtypes = {}
+        self.analyzer = None
+        # Records of UTF-16 text cannot be split on single newline bytes
+        self.failed = options["encoding"] == "utf-16"
+
+    def feed(self, data, final=False):
+        if self.failed:
+            return
+        self.pending += data
+        if self.header is None:
+            end = self._boundary(self.pending)
+            if end is None:
+                if not final:
+                    return
+                end = len(self.pending)
+            self.header, self.pending = self.pending[:end], self.pending[end:]
+
+        if final:
+            end = len(self.pending)
+        elif len(self.pending) < PARSE_BYTES:
+            return
+        else:
+            end = self._boundary(self.pending)
+            if end is None:
+                return
+        region, self.pending = self.pending[:end], self.pending[end:]
+        if region.strip() or (final and not self.parsed_bytes):
+            self._parse(region)
+
+    def _boundary(self, data):
+        """End of the last complete record, skipping newlines inside quotes"""
+        pos = data.rfind(b"\n")
+        while pos >= 0:
+            if data.count(self.quote, 0, pos) % 2 == 0:
+                return pos + 1
+            pos = data.rfind(b"\n", 0, pos)
+        return None
+
+    def _parse(self, region):
+        try:
+            with timed("parse"):
+                chunk = pd.read_csv(
+                    io.BytesIO(self.header + region),
+                    sep=self.options["sep"],
+                    quotechar=self.options["quotechar"],
+                    encoding=self.options["encoding"],
+                )
+        except Exception as e:
+            logger.warning("⚠ Incremental parse stopped: %s", e)
+            self.failed = True
+            return
+        self.parsed_bytes += len(region)
+        count_rows("ingest", len(chunk))
+
+        for col, dtype in chunk.dtypes.items():
+            self.dtypes.setdefault(col, set()).add(dtype)
+        seen = len(self.header) + self.parsed_bytes
+        if self.analyzer is None and seen > self.frame_limit:
+            # Too large to keep whole: summarize what was kept so far and stream on
+            self.analyzer = StreamingAnalyzer()
+            for frame in self.frames:
+                self.analyzer.update(frame)
+            self.frames = []
+        if self.analyzer is not None:
+            self.analyzer.update(chunk)
+        else:
+            self.frames.append(chunk)
+
+    def frame(self):
+        """Concatenated chunks, or None if a full parse could type them differently"""
+        if self.failed or self.analyzer is not None or not self.frames:
+            return None
+        for dtypes in self.dtypes.values():
+            if len(dtypes) > 1 and not all(
+                pd.api.types.is_numeric_dtype(d) and not pd.api.types.is_bool_dtype(d)
+                for d in dtypes
+            ):
+                return None
+        if len(self.frames) == 1:
+            return self.frames[0]
+        return pd.concat(self.frames, ignore_index=True)
+
+    def streamed(self):
+        if self.failed or self.analyzer is None:
+            return None
+        self.analyzer.loaded = self.analyzer.columns is not None
+        return self.analyzer
+
+
+def ingest_upload(stream, filepath, frame_limit):
+    """Write an upload stream to filepath while hashing and parsing it
+
+    Bytes are read once: each block is hashed, appended to a temporary
+    file and handed to the parser. Uploads are stored by content hash in
+    ``<folder>/.blobs`` and filepath becomes a hard link to the blob, so
+    identical uploads share one file and keep their mtime, which keeps
+    every cache keyed on the file valid.
+    """
+    folder = os.path.dirname(os.path.abspath(filepath))
+    blob_dir = os.path.join(folder, BLOB_DIRNAME)
+    os.makedirs(blob_dir, exist_ok=True)
+    tmp = os.path.join(blob_dir, f"tmp-{uuid.uuid4().hex}")
+
+    digest = hashlib.sha256()
+    parser = None
+    head = b""
+    size = 0
+    try:
+        with open(tmp, "wb") as out:
+            while True:
+                block = stream.read(READ_BYTES)
+                if block:
+                    digest.update(block)
+                    out.write(block)
+                    size += len(block)
+                if parser is None:
+                    # Sniff the same leading bytes csv_options() reads later
+                    head += block
+                    if len(head) < SNIFF_BYTES and block:
+                        continue
+                    parser = _ChunkParser(sniff(head[:SNIFF_BYTES]), frame_limit)
+                    block, head = head, b""
+                if not block:
+                    break
+                parser.feed(block)
+        parser.feed(b"", final=True)
+
+        sha256 = digest.hexdigest()
+        blob = os.path.join(blob_dir, f"{sha256}.csv")
+        with _link_lock:
+            if os.path.exists(blob):
+                os.remove(tmp)
+            else:
+                os.replace(tmp, blob)
+            unchanged = os.path.exists(filepath) and os.path.samefile(filepath, blob)
+            if not unchanged:
+                _link(blob, filepath)
+                prune_blobs(folder)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    count_bytes("upload", size)
+    logger.info(
+        "✓ Ingested %s bytes as %s%s",
+        size,
+        sha256[:12],
+        " (unchanged)" if unchanged else "",
+    )
+    analyzer = parser.streamed()
+    if analyzer is not None:
+        analyzer.filepath = filepath
+    return Upload(
+        filepath, sha256, size, parser.options, unchanged, parser.frame(), analyzer
+    )
+
+
+def _link(blob, filepath):
+    """Atomically point filepath at blob, copying where hard links fail"""
+    tmp = f"{filepath}.tmp-{uuid.uuid4().hex}"
+    try:
+        os.link(blob, tmp)
+    except OSError:
+        with open(blob, "rb") as src, open(tmp, "wb") as dst:
+            while block := src.read(READ_BYTES):
+                dst.write(block)
+    os.replace(tmp, filepath)
+
+
+def prune_blobs(folder):
+    """Delete stored blobs that no upload links to any more"""
+    blob_dir = os.path.join(folder, BLOB_DIRNAME)
+    cutoff = time.time() - BLOB_GRACE_SECONDS
+    for name in os.listdir(blob_dir):
+        path = os.path.join(blob_dir, name)
+        try:
+            st = os.stat(path)
+            if name.endswith(".csv") and st.st_nlink == 1 and st.st_ctime < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
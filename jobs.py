@@ -0,0 +1,107 @@
+# jobs.py - Background Job Module
+
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 16))
+JOB_TTL = int(os.environ.get("JOB_TTL", 3600))
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are queued or running"""
+
+
+class Job:
+    """State of one background job, updated by the job function as it runs"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.stage = "queued"
+        self.percent = 0
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.updated = self.created
+
+    def progress(self, stage, percent):
+        """Report the stage the job has reached"""
+        self.stage = stage
+        self.percent = percent
+        self.updated = time.time()
+        logger.info("Job %s: %s (%s%%)", self.id[:8], stage, percent)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "percent": self.percent,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Runs jobs on a fixed-size thread pool behind a bounded queue"""
+
+    def __init__(self, max_workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, ttl=JOB_TTL):
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job"
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        """Queue func(job, *args) and return the job's id
+
+        Raises JobQueueFull when ``max_queued`` jobs are already pending.
+        """
+        with self._lock:
+            self._prune()
+            active = sum(
+                job.status in ("queued", "running") for job in self._jobs.values()
+            )
+            if active >= self.max_queued:
+                raise JobQueueFull("Too many jobs in progress")
+            job = Job()
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, func, args)
+        return job.id
+
+    def get(self, job_id):
+        """Snapshot of a job's state, or None if unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def _run(self, job, func, args):
+        job.status = "running"
+        try:
+            job.result = func(job, *args)
+            job.status = "done"
+            job.progress("done", 100)
+        except Exception as e:
+            logger.error("✗ Job %s failed: %s", job.id[:8], e)
+            job.status = "failed"
+            job.error = str(e)
+            job.updated = time.time()
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status in ("done", "failed") and job.updated < cutoff
+        ]:
+            del self._jobs[job_id]
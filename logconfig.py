@@ -0,0 +1,171 @@
+# logconfig.py - Logging Configuration Module
+#
+# The one place logging is configured. Modules only create their logger
+# with logging.getLogger(__name__) and log with %-style arguments, so a
+# message is only formatted when a handler actually writes it.
+
+import os
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+
+# "development" logs every line; "production" rate-limits lines below
+# WARNING and adds timestamps and process ids
+LOG_MODE = os.environ.get("LOG_MODE", "development")
+LOG_LEVEL = os.environ.get("LOG_LEVEL")
+# Lines per second allowed for each message template (0 = unlimited),
+# with bursts of up to LOG_BURST lines
+LOG_RATE = float(os.environ.get("LOG_RATE", 1 if LOG_MODE == "production" else 0))
+LOG_BURST = int(os.environ.get("LOG_BURST", 10))
+# Records waiting for the writer thread; INFO and below are dropped beyond this
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10_000))
+
+FORMATS = {
+    "development": "%(levelname)s:%(name)s:%(message)s",
+    "production": "%(asctime)s %(process)d %(levelname)s %(name)s: %(message)s",
+}
+
+_lock = threading.Lock()
+_handler = None
+_output = None
+_listener = None
+_settings = None
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per message template; WARNING and above always pass
+
+    Records are keyed by logger and unformatted message, so every call
+    site (for example each route's access line) gets its own budget of
+    ``rate`` lines per second with bursts of ``burst``.
+    """
+
+    def __init__(self, rate=LOG_RATE, burst=LOG_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.suppressed = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            if not allowed:
+                self.suppressed += 1
+        return allowed
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the writer thread
+
+    The standard handler formats each record before queueing it, in the
+    thread that logged. Records stay in this process, so they are queued
+    as they are. When the queue is full, lines below WARNING are dropped
+    rather than blocking the caller.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        if record.levelno >= logging.WARNING:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(mode=None, level=None, stream=None, rate=None):
+    """Send all logging through a queue drained by one writer thread
+
+    Safe to call more than once: without arguments it keeps an existing
+    configuration of this process. Arguments fall back to LOG_MODE,
+    LOG_LEVEL and LOG_RATE; ``stream`` defaults to stderr. Forked children
+    get their own writer thread.
+    """
+    with _lock:
+        current = _listener is not None and _settings["pid"] == os.getpid()
+        if current and mode is level is stream is rate is None:
+            return _handler
+        mode = mode or LOG_MODE
+        if mode not in FORMATS:
+            raise ValueError(f"Invalid log mode: {mode}")
+        settings = {
+            "mode": mode,
+            "level": (level or LOG_LEVEL or "INFO").upper(),
+            "stream": stream,
+            "rate": LOG_RATE if rate is None else rate,
+        }
+        _start(settings)
+        return _handler
+
+
+def _start(settings):
+    global _handler, _output, _listener, _settings
+    _stop()
+    output = logging.StreamHandler(settings["stream"] or sys.stderr)
+    output.setFormatter(logging.Formatter(FORMATS[settings["mode"]]))
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = DeferredQueueHandler(log_queue)
+    if settings["rate"] > 0:
+        handler.addFilter(RateLimitFilter(settings["rate"], LOG_BURST))
+
+    root = logging.getLogger()
+    for previous in (_handler, _output):
+        if previous is not None:
+            root.removeHandler(previous)
+    root.addHandler(handler)
+    root.setLevel(settings["level"])
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+    _handler, _output = handler, output
+    _settings = dict(settings, pid=os.getpid())
+
+
+def _stop():
+    global _listener
+    if _listener is not None and _settings["pid"] == os.getpid():
+        _listener.stop()
+        # Anything logged from now on, e.g. during interpreter exit, is
+        # written directly instead of waiting in a queue nobody drains
+        root = logging.getLogger()
+        root.removeHandler(_handler)
+        root.addHandler(_output)
+    _listener = None
+
+
+def shutdown_logging():
+    """Write out queued records and stop the writer thread"""
+    with _lock:
+        _stop()
+
+
+def _after_fork():
+    # The writer thread does not survive a fork; the child starts its own
+    global _lock
+    _lock = threading.Lock()
+    if _settings is not None:
+        _start(dict(_settings))
+
+
+atexit.register(shutdown_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
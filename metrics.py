@@ -0,0 +1,272 @@
+# metrics.py - Latency and Throughput Metrics Module
+
+import os
+import re
+import time
+import pstats
+import logging
+import cProfile
+import threading
+import contextlib
+import contextvars
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+# Requests slower than this are logged with their stage breakdown
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", 1.0))
+# Run every request under cProfile and keep reports of the slow ones
+PROFILE_SLOW_REQUESTS = os.environ.get("PROFILE_SLOW_REQUESTS", "0") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_LINES = 40
+
+# (stage, seconds) pairs of the request being handled, when one is
+_request_stages = contextvars.ContextVar("request_stages", default=None)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, rendered in Prometheus text format
+
+    Metrics are keyed by name and label values. Collectors registered with
+    ``register_collector`` are called at render time for values owned by
+    other objects, such as cache statistics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record one value in a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def register_collector(self, collector):
+        """Add a callable returning ``(name, kind, help, labels, value)`` samples"""
+        self._collectors.append(collector)
+
+    def value(self, name, **labels):
+        """Current value of a counter, or the count of a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key in self._histograms:
+                return self._histograms[key].count
+            return self._counters.get(key, 0)
+
+    def reset(self):
+        """Drop all recorded values; collectors stay registered"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        families = {}
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                families.setdefault(name, []).append((name, labels, value))
+            for (name, labels), histogram in self._histograms.items():
+                cumulative = list(zip(histogram.buckets, histogram.counts))
+                cumulative.append(("+Inf", histogram.count))
+                samples = families.setdefault(name, [])
+                for bound, count in cumulative:
+                    le = bound if bound == "+Inf" else repr(float(bound))
+                    samples.append((f"{name}_bucket", labels + (("le", le),), count))
+                samples.append((f"{name}_sum", labels, histogram.sum))
+                samples.append((f"{name}_count", labels, histogram.count))
+            help_text = dict(self._help)
+
+        for collector in self._collectors:
+            for name, kind, text, labels, value in collector():
+                help_text.setdefault(name, (kind, text))
+                families.setdefault(name, []).append(
+                    (name, tuple(sorted(labels.items())), value)
+                )
+
+        lines = []
+        for name in sorted(families):
+            kind, text = help_text.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample, labels, value in families[name]:
+                lines.append(f"{sample}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(int(value))
+
+
+registry = MetricsRegistry()
+registry.describe(
+    "stage_duration_seconds", "histogram", "Time spent in one processing stage"
+)
+registry.describe(
+    "http_request_duration_seconds", "histogram", "Time to handle a request"
+)
+registry.describe("bytes_read_total", "counter", "Bytes of data read, by source")
+registry.describe("rows_processed_total", "counter", "Rows processed, by stage")
+
+
+@contextlib.contextmanager
+def timed(stage):
+    """Time a block, or a function when used as a decorator, as one stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        registry.observe("stage_duration_seconds", seconds, stage=stage)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((stage, seconds))
+
+
+def count_bytes(source, nbytes):
+    registry.inc("bytes_read_total", nbytes, source=source)
+
+
+def count_rows(stage, rows):
+    registry.inc("rows_processed_total", rows, stage=stage)
+
+
+class RequestTrace:
+    """Stages and duration of one request, from creation to finish()
+
+    Stages timed with timed() while the trace is active are collected on
+    it. With ``profile`` the request also runs under cProfile.
+    """
+
+    def __init__(self, profile=False):
+        self.start = time.perf_counter()
+        self.stages = []
+        self.profiler = cProfile.Profile() if profile else None
+        self._token = _request_stages.set(self.stages)
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def finish(
+        self, method, route, status, slow_seconds=SLOW_REQUEST_SECONDS, profile_dir=None
+    ):
+        """Record the request; slow requests are logged and their profile saved"""
+        if self.profiler is not None:
+            self.profiler.disable()
+        _request_stages.reset(self._token)
+        seconds = time.perf_counter() - self.start
+        registry.observe(
+            "http_request_duration_seconds",
+            seconds,
+            method=method,
+            route=route,
+            status=str(status),
+        )
+
+        if seconds >= slow_seconds:
+            breakdown = ", ".join(
+                f"{stage}={s * 1000:.1f}ms" for stage, s in self.stages
+            )
+            logger.warning(
+                "⚠ Slow request %s %s: %.3fs (%s)",
+                method,
+                route,
+                seconds,
+                breakdown or "no stages",
+            )
+            if self.profiler is not None:
+                self.dump_profile(method, route, profile_dir)
+        return seconds
+
+    def dump_profile(self, method, route, folder=None):
+        """Write the request's cProfile data and a cumulative-time report"""
+        folder = folder or PROFILE_DIR
+        os.makedirs(folder, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", f"{method}{route}").strip("_")
+        base = os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}")
+        self.profiler.dump_stats(f"{base}.prof")
+        with open(f"{base}.txt", "w") as f:
+            stats = pstats.Stats(self.profiler, stream=f)
+            stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+        logger.info("✓ Profile saved: %s.txt", base)
+        return f"{base}.prof"
+
+
+# (stats key, metric name, kind, help) of the statistics a cache exposes
+CACHE_METRICS = (
+    ("hits", "cache_hits_total", "counter", "Cache lookups served"),
+    ("misses", "cache_misses_total", "counter", "Cache lookups missed"),
+    ("evictions", "cache_evictions_total", "counter", "Cache entries evicted"),
+    ("entries", "cache_entries", "gauge", "Entries held by the cache"),
+    ("bytes", "cache_bytes", "gauge", "Bytes held by the cache"),
+    ("hit_rate", "cache_hit_ratio", "gauge", "Share of cache lookups served"),
+)
+
+
+def cache_collector(name, cache):
+    """Collector exposing the stats() of a DatasetCache or ChartCache"""
+
+    def collect():
+        stats = cache.stats()
+        for key, metric, kind, text in CACHE_METRICS:
+            yield metric, kind, text, {"cache": name}, stats[key]
+
+    return collect
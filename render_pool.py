@@ -0,0 +1,285 @@
+# render_pool.py - Chart Rendering Pool Module
+
+import os
+import math
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from analyzer import DataAnalyzer
+from cache import ChartCache, chart_cache, dataset_version
+from grouping import parse_query, query_columns
+
+logger = logging.getLogger(__name__)
+
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", min(4, os.cpu_count() or 1)))
+RENDER_QUEUE_SIZE = int(os.environ.get("RENDER_QUEUE_SIZE", 32))
+RENDER_TIMEOUT = float(os.environ.get("RENDER_TIMEOUT", 30))
+
+# matplotlib is not thread-safe, so inline renders in one process take turns
+_inline_lock = threading.Lock()
+
+
+class RenderPoolBusy(Exception):
+    """Raised when the render queue is full"""
+
+
+def render_chart(filepath, name, chart_type, column, output_dir, image_format="png"):
+    """Render one chart of the dataset at filepath and return its file name
+
+    ``name`` is the user-facing dataset name used in chart file names.
+    With ``output_dir=None`` the encoded image bytes are returned instead.
+    Only the columns the chart reads are loaded. Raises ValueError for an
+    unknown chart type or a missing column.
+    """
+    analyzer, visualizer = _open(
+        filepath, output_dir, (chart_type, column), image_format
+    )
+    if analyzer is None:
+        return None
+    return _draw(analyzer, visualizer, name, chart_type, column)
+
+
+def chart_columns(analyzer, chart_type, column):
+    """Columns of the analyzer's dataset that one chart reads"""
+    if chart_type == "scatter":
+        return analyzer.get_numeric_columns()[:2]
+    if chart_type == "correlation":
+        return analyzer.get_numeric_columns()
+    if chart_type == "aggregate" and isinstance(column, dict):
+        names = query_columns(parse_query(column))
+    else:
+        names = [column]
+    return [col for col in names if col in analyzer.columns]
+
+
+def _open(filepath, output_dir, chart=None, image_format="png"):
+    from visualizer import DataVisualizer
+
+    analyzer = DataAnalyzer(filepath, lazy=True)
+    if not analyzer.loaded:
+        return None, None
+    # A (chart_type, column) spec loads that chart's columns; batches load all
+    if chart:
+        df = analyzer.frame_of(lambda: chart_columns(analyzer, *chart))
+    else:
+        df = analyzer.frame()
+    visualizer = DataVisualizer(
+        df,
+        output_dir=output_dir,
+        cache=chart_cache,
+        dataset_version=dataset_version(filepath),
+        dataset=filepath,
+        image_format=image_format,
+    )
+    return analyzer, visualizer
+
+
+def _draw(analyzer, visualizer, name, chart_type, column):
+    ext = visualizer.image_format
+    if chart_type == "histogram" and column:
+        return visualizer.histogram(column, f"hist_{name}_{column}.{ext}")
+
+    elif chart_type == "scatter" and analyzer.get_numeric_columns():
+        cols = analyzer.get_numeric_columns()
+        return visualizer.scatter_plot(
+            cols[0],
+            cols[1] if len(cols) > 1 else cols[0],
+            f"scatter_{name}.{ext}",
+        )
+
+    elif chart_type == "correlation":
+        return visualizer.correlation_heatmap(f"heatmap_{name}.{ext}")
+
+    elif chart_type == "boxplot" and column:
+        return visualizer.box_plot(column, f"box_{name}_{column}.{ext}")
+
+    elif chart_type == "line" and column:
+        return visualizer.line_chart(column, f"line_{name}_{column}.{ext}")
+
+    elif chart_type == "bar" and column:
+        return visualizer.bar_chart(column, f"bar_{name}_{column}.{ext}")
+
+    elif chart_type == "distribution" and column:
+        return visualizer.distribution_plot(column, f"dist_{name}_{column}.{ext}")
+
+    elif chart_type == "aggregate" and isinstance(column, dict):
+        # ``column`` carries the aggregation query and its chart kind
+        kind = column.get("chart", "bar")
+        if kind not in ("bar", "line"):
+            raise ValueError(f"Invalid chart kind: {kind}")
+        return visualizer.aggregate_chart(column, kind, f"agg_{name}.{ext}")
+
+    raise ValueError(f"Invalid chart type: {chart_type}")
+
+
+def _warm_worker():
+    """Pay the matplotlib/seaborn import and style setup once per worker"""
+    from visualizer import load_plotting
+    from logconfig import configure_logging
+
+    # Spawned workers do not inherit the parent's logging configuration
+    configure_logging()
+    # The parent indexes and evicts the charts workers write
+    chart_cache.indexed = False
+    load_plotting()
+    logger.info("✓ Render worker ready (pid %s)", os.getpid())
+
+
+def _track(chart_file, output_dir, filepath):
+    """Index a chart a worker wrote, under the key in its file name
+
+    Workers keep no index of their own, so this is the only place their
+    charts count against the cache budget, and re-uploading the dataset
+    deletes them.
+    """
+    if not chart_file or output_dir is None:
+        return
+    key = ChartCache.key_of(chart_file)
+    if key is not None:
+        chart_cache.add(key, os.path.join(output_dir, chart_file), filepath)
+
+
+class RenderPool:
+    """Pool of pre-warmed renderer processes with a bounded job queue
+
+    With ``workers=0`` charts are rendered inline in the calling thread,
+    serialized by a lock. A job that exceeds its timeout is abandoned by
+    the caller but keeps its queue slot until the worker finishes it, so
+    the queue bound still caps the load on the machine.
+    """
+
+    def __init__(
+        self,
+        workers=RENDER_WORKERS,
+        max_pending=RENDER_QUEUE_SIZE,
+        timeout=RENDER_TIMEOUT,
+        start_method="spawn",
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.start_method = start_method
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker processes if they are not running yet"""
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_warm_worker,
+                )
+                # Spawn every worker now rather than on the first requests
+                for _ in range(self.workers):
+                    self._executor.submit(os.getpid)
+                logger.info("✓ Render pool started with %s workers", self.workers)
+        return self
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def submit(self, *args):
+        """Queue a render_chart() job and return its future
+
+        Raises RenderPoolBusy when ``max_pending`` jobs are already queued.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise RenderPoolBusy("Render queue is full")
+        try:
+            try:
+                future = self.start()._executor.submit(render_chart, *args)
+            except BrokenProcessPool:
+                logger.error("✗ Render pool broken, restarting")
+                self.shutdown()
+                future = self.start()._executor.submit(render_chart, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def render(
+        self, filepath, name, chart_type, column, output_dir, image_format="png"
+    ):
+        """Render one chart, in a worker process when the pool is enabled
+
+        Returns the chart's file name, or its bytes when ``output_dir`` is
+        None. Raises RenderPoolBusy, ValueError, or TimeoutError after
+        ``timeout``.
+        """
+        args = (filepath, name, chart_type, column, output_dir, image_format)
+        if self.workers <= 0:
+            with _inline_lock:
+                return render_chart(*args)
+
+        chart_file = self.submit(*args).result(timeout=self.timeout)
+        _track(chart_file, output_dir, filepath)
+        return chart_file
+
+    def render_many(self, filepath, name, specs, output_dir, image_format="png"):
+        """Render a batch of (chart_type, column) specs
+
+        Yields ``(index, chart_file, error)`` tuples as charts finish. Inline
+        mode loads the data once and renders in order; the pool fans the
+        specs out across workers, each reusing its own cached parse.
+        """
+        if self.workers <= 0:
+            yield from self._render_inline(
+                filepath, name, specs, output_dir, image_format
+            )
+            return
+
+        futures = {}
+        for index, (chart_type, column) in enumerate(specs):
+            try:
+                args = (filepath, name, chart_type, column, output_dir, image_format)
+                futures[self.submit(*args)] = index
+            except RenderPoolBusy:
+                yield index, None, "Server busy, try again"
+
+        # Jobs queue behind each other, so allow one timeout per wave
+        waves = math.ceil(len(futures) / self.workers) if futures else 0
+        pending = set(futures)
+        try:
+            for future in as_completed(futures, timeout=self.timeout * waves):
+                pending.discard(future)
+                yield (futures[future],) + self._outcome(future, filepath, output_dir)
+        except TimeoutError:
+            for future in pending:
+                future.cancel()
+                yield futures[future], None, "Chart generation timed out"
+
+    def _render_inline(self, filepath, name, specs, output_dir, image_format):
+        analyzer, visualizer = _open(filepath, output_dir, None, image_format)
+        for index, (chart_type, column) in enumerate(specs):
+            if analyzer is None:
+                yield index, None, None
+                continue
+            # Held per chart, never across a yield, so a slow reader of a
+            # streamed batch does not block other inline renders
+            try:
+                with _inline_lock:
+                    chart_file = _draw(analyzer, visualizer, name, chart_type, column)
+            except ValueError:
+                yield index, None, "Invalid chart type"
+                continue
+            yield index, chart_file, None
+
+    @staticmethod
+    def _outcome(future, filepath, output_dir):
+        try:
+            chart_file = future.result()
+        except ValueError:
+            return None, "Invalid chart type"
+        except Exception as e:
+            return None, str(e)
+        _track(chart_file, output_dir, filepath)
+        return chart_file, None
@@ -0,0 +1,194 @@
+# rows.py - Row Window Module
+
+import json
+import codecs
+import logging
+import numpy as np
+import pandas as pd
+from analyzer import DataAnalyzer
+from cache import dataset_cache
+from columnar import ColumnarStore
+from csvformat import csv_options
+from incremental import SummaryStore
+from metrics import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Rows between the byte offsets remembered for seeking into a large CSV
+ROW_INDEX_STEP = 10_000
+SCAN_BYTES = 8 * 1024 * 1024
+
+
+def read_window(filepath, offset, limit, columns=None, load_whole=True):
+    """Rows ``offset`` to ``offset + limit`` of a dataset and its total row count
+
+    Reads from the memory-mapped columnar copy when there is one, else from
+    the cached frame when ``load_whole`` allows loading the file, else
+    parses just that window of the CSV. The total is None when only the
+    CSV window was read and no stored summary knows the row count.
+    Raises KeyError for an unknown column.
+    """
+    store = ColumnarStore.open(filepath)
+    if store is not None:
+        _check_columns(columns, store.columns)
+        stop = min(offset + limit, store.rows)
+        return store.take(np.arange(offset, max(stop, offset)), columns), store.rows
+
+    if load_whole:
+        analyzer = DataAnalyzer(filepath)
+        if analyzer.df is None:
+            raise ValueError("Failed to load data")
+        df = analyzer.df
+        _check_columns(columns, df.columns)
+        frame = df.iloc[offset : offset + limit]
+        return (frame[columns] if columns else frame).reset_index(drop=True), len(df)
+
+    frame = _read_csv_window(filepath, offset, limit, columns)
+    if columns:
+        frame = frame[columns]
+    summaries = SummaryStore.load(filepath)
+    return frame, summaries.rows if summaries else None
+
+
+def row_offsets(filepath, step=ROW_INDEX_STEP):
+    """Byte offsets of every ``step``-th data row of a CSV, cached per file version
+
+    Entry i is where row ``i * step`` starts. Records are found by
+    counting newlines outside quotes, so quoted newlines do not split a
+    row, and blank lines, which read_csv skips, are not counted. Returns
+    None for encodings whose newlines are not single bytes.
+    """
+    options = csv_options(filepath)
+    if codecs.lookup(options["encoding"]).name.startswith("utf-16"):
+        return None
+
+    def build():
+        with timed("row_index"):
+            return _scan_offsets(filepath, options["quotechar"], step)
+
+    return dataset_cache.get_or_load(filepath, build, options=("row-offsets", step))
+
+
+def _scan_offsets(filepath, quotechar, step):
+    quote, newline, cr = ord(quotechar), ord("\n"), ord("\r")
+    offsets = []
+    rows = -1  # the header is record -1
+    start = 0  # where the record being scanned starts
+    inside = False
+    last = newline  # byte before the current block
+    base = 0
+    with open(filepath, "rb") as f:
+        while True:
+            block = f.read(SCAN_BYTES)
+            if not block:
+                break
+            data = np.frombuffer(block, dtype=np.uint8)
+            quotes = np.flatnonzero(data == quote)
+            newlines = np.flatnonzero(data == newline)
+            # A newline ends a record when an even number of quotes precede it
+            parity = (np.searchsorted(quotes, newlines) + inside) % 2
+            ends = newlines[parity == 0]
+            inside = bool((len(quotes) + inside) % 2)
+
+            starts = np.concatenate(([start], ends[:-1] + base + 1))
+            lengths = ends + base - starts
+            before = np.where(ends > 0, data[ends - 1], last)
+            # Blank lines, "" or "\r", are not rows
+            starts = starts[(lengths > 1) | ((lengths == 1) & (before != cr))]
+            numbers = np.arange(rows, rows + len(starts))
+            offsets.extend(starts[(numbers >= 0) & (numbers % step == 0)].tolist())
+            rows += len(starts)
+
+            if len(ends):
+                start = int(ends[-1]) + base + 1
+            last = int(data[-1])
+            base += len(block)
+
+    # A last row without a trailing newline
+    tail = base - start
+    if rows >= 0 and rows % step == 0 and (tail > 1 or (tail == 1 and last != cr)):
+        offsets.append(start)
+    return offsets
+
+
+def _read_csv_window(filepath, offset, limit, columns):
+    """Parse only rows ``offset`` to ``offset + limit`` of a CSV
+
+    Seeks to the nearest indexed row at or before ``offset``, so at most
+    ROW_INDEX_STEP rows are skipped, however deep the window.
+    """
+    options = csv_options(filepath)
+    step = ROW_INDEX_STEP
+    offsets = row_offsets(filepath, step)
+    if offsets is None:
+        return pd.read_csv(
+            filepath,
+            skiprows=lambda i: 0 < i <= offset,
+            nrows=limit,
+            usecols=columns,
+            **options,
+        )
+
+    names = list(pd.read_csv(filepath, nrows=0, **options).columns)
+    checkpoint = offset // step
+    if checkpoint >= len(offsets):
+        return pd.DataFrame(columns=columns or names)
+    with open(filepath, "rb") as f:
+        f.seek(offsets[checkpoint])
+        return pd.read_csv(
+            f,
+            header=None,
+            names=names,
+            skiprows=offset - checkpoint * step,
+            nrows=limit,
+            usecols=columns,
+            **options,
+        )
+
+
+def _check_columns(columns, available):
+    missing = set(columns or []) - set(available)
+    if missing:
+        raise KeyError(", ".join(sorted(missing)))
+
+
+def column_arrays(frame):
+    """One JSON-ready array per column, with missing values as null"""
+    data = {}
+    for col in frame.columns:
+        series = frame[col]
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            # orjson only serializes C-contiguous arrays
+            data[col] = np.ascontiguousarray(series.to_numpy())
+        else:
+            values = series.astype(object).to_numpy()
+            values[series.isna().to_numpy()] = None
+            data[col] = values.tolist()
+    return data
+
+
+def dumps(payload):
+    """Serialize a payload holding NumPy arrays, with orjson when installed"""
+    with timed("serialize"):
+        return _dumps(payload)
+
+
+def _dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY, default=str)
+
+    def convert(value):
+        if isinstance(value, np.ndarray):
+            if value.dtype.kind == "f":
+                return [None if np.isnan(v) else v for v in value.tolist()]
+            return value.tolist()
+        if isinstance(value, np.generic):
+            return value.item()
+        return str(value)
+
+    return json.dumps(payload, default=convert).encode()
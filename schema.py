@@ -0,0 +1,74 @@
+# schema.py - Compact Dtype Inference Module
+
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_ROWS = int(os.environ.get("SCHEMA_SAMPLE_ROWS", 10_000))
+# String columns with at most this share of distinct values become category
+CATEGORY_RATIO = 0.5
+
+
+def _low_cardinality(series):
+    present = series.dropna()
+    return len(present) > 0 and present.nunique() <= CATEGORY_RATIO * len(present)
+
+
+def infer_categories(filepath, options, usecols=None, sample_rows=SAMPLE_ROWS):
+    """String columns of a CSV file whose sampled values repeat enough for category
+
+    Only the first ``sample_rows`` rows are parsed. Choosing category for
+    a column that is text in the sample is always safe: a full parse
+    could only make that column object, never numeric.
+    """
+    sample = pd.read_csv(filepath, nrows=sample_rows, usecols=usecols, **options)
+    return [
+        col
+        for col in sample.columns
+        if sample[col].dtype == object and _low_cardinality(sample[col])
+    ]
+
+
+def downcast(df, keep=(), categorize=True):
+    """Copy of df with every column in its narrowest lossless dtype
+
+    Integers shrink to the smallest type holding their range, floats to
+    float32 only when every value survives the round trip, and repetitive
+    string columns become category. Columns named in ``keep`` are left
+    alone. Columns that do not shrink are not copied.
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if col in keep:
+            columns[col] = series
+        elif pd.api.types.is_bool_dtype(series.dtype):
+            columns[col] = series
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            columns[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series.dtype):
+            columns[col] = _downcast_float(series)
+        elif categorize and series.dtype == object and _low_cardinality(series):
+            columns[col] = series.astype("category")
+        else:
+            columns[col] = series
+
+    before = int(df.memory_usage(deep=True).sum())
+    result = pd.DataFrame(columns, index=df.index, columns=df.columns, copy=False)
+    after = int(result.memory_usage(deep=True).sum())
+    logger.info("✓ Downcast frame: %.2f KB -> %.2f KB", before / 1024, after / 1024)
+    return result
+
+
+def _downcast_float(series):
+    if series.dtype == np.float32:
+        return series
+    values = series.to_numpy()
+    narrow = values.astype(np.float32)
+    with np.errstate(over="ignore"):
+        if np.array_equal(narrow.astype(values.dtype), values, equal_nan=True):
+            return pd.Series(narrow, index=series.index, name=series.name)
+    return series
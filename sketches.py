@@ -0,0 +1,364 @@
+# sketches.py - Mergeable Accumulators and Sketches Module
+
+import numpy as np
+import pandas as pd
+
+
+def hash_values(values):
+    """64-bit hashes of a 1-D array, with numbers hashed as float64"""
+    values = np.asarray(values)
+    if values.dtype.kind in "iufb":
+        values = values.astype(np.float64)
+    elif values.dtype.kind != "O":
+        values = values.astype(object)
+    return pd.util.hash_array(values)
+
+
+def _bit_length(x):
+    """Vectorized bit length of a uint64 array"""
+    x = x.copy()
+    length = np.zeros(x.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = x >= (np.uint64(1) << np.uint64(shift))
+        length[big] += shift
+        x[big] >>= np.uint64(shift)
+    return length + (x > 0)
+
+
+class Moments:
+    """Count, mean, variance, min and max merged with Chan's parallel update"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+
+    def update(self, values):
+        """Fold in a float array that contains no NaN"""
+        other = Moments()
+        other.count = len(values)
+        if other.count:
+            other.mean = float(values.mean())
+            other.m2 = float(((values - other.mean) ** 2).sum())
+            other.min = float(values.min())
+            other.max = float(values.max())
+        self.merge(other)
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta**2 * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def std(self):
+        """Sample standard deviation (ddof=1, as pandas)"""
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else np.nan
+
+
+class PairwiseMoments:
+    """NaN-aware co-moment sums for pairwise Pearson correlation
+
+    For every column pair the sums only cover rows where both values are
+    present, which reproduces pandas' pairwise-complete ``corr()``. Values
+    are shifted by a per-column reference to keep the sums well conditioned.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.shift = np.empty(0)
+        self.n = np.zeros((0, 0))
+        self.sx = np.zeros((0, 0))
+        self.sxx = np.zeros((0, 0))
+        self.sxy = np.zeros((0, 0))
+
+    def update(self, frame):
+        """Fold in a DataFrame of numeric columns"""
+        if frame.shape[1] == 0:
+            return self
+        self._ensure(frame.columns, frame.mean().fillna(0.0).to_numpy())
+        idx = [self.names.index(name) for name in frame.columns]
+
+        x = frame.to_numpy(dtype=np.float64) - self.shift[idx]
+        valid = ~np.isnan(x)
+        x0 = np.where(valid, x, 0.0)
+        v = valid.astype(np.float64)
+
+        block = np.ix_(idx, idx)
+        self.n[block] += v.T @ v
+        self.sx[block] += x0.T @ v
+        self.sxx[block] += (x0 * x0).T @ v
+        self.sxy[block] += x0.T @ x0
+        return self
+
+    def merge(self, other):
+        if not other.names:
+            return self
+        self._ensure(other.names, other.shift)
+        idx = [self.names.index(name) for name in other.names]
+        # Re-express the other sums relative to this accumulator's shifts
+        d = other.shift - self.shift[idx]
+        n, sx = other.n, other.sx
+        sxx = other.sxx + 2 * d[:, None] * sx + n * d[:, None] ** 2
+        sxy = other.sxy + d[:, None] * sx.T + d[None, :] * sx + n * np.outer(d, d)
+        sx = sx + n * d[:, None]
+
+        block = np.ix_(idx, idx)
+        self.n[block] += n
+        self.sx[block] += sx
+        self.sxx[block] += sxx
+        self.sxy[block] += sxy
+        return self
+
+    def correlation(self, names=None):
+        """Pearson correlation matrix as a DataFrame"""
+        names = self.names if names is None else list(names)
+        idx = [self.names.index(name) for name in names]
+        block = np.ix_(idx, idx)
+        n, sx, sxx, sxy = (
+            self.n[block],
+            self.sx[block],
+            self.sxx[block],
+            self.sxy[block],
+        )
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = sxy - sx * sx.T / n
+            var_x = sxx - sx**2 / n
+            var_y = var_x.T
+            corr = cov / np.sqrt(var_x * var_y)
+        corr[(n < 2) | (var_x <= 0) | (var_y <= 0)] = np.nan
+        return pd.DataFrame(np.clip(corr, -1.0, 1.0), index=names, columns=names)
+
+    def _ensure(self, names, shifts):
+        new = [(name, s) for name, s in zip(names, shifts) if name not in self.names]
+        if not new:
+            return
+        size = len(self.names) + len(new)
+        for attr in ("n", "sx", "sxx", "sxy"):
+            grown = np.zeros((size, size))
+            old = getattr(self, attr)
+            grown[: old.shape[0], : old.shape[1]] = old
+            setattr(self, attr, grown)
+        self.names.extend(name for name, _ in new)
+        self.shift = np.concatenate([self.shift, [s for _, s in new]])
+
+
+class HyperLogLog:
+    """Distinct-count sketch; relative standard error is 1.04 / sqrt(2**p)"""
+
+    def __init__(self, p=14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, values):
+        """Fold in a 1-D array of non-null values"""
+        return self.update_hashes(hash_values(values))
+
+    def update_hashes(self, hashes):
+        if len(hashes) == 0:
+            return self
+        p = np.uint64(self.p)
+        idx = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        rest = hashes << p
+        rank = np.minimum(64 - _bit_length(rest) + 1, 64 - self.p + 1)
+        np.maximum.at(self.registers, idx, rank.astype(np.uint8))
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m**2 / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros:
+            # Linear counting is far more accurate for small cardinalities
+            return int(round(self.m * np.log(self.m / zeros)))
+        return int(round(raw))
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(self.m)
+
+
+class QuantileSketch:
+    """KLL quantile sketch; exact until more than k values have been seen"""
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        """Fold in a float array that contains no NaN"""
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        if len(self.levels) == 1:
+            return float(np.quantile(self.levels[0], q))
+
+        values = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(len(items), 2.0**level) for level, items in enumerate(self.levels)]
+        )
+        order = np.argsort(values, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        pos = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        return float(values[order][min(pos, len(values) - 1)])
+
+    @property
+    def is_exact(self):
+        return len(self.levels) == 1
+
+    @property
+    def rank_error(self):
+        """Approximate normalized rank error (0 while exact)"""
+        return 0.0 if self.is_exact else 2.446 / self.k**0.9433
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                leftover = items[len(items) - len(items) % 2 :]
+                items = items[: len(items) - len(items) % 2]
+                promoted = items[self._rng.integers(2) :: 2]
+                self.levels[level] = leftover
+                self.levels[level + 1] = np.concatenate(
+                    [self.levels[level + 1], promoted]
+                )
+            level += 1
+
+
+class FrequentItems:
+    """Misra-Gries heavy hitters; counts undershoot by at most ``error``"""
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.total = 0
+        self.error = 0
+
+    def update(self, values):
+        """Fold in a Series of non-null values"""
+        counts = values.value_counts(sort=False, dropna=True)
+        self.total += int(counts.sum())
+        return self._absorb(counts)
+
+    def merge(self, other):
+        self.total += other.total
+        self.error += other.error
+        return self._absorb(other.counts)
+
+    def top(self, n=10):
+        return self.counts.sort_values(ascending=False, kind="stable").head(n)
+
+    @property
+    def is_exact(self):
+        return self.error == 0
+
+    def _absorb(self, counts):
+        if len(counts) == 0:
+            return self
+        if len(self.counts) == 0:
+            merged = counts.astype(np.int64)
+        else:
+            merged = self.counts.add(counts, fill_value=0).astype(np.int64)
+        if len(merged) > self.capacity:
+            cutoff = int(merged.nlargest(self.capacity + 1).iloc[-1])
+            merged = merged[merged > cutoff] - cutoff
+            self.error += cutoff
+        self.counts = merged
+        return self
+
+
+class Reservoir:
+    """Uniform random sample of up to ``size`` rows (Algorithm R by chunk)"""
+
+    def __init__(self, size=100, seed=0):
+        self.size = size
+        self.seen = 0
+        self.rows = None
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, frame):
+        """Fold in a DataFrame chunk"""
+        n = len(frame)
+        if self.rows is None:
+            self.rows = frame.iloc[:0]
+        fill = min(self.size - len(self.rows), n)
+        if fill > 0:
+            self.rows = pd.concat([self.rows, frame.iloc[:fill]], ignore_index=True)
+
+        # Row t of the stream replaces a random slot with probability size/(t+1)
+        j = np.arange(fill, n)
+        slot = self._rng.integers(0, self.seen + j + 1)
+        hit = slot < self.size
+        if hit.any():
+            # Later rows win a slot, as if they had been applied one at a time
+            slot, j = slot[hit][::-1], j[hit][::-1]
+            slot, first = np.unique(slot, return_index=True)
+            keep = np.ones(len(self.rows), dtype=bool)
+            keep[slot] = False
+            self.rows = pd.concat(
+                [self.rows[keep], frame.iloc[j[first]]], ignore_index=True
+            )
+        self.seen += n
+        return self
+
+    def merge(self, other):
+        if other.rows is None:
+            return self
+        if self.rows is None:
+            self.rows, self.seen = other.rows, other.seen
+            return self
+        total = self.seen + other.seen
+        # Each slot comes from either side in proportion to the rows it saw
+        ours = int(self._rng.binomial(self.size, self.seen / total))
+        ours = min(max(ours, self.size - len(other.rows)), len(self.rows))
+        theirs = min(self.size - ours, len(other.rows))
+        self.rows = pd.concat(
+            [
+                self.rows.sample(ours, random_state=self._rng),
+                other.rows.sample(theirs, random_state=self._rng),
+            ],
+            ignore_index=True,
+        )
+        self.seen = total
+        return self
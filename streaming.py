@@ -0,0 +1,362 @@
+# streaming.py - Chunked Streaming Analysis Module
+
+import os
+import logging
+from collections import deque
+import pandas as pd
+import numpy as np
+from sketches import (
+    Moments,
+    PairwiseMoments,
+    HyperLogLog,
+    QuantileSketch,
+    FrequentItems,
+    Reservoir,
+    hash_values,
+)
+from csvformat import csv_options
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNKSIZE = int(os.environ.get("STREAMING_CHUNKSIZE", 100_000))
+SAMPLE_ROWS = 100
+# Distinct row fingerprints kept (8 bytes each) before duplicate rows are
+# estimated from a sketch instead
+MAX_ROW_FINGERPRINTS = int(os.environ.get("MAX_ROW_FINGERPRINTS", 1_000_000))
+
+
+def _is_numeric(dtype):
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(
+        dtype
+    )
+
+
+def _promote(current, new):
+    """Combine the dtypes one column had in two chunks, like a full read_csv"""
+    if current is None or current == new:
+        return new
+    if _is_numeric(current) and _is_numeric(new):
+        return np.result_type(current, new)
+    return np.dtype(object)
+
+
+class StreamingAnalyzer:
+    """One-pass analyzer for CSV files that do not fit in memory
+
+    Reads the file with ``pd.read_csv(chunksize=...)`` and folds every chunk
+    into mergeable accumulators, so peak memory is bounded by the chunk size.
+    Offers the same accessors as ``DataAnalyzer``. Means, variances, min/max,
+    null counts and correlations are exact; quantiles, unique counts and
+    value counts come from sketches that stay exact for small inputs.
+    Duplicate rows are counted from 64-bit row fingerprints up to
+    MAX_ROW_FINGERPRINTS distinct rows, then estimated as rows minus a
+    distinct-row HyperLogLog, so memory stays bounded either way.
+    """
+
+    def __init__(self, filepath=None, chunksize=DEFAULT_CHUNKSIZE, preview_rows=10):
+        self.filepath = filepath
+        self.chunksize = chunksize
+        self.preview_rows = preview_rows
+        self.loaded = False
+
+        self.rows = 0
+        self.columns = None
+        self.dtypes = {}
+        self.null_counts = None
+        self.memory_bytes = 0
+        self.moments = {}
+        self.quantiles = {}
+        self.distinct = {}
+        self.frequent = {}
+        self.comoments = PairwiseMoments()
+        self.sample = Reservoir(SAMPLE_ROWS)
+        self.distinct_rows = HyperLogLog()
+        self._fingerprints = np.empty(0, dtype=np.uint64)
+        self._head = None
+        self._tail = deque(maxlen=preview_rows)
+
+        if filepath is not None:
+            self.load_data()
+
+    def load_data(self):
+        """Stream the CSV file through the accumulators"""
+        try:
+            options = csv_options(self.filepath)
+            for chunk in pd.read_csv(
+                self.filepath, chunksize=self.chunksize, **options
+            ):
+                self.update(chunk)
+            self.loaded = self.columns is not None
+            logger.info("✓ Data streamed successfully: %s", self.filepath)
+            logger.info("  Shape: (%s, %s)", self.rows, len(self.columns or []))
+            return self.loaded
+        except FileNotFoundError:
+            logger.error("✗ File not found: %s", self.filepath)
+            return False
+        except pd.errors.EmptyDataError:
+            logger.error("✗ File is empty")
+            return False
+        except Exception as e:
+            logger.error("✗ Error streaming file: %s", e)
+            return False
+
+    def update(self, chunk):
+        """Fold one DataFrame chunk into the running summaries"""
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.null_counts = pd.Series(0, index=self.columns, dtype=np.int64)
+            self._head = chunk.head(self.preview_rows)
+        elif list(chunk.columns) != self.columns:
+            raise ValueError("Chunk columns do not match the dataset")
+
+        self.rows += len(chunk)
+        self.memory_bytes += int(chunk.memory_usage(index=False, deep=True).sum())
+        self.null_counts += chunk.isnull().sum()
+        self._tail.extend(chunk.tail(self.preview_rows).to_dict(orient="records"))
+
+        numeric = []
+        for col in self.columns:
+            series = chunk[col]
+            self.dtypes[col] = _promote(self.dtypes.get(col), series.dtype)
+            present = series.dropna()
+
+            if _is_numeric(series.dtype):
+                numeric.append(col)
+                values = present.to_numpy(dtype=np.float64)
+                self.moments.setdefault(col, Moments()).update(values)
+                self.quantiles.setdefault(col, QuantileSketch()).update(values)
+            else:
+                values = present.to_numpy()
+            self.distinct.setdefault(col, HyperLogLog()).update(values)
+            self.frequent.setdefault(col, FrequentItems()).update(present)
+
+        self.comoments.update(chunk[numeric])
+        self.sample.update(chunk)
+        hashes = self._row_hashes(chunk)
+        self.distinct_rows.update_hashes(hashes)
+        if self._fingerprints is not None:
+            self._fingerprints = np.union1d(self._fingerprints, hashes)
+            if len(self._fingerprints) > MAX_ROW_FINGERPRINTS:
+                self._fingerprints = None
+        return self
+
+    def get_overview(self):
+        """Get comprehensive data overview"""
+        if not self.loaded:
+            return None
+        overview = {
+            "rows": int(self.rows),
+            "columns": len(self.columns),
+            "column_names": list(self.columns),
+            "dtypes": {col: str(self.dtypes[col]) for col in self.columns},
+            "missing_values": {
+                col: int(count) for col, count in self.null_counts.items()
+            },
+            "duplicate_rows": self.duplicate_rows(),
+            "memory_usage": f"{self._memory_bytes() / 1024:.2f} KB",
+        }
+        if self._fingerprints is None:
+            # Past the fingerprint cap the count is a sketch estimate
+            overview["duplicate_rows_approximate"] = True
+        return overview
+
+    def get_statistics(self):
+        """Get descriptive statistics matching ``DataFrame.describe()``"""
+        if not self.loaded:
+            return None
+        numeric = self.get_numeric_columns()
+        if not numeric:
+            return {col: self._describe_object(col) for col in self.columns}
+
+        stats = {}
+        for col in numeric:
+            m = self.moments[col]
+            q = self.quantiles[col]
+            stats[col] = {
+                "count": float(m.count),
+                "mean": m.mean if m.count else np.nan,
+                "std": m.std,
+                "min": m.min,
+                "25%": q.quantile(0.25),
+                "50%": q.quantile(0.5),
+                "75%": q.quantile(0.75),
+                "max": m.max,
+            }
+        return stats
+
+    def get_correlation(self):
+        """Get correlation matrix for numeric columns"""
+        numeric = self.get_numeric_columns()
+        if not numeric:
+            logger.warning("⚠ No numeric columns found")
+            return None
+        return self.comoments.correlation(numeric).to_dict()
+
+    def get_column_stats(self, column):
+        """Get detailed stats for specific column"""
+        if not self.loaded or column not in self.columns:
+            logger.warning("⚠ Column not found: %s", column)
+            return None
+        nulls = int(self.null_counts[column])
+        return {
+            "unique": self.distinct[column].estimate(),
+            "null_count": nulls,
+            "null_percentage": float(nulls / self.rows * 100) if self.rows else 0.0,
+            "dtype": str(self.dtypes[column]),
+            "value_counts": self.frequent[column].top(10).to_dict(),
+        }
+
+    def get_head(self, n=5):
+        """Get first n rows (up to ``preview_rows``)"""
+        return self._head.head(n).to_dict(orient="records") if self.loaded else None
+
+    def get_tail(self, n=5):
+        """Get last n rows (up to ``preview_rows``)"""
+        if not self.loaded:
+            return None
+        return list(self._tail)[-n:] if n else []
+
+    def get_numeric_columns(self):
+        """Get list of numeric columns"""
+        return [col for col in self.columns or [] if _is_numeric(self.dtypes[col])]
+
+    def get_categorical_columns(self):
+        """Get list of categorical columns"""
+        return [col for col in self.columns or [] if self.dtypes[col] == object]
+
+    def profile(self, n=10):
+        """Everything the analysis page needs, from the streamed summaries"""
+        if not self.loaded:
+            return None
+        return {
+            "overview": self.get_overview(),
+            "statistics": self.get_statistics(),
+            "head": self.get_head(n),
+            "tail": self.get_tail(n),
+            "numeric_columns": self.get_numeric_columns(),
+            "categorical_columns": self.get_categorical_columns(),
+        }
+
+    def approximate_profile(self, n=10):
+        """profile() plus the error bounds of every sketch-backed figure
+
+        Adds ``bounds`` (see error_bounds()) and ``sample``, a uniform
+        random sample of rows that previews the whole file rather than
+        its first rows.
+        """
+        result = self.profile(n)
+        if result is None:
+            return None
+        result["approximate"] = True
+        result["bounds"] = self.error_bounds()
+        result["sample"] = self.sample.rows.head(n).to_dict(orient="records")
+        return result
+
+    def error_bounds(self):
+        """Worst-case or standard errors of the sketch-backed figures
+
+        Per column: relative standard error of the unique count, absolute
+        undercount bound of value counts, and normalized rank error of
+        quantiles (0 while exact). Duplicate rows are overcounted only by
+        colliding 64-bit fingerprints, until there are too many distinct
+        rows to fingerprint; then their error is that of the distinct-row
+        sketch.
+        """
+        numeric = set(self.get_numeric_columns())
+        columns = {}
+        for col in self.columns:
+            bounds = {
+                "unique_relative_error": float(self.distinct[col].relative_error),
+                "value_count_error": int(self.frequent[col].error),
+            }
+            if col in numeric:
+                bounds["quantile_rank_error"] = float(self.quantiles[col].rank_error)
+            columns[col] = bounds
+        bounds = {"columns": columns}
+        if self._fingerprints is not None:
+            bounds["duplicate_rows_expected_collisions"] = (
+                self.rows * (self.rows - 1) / 2**65
+            )
+        else:
+            bounds["duplicate_rows_error"] = int(
+                self.distinct_rows.relative_error * self.distinct_rows.estimate()
+            )
+        return bounds
+
+    def column_summary(self, column, top_n=10):
+        """Stats for one column with the error bound of every estimate"""
+        if not self.loaded or column not in self.columns:
+            logger.warning("⚠ Column not found: %s", column)
+            return None
+        nulls = int(self.null_counts[column])
+        distinct, frequent = self.distinct[column], self.frequent[column]
+        estimate = distinct.estimate()
+        spread = 2 * distinct.relative_error * estimate
+        summary = {
+            "column": column,
+            "dtype": str(self.dtypes[column]),
+            "rows": int(self.rows),
+            "null_count": nulls,
+            "null_percentage": float(nulls / self.rows * 100) if self.rows else 0.0,
+            # About 95% of estimates fall within two standard errors
+            "unique": {
+                "estimate": estimate,
+                "low": max(0, int(estimate - spread)),
+                "high": int(estimate + spread),
+                "relative_error": float(distinct.relative_error),
+            },
+            "value_counts": [
+                {
+                    "value": value,
+                    "count": int(count),
+                    "max": int(count + frequent.error),
+                }
+                for value, count in frequent.top(top_n).items()
+            ],
+            "value_count_error": int(frequent.error),
+        }
+        if column in self.get_numeric_columns():
+            m, q = self.moments[column], self.quantiles[column]
+            summary.update(
+                {
+                    "mean": m.mean if m.count else np.nan,
+                    "std": m.std,
+                    "min": m.min,
+                    "max": m.max,
+                    "quantiles": {
+                        f"{p}%": q.quantile(p / 100) for p in (1, 5, 25, 50, 75, 95, 99)
+                    },
+                    "quantile_rank_error": float(q.rank_error),
+                }
+            )
+        return summary
+
+    def duplicate_rows(self):
+        """Rows repeating an earlier row, counted or estimated (see the class)"""
+        if self._fingerprints is not None:
+            distinct = len(self._fingerprints)
+        else:
+            distinct = min(self.distinct_rows.estimate(), self.rows)
+        return int(self.rows - distinct)
+
+    def _memory_bytes(self):
+        """Deep size of the full frame, including the RangeIndex it would carry"""
+        return self.memory_bytes + int(pd.RangeIndex(self.rows).memory_usage(deep=True))
+
+    def _describe_object(self, col):
+        top = self.frequent[col].top(1)
+        return {
+            "count": float(self.rows - self.null_counts[col]),
+            "unique": self.distinct[col].estimate(),
+            "top": top.index[0] if len(top) else np.nan,
+            "freq": int(top.iloc[0]) if len(top) else np.nan,
+        }
+
+    @staticmethod
+    def _row_hashes(chunk):
+        combined = np.zeros(len(chunk), dtype=np.uint64)
+        for i, col in enumerate(chunk.columns):
+            h = hash_values(chunk[col].to_numpy())
+            # Mix each column in with a position-dependent multiplier
+            combined = combined * np.uint64(0x100000001B3) ^ (h + np.uint64(i))
+        return combined
@@ -1,13 +1,37 @@
 # test_app_fixed.py - Fixed Test Suite
 
 import unittest
+from unittest import mock
 import os
 import json
 import tempfile
 import shutil
 from app import app
+import app as app_module
 from analyzer import DataAnalyzer
 from visualizer import DataVisualizer
+from cache import DatasetCache, ChartCache
+from columnar import ColumnarStore
+from streaming import StreamingAnalyzer
+from render_pool import RenderPool, RenderPoolBusy, chart_columns
+from jobs import JobManager, JobQueueFull
+from incremental import SummaryStore, append_rows
+from column_index import ColumnIndex
+import ingest
+import io
+import gzip
+import sys
+import subprocess
+import threading
+import tracemalloc
+import time
+import aggregation
+import correlation
+import grouping
+import metrics
+import rows
+import logconfig
+import logging
 import pandas as pd
 import numpy as np
 
@@ -112,6 +136,863 @@ class TestDataAnalyzer(unittest.TestCase):
         self.assertIsNotNone(stats)
         self.assertEqual(stats['unique'], 5)
         self.assertEqual(stats['null_count'], 0)
+    
+    def test_profile_matches_accessors(self):
+        """Test fused profile equals the individual accessors"""
+        analyzer = DataAnalyzer(self.csv_file)
+        profile = analyzer.profile(3)
+        
+        self.assertEqual(profile['overview'], analyzer.get_overview())
+        self.assertEqual(profile['head'], analyzer.get_head(3))
+        self.assertEqual(profile['tail'], analyzer.get_tail(3))
+        self.assertEqual(profile['numeric_columns'], analyzer.get_numeric_columns())
+        self.assertEqual(profile['categorical_columns'], analyzer.get_categorical_columns())
+        for col, expected in analyzer.get_statistics().items():
+            for key, value in expected.items():
+                self.assertAlmostEqual(profile['statistics'][col][key], value)
+    
+    def test_optimized_load(self):
+        """Test compact dtypes keep every value and honor explicit dtypes"""
+        pd.concat([pd.read_csv(self.csv_file)] * 4).to_csv(self.csv_file, index=False)
+        plain = DataAnalyzer(self.csv_file, cache=None)
+        compact = DataAnalyzer(self.csv_file, cache=None, optimize=True)
+        
+        self.assertEqual(str(compact.df['Age'].dtype), 'int8')
+        self.assertEqual(str(compact.df['Department'].dtype), 'category')
+        self.assertIn('Department', compact.get_categorical_columns())
+        for col in plain.df.columns:
+            self.assertEqual(compact.df[col].tolist(), plain.df[col].tolist())
+        
+        subset = DataAnalyzer(self.csv_file, cache=None, optimize=True,
+                              usecols=['Age', 'Salary'], dtype={'Salary': 'float64'})
+        self.assertEqual(list(subset.df.columns), ['Age', 'Salary'])
+        self.assertEqual(str(subset.df['Salary'].dtype), 'float64')
+    
+    def test_lazy_load(self):
+        """Test lazy analyzers read the schema first and load columns on demand"""
+        cache = DatasetCache()
+        analyzer = DataAnalyzer(self.csv_file, cache=cache, lazy=True)
+        
+        self.assertTrue(analyzer.loaded)
+        self.assertEqual(analyzer.get_numeric_columns(), ['Age', 'Salary'])
+        self.assertEqual(analyzer.columns, ['Name', 'Age', 'Salary', 'Department'])
+        self.assertEqual(analyzer._columns, {})
+        self.assertEqual(analyzer.frame(['Salary'])['Salary'].tolist(), [50000, 60000, 75000, 55000, 65000])
+        self.assertEqual(list(analyzer._columns), ['Salary'])
+        self.assertEqual(analyzer.rows, 5)
+        self.assertEqual(analyzer.get_column_stats('Department')['unique'], 3)
+        
+        hits = cache.hits
+        other = DataAnalyzer(self.csv_file, cache=cache, lazy=True)
+        other.frame(['Salary', 'Department'])
+        self.assertEqual(cache.hits, hits + 2)
+        pd.testing.assert_frame_equal(other.df, DataAnalyzer(self.csv_file, cache=None).df)
+        
+        ColumnarStore.convert(self.csv_file)
+        stored = DataAnalyzer(self.csv_file, cache=None, lazy=True)
+        self.assertEqual(stored.rows, 5)
+        self.assertEqual(stored._columns, {})
+        with self.assertRaises(KeyError):
+            stored.frame(['Missing'])
+        self.assertFalse(DataAnalyzer('nonexistent.csv', lazy=True).loaded)
+
+    def test_lazy_kinds_rechecked_on_load(self):
+        """Test a column numeric only in the schema sample is dropped once loaded"""
+        pd.DataFrame({'A': [1, 2, 3, 'x', 5], 'B': [1.0, 2.5, 3.0, 4.5, 5.0],
+                      'C': [5, 3, 4, 1, 2]}).to_csv(self.csv_file, index=False)
+        with mock.patch('analyzer.SAMPLE_ROWS', 3):
+            analyzer = DataAnalyzer(self.csv_file, cache=None, lazy=True)
+            scatter = DataAnalyzer(self.csv_file, cache=None, lazy=True)
+
+        self.assertEqual(analyzer.get_numeric_columns(), ['A', 'B', 'C'])
+        self.assertEqual(list(analyzer.correlation_matrix().columns), ['B', 'C'])
+        self.assertEqual(analyzer.get_numeric_columns(), ['B', 'C'])
+        df = scatter.frame_of(lambda: chart_columns(scatter, 'scatter', None))
+        self.assertEqual(list(df.columns), ['B', 'C'])
+
+
+class TestDatasetCache(unittest.TestCase):
+    """Test shared DataFrame cache"""
+    
+    def setUp(self):
+        """Setup test data"""
+        self.test_dir = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.test_dir, 'test_data.csv')
+        pd.DataFrame({'A': range(100), 'B': ['x'] * 100}).to_csv(self.csv_file, index=False)
+        self.cache = DatasetCache()
+    
+    def tearDown(self):
+        """Clean up"""
+        shutil.rmtree(self.test_dir)
+    
+    def test_repeated_loads_hit_cache(self):
+        """Test second analyzer reuses the parsed frame"""
+        first = DataAnalyzer(self.csv_file, cache=self.cache)
+        second = DataAnalyzer(self.csv_file, cache=self.cache)
+        
+        self.assertIs(first.df, second.df)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+    
+    def test_modified_file_is_reloaded(self):
+        """Test cache key changes when the file changes"""
+        DataAnalyzer(self.csv_file, cache=self.cache)
+        pd.DataFrame({'A': range(5)}).to_csv(self.csv_file, index=False)
+        analyzer = DataAnalyzer(self.csv_file, cache=self.cache)
+        
+        self.assertEqual(len(analyzer.df), 5)
+        self.assertEqual(self.cache.stats()['entries'], 1)
+    
+    def test_lru_eviction_respects_budget(self):
+        """Test least recently used frames are evicted"""
+        other_file = os.path.join(self.test_dir, 'other.csv')
+        pd.DataFrame({'A': range(100), 'B': ['y'] * 100}).to_csv(other_file, index=False)
+        first = DataAnalyzer(self.csv_file, cache=self.cache)
+        self.cache.max_bytes = int(first.df.memory_usage(deep=True).sum() * 1.5)
+        DataAnalyzer(other_file, cache=self.cache)
+        
+        stats = self.cache.stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+
+    def test_concurrent_misses_load_once(self):
+        """Test callers missing the same key wait for one load"""
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.2)
+            return pd.read_csv(self.csv_file)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            self.cache.get_or_load(self.csv_file, loader))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(self.cache._loading, {})
+
+
+class TestColumnarStore(unittest.TestCase):
+    """Test columnar binary copy of uploads"""
+    
+    def setUp(self):
+        """Setup test data"""
+        self.test_dir = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.test_dir, 'test_data.csv')
+        pd.DataFrame({
+            'Name': ['Alice', None, 'Charlie', 'Alice'],
+            'Age': [25, 30, 35, 28],
+            'Score': [1.5, np.nan, 3.25, 4.0],
+            'Active': [True, False, True, True]
+        }).to_csv(self.csv_file, index=False)
+    
+    def tearDown(self):
+        """Clean up"""
+        shutil.rmtree(self.test_dir)
+    
+    def test_round_trip_matches_csv(self):
+        """Test columnar copy reproduces the parsed CSV"""
+        ColumnarStore.convert(self.csv_file)
+        store = ColumnarStore.open(self.csv_file)
+        
+        self.assertIsNotNone(store)
+        pd.testing.assert_frame_equal(store.to_frame(), pd.read_csv(self.csv_file))
+        self.assertIsInstance(store.column('Age'), np.memmap)
+    
+    def test_category_round_trip(self):
+        """Test compact dtypes, including category order, survive the copy"""
+        compact = DataAnalyzer(self.csv_file, cache=None, optimize=True).df
+        ColumnarStore.convert(self.csv_file, compact)
+        
+        pd.testing.assert_frame_equal(ColumnarStore.open(self.csv_file).to_frame(), compact)
+    
+    def test_frame_shares_memory(self):
+        """Test frames from the copy are views of the memory maps, not copies"""
+        ColumnarStore.convert(self.csv_file)
+        store = ColumnarStore.open(self.csv_file)
+        frame = store.to_frame()
+        
+        self.assertTrue(np.shares_memory(frame['Age'].to_numpy(), store.column('Age')))
+        self.assertTrue(np.shares_memory(frame['Score'].to_numpy(), store.column('Score')))
+    
+    def test_chunked_convert_matches(self):
+        """Test converting chunk by chunk writes the same copy as a whole parse"""
+        streamed = StreamingAnalyzer(self.csv_file, chunksize=3)
+        ColumnarStore.convert_chunks(self.csv_file, streamed.dtypes, streamed.rows, chunksize=3)
+        chunked = ColumnarStore.open(self.csv_file).to_frame()
+        
+        pd.testing.assert_frame_equal(chunked, pd.read_csv(self.csv_file))
+        self.assertEqual(ColumnarStore.open(self.csv_file).take([2, 0])['Name'].tolist(),
+                         ['Charlie', 'Alice'])
+    
+    def test_stale_copy_is_ignored(self):
+        """Test rewritten CSV invalidates the columnar copy"""
+        ColumnarStore.convert(self.csv_file)
+        pd.DataFrame({'Age': [1, 2, 3, 4, 5]}).to_csv(self.csv_file, index=False)
+        
+        self.assertIsNone(ColumnarStore.open(self.csv_file))
+        analyzer = DataAnalyzer(self.csv_file, cache=None)
+        self.assertEqual(list(analyzer.df.columns), ['Age'])
+
+
+class TestColumnIndex(unittest.TestCase):
+    """Test per-column value indexes"""
+    
+    def setUp(self):
+        """Setup test data"""
+        self.test_dir = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.test_dir, 'test_data.csv')
+        rng = np.random.default_rng(3)
+        values = rng.integers(0, 20, 500).astype(float)
+        values[::9] = np.nan
+        pd.DataFrame({
+            'num': values,
+            'city': rng.choice(['Oslo', 'Lima', 'Pune', None], 500),
+            'flag': rng.integers(0, 2, 500).astype(bool)
+        }).to_csv(self.csv_file, index=False)
+        self.df = DataAnalyzer(self.csv_file, cache=None).df
+    
+    def tearDown(self):
+        """Clean up"""
+        shutil.rmtree(self.test_dir)
+    
+    def test_stats_match_analyzer(self):
+        """Test index stats equal the full-scan column stats"""
+        analyzer = DataAnalyzer(self.csv_file, cache=None)
+        for col in self.df.columns:
+            stats = ColumnIndex.build(self.csv_file, col, self.df[col]).stats()
+            expected = analyzer.get_column_stats(col)
+            # Ties at the top-10 cut may be broken differently than pandas does
+            top, expected_top = stats.pop('value_counts'), expected.pop('value_counts')
+            self.assertEqual(stats, expected)
+            self.assertEqual(sorted(top.values()), sorted(expected_top.values()))
+            full = self.df[col].value_counts()
+            self.assertTrue(all(full[value] == count for value, count in top.items()))
+    
+    def test_rebuild_keeps_open_arrays(self):
+        """Test rebuilding an index replaces its files instead of overwriting them"""
+        ColumnIndex.build(self.csv_file, 'num', self.df['num'])
+        old = ColumnIndex.open(self.csv_file, 'num')
+        order = old.order.copy()
+        mapped = old.order
+        
+        ColumnIndex.build(self.csv_file, 'num', self.df['num'].iloc[:10])
+        self.assertTrue(np.array_equal(mapped, order))
+        self.assertEqual(ColumnIndex.open(self.csv_file, 'num').meta['rows'], 10)
+        self.assertFalse([name for name in os.listdir(ColumnIndex.index_dir(self.csv_file))
+                          if '.tmp-' in name])
+    
+    def test_filters_match_masks(self):
+        """Test range, equality and null filters return the matching rows"""
+        ColumnIndex.build(self.csv_file, 'num', self.df['num'])
+        ColumnIndex.build(self.csv_file, 'city', self.df['city'])
+        num = ColumnIndex.open(self.csv_file, 'num')
+        city = ColumnIndex.open(self.csv_file, 'city')
+        
+        def rows(mask):
+            return np.flatnonzero(mask.to_numpy()).tolist()
+        
+        self.assertEqual(num.filter('between', '3', '7').tolist(),
+                         rows(self.df['num'].between(3, 7)))
+        self.assertEqual(num.filter('gt', 15).tolist(), rows(self.df['num'] > 15))
+        self.assertEqual(num.filter('le', 4).tolist(), rows(self.df['num'] <= 4))
+        self.assertEqual(num.filter('null').tolist(), rows(self.df['num'].isnull()))
+        self.assertEqual(city.filter('eq', 'Lima').tolist(), rows(self.df['city'] == 'Lima'))
+        with self.assertRaises(ValueError):
+            num.filter('eq', 'abc')
+    
+    def test_stale_index_is_ignored(self):
+        """Test rewriting the file invalidates its indexes"""
+        ColumnIndex.build(self.csv_file, 'num', self.df['num'])
+        pd.DataFrame({'num': [1, 2]}).to_csv(self.csv_file, index=False)
+        self.assertIsNone(ColumnIndex.open(self.csv_file, 'num'))
+
+
+class TestStreamingAnalyzer(unittest.TestCase):
+    """Test chunked one-pass analyzer"""
+    
+    def setUp(self):
+        """Setup test data"""
+        self.test_dir = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.test_dir, 'test_data.csv')
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'X': rng.normal(100, 5, 150),
+            'Y': rng.integers(0, 20, 150),
+            'Z': rng.choice(['A', 'B', 'C', None], 150)
+        })
+        df.loc[::9, 'X'] = np.nan
+        pd.concat([df, df.head(4)]).to_csv(self.csv_file, index=False)
+        self.exact = DataAnalyzer(self.csv_file, cache=None)
+        self.stream = StreamingAnalyzer(self.csv_file, chunksize=40)
+    
+    def tearDown(self):
+        """Clean up"""
+        shutil.rmtree(self.test_dir)
+    
+    def test_overview_matches_in_memory(self):
+        """Test streamed overview equals the in-memory overview"""
+        self.assertEqual(self.stream.get_overview(), self.exact.get_overview())
+    
+    def test_statistics_match_in_memory(self):
+        """Test moments and small-sample quantiles are exact"""
+        stats = self.stream.get_statistics()
+        for col, expected in self.exact.get_statistics().items():
+            for key, value in expected.items():
+                self.assertAlmostEqual(stats[col][key], value, places=6)
+    
+    def test_correlation_and_column_stats(self):
+        """Test pairwise correlation and sketch-based column stats"""
+        corr = self.stream.get_correlation()
+        expected = self.exact.get_correlation()
+        self.assertAlmostEqual(corr['X']['Y'], expected['X']['Y'], places=10)
+        
+        stats = self.stream.get_column_stats('Z')
+        self.assertEqual(stats, self.exact.get_column_stats('Z'))
+    
+    def test_reservoir_and_bounds(self):
+        """Test the reservoir stays a sample and bounds cover every column"""
+        analyzer = StreamingAnalyzer(chunksize=7)
+        analyzer.update(pd.DataFrame({'x': np.arange(500.0), 's': ['a', 'b'] * 250}))
+        analyzer.loaded = True
+        profile = analyzer.approximate_profile(5)
+        
+        self.assertEqual(len(analyzer.sample.rows), 100)
+        self.assertTrue(analyzer.sample.rows['x'].is_unique)
+        self.assertEqual(set(profile['bounds']['columns']), {'x', 's'})
+        self.assertGreater(profile['bounds']['columns']['x']['quantile_rank_error'], 0)
+        summary = analyzer.column_summary('x')
+        self.assertLessEqual(summary['unique']['low'], 500)
+        self.assertGreaterEqual(summary['unique']['high'], 500)
+
+    def test_duplicate_rows_fall_back_to_sketch(self):
+        """Test duplicates are estimated, and labelled, past the fingerprint cap"""
+        df = pd.DataFrame({'x': np.arange(2000) % 1500, 's': ['a'] * 2000})
+        with mock.patch('streaming.MAX_ROW_FINGERPRINTS', 100):
+            analyzer = StreamingAnalyzer(chunksize=300)
+            analyzer.update(df)
+        analyzer.loaded = True
+        overview = analyzer.get_overview()
+
+        self.assertIsNone(analyzer._fingerprints)
+        self.assertTrue(overview['duplicate_rows_approximate'])
+        error = analyzer.error_bounds()['duplicate_rows_error']
+        self.assertLessEqual(abs(overview['duplicate_rows'] - 500), 3 * error)
+        self.assertNotIn('duplicate_rows_approximate', self.stream.get_overview())
+
+
+class TestRenderPool(unittest.TestCase):
+    """Test out-of-process chart rendering"""
+    
+    def setUp(self):
+        """Setup test data"""
+        self.test_dir = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.test_dir, 'test_data.csv')
+        pd.DataFrame({'A': range(50), 'B': range(50, 100)}).to_csv(self.csv_file, index=False)
+    
+    def tearDown(self):
+        """Clean up"""
+        shutil.rmtree(self.test_dir)
+    
+    def test_worker_renders_chart(self):
+        """Test a pre-warmed worker process renders the chart file"""
+        pool = RenderPool(workers=1, timeout=60)
+        try:
+            chart = pool.render(self.csv_file, 'data.csv', 'histogram', 'A', self.test_dir)
+        finally:
+            pool.shutdown()
+        
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, chart)))
+
+    def test_worker_charts_indexed_once_by_content_hash(self):
+        """Test the parent counts each worker chart once, under its cache key"""
+        cache = ChartCache()
+        pool = RenderPool(workers=1, timeout=60)
+        try:
+            with mock.patch('render_pool.chart_cache', cache):
+                first = pool.render(self.csv_file, 'data.csv', 'histogram', 'A', self.test_dir)
+                second = pool.render(self.csv_file, 'data.csv', 'histogram', 'A', self.test_dir)
+        finally:
+            pool.shutdown()
+
+        self.assertEqual(first, second)
+        self.assertEqual(list(cache._entries), [ChartCache.key_of(first)])
+        self.assertEqual(cache.current_bytes, os.path.getsize(os.path.join(self.test_dir, first)))
+
+        worker_cache = ChartCache(indexed=False)
+        worker_cache.add(ChartCache.key_of(first), os.path.join(self.test_dir, first))
+        self.assertEqual(worker_cache.stats()['entries'], 0)
+
+    def test_inline_batch_releases_lock_between_charts(self):
+        """Test a paused inline batch does not block other inline renders"""
+        pool = RenderPool(workers=0)
+        batch = pool.render_many(self.csv_file, 'data.csv',
+                                 [('histogram', 'A'), ('histogram', 'B')], self.test_dir)
+        self.assertIsNotNone(next(batch)[1])
+        
+        done = []
+        other = threading.Thread(target=lambda: done.append(
+            pool.render(self.csv_file, 'data.csv', 'boxplot', 'A', self.test_dir)))
+        other.start()
+        other.join(timeout=30)
+        self.assertTrue(done and done[0])
+        self.assertIsNotNone(next(batch)[1])
+    
+    def test_full_queue_rejects_jobs(self):
+        """Test backpressure when the queue is full"""
+        pool = RenderPool(workers=1, max_pending=1)
+        pool._slots.acquire()
+        
+        with self.assertRaises(RenderPoolBusy):
+            pool.submit(self.csv_file, 'data.csv', 'histogram', 'A', self.test_dir)
+
+
+class TestAggregation(unittest.TestCase):
+    """Test chart data reduction helpers"""
+    
+    def setUp(self):
+        """Setup test data"""
+        rng = np.random.default_rng(0)
+        self.y = np.cumsum(rng.normal(size=100000))
+        self.x = np.arange(len(self.y))
+    
+    def test_minmax_keeps_extremes(self):
+        """Test min/max decimation bounds output and keeps extremes"""
+        x, y = aggregation.minmax_decimate(self.x, self.y, buckets=500)
+        
+        self.assertLessEqual(len(y), 1000)
+        self.assertEqual(y.max(), self.y.max())
+        self.assertEqual(y.min(), self.y.min())
+    
+    def test_lttb_point_count(self):
+        """Test LTTB returns exactly the threshold with endpoints kept"""
+        x, y = aggregation.lttb(self.x, self.y, threshold=300)
+        
+        self.assertEqual(len(y), 300)
+        self.assertEqual(x[0], 0)
+        self.assertEqual(x[-1], len(self.y) - 1)
+        self.assertTrue(np.all(np.diff(x) > 0))
+    
+    def test_binned_kde_is_a_density(self):
+        """Test binned KDE integrates to one"""
+        values = np.random.default_rng(1).normal(size=5000)
+        edges = np.histogram_bin_edges(values, bins=30)
+        grid, density = aggregation.binned_kde(values, edges)
+        
+        self.assertAlmostEqual(np.trapz(density, grid), 1.0, places=2)
+    
+    def test_chart_data_payloads(self):
+        """Test pre-aggregated chart data is compact and JSON-safe"""
+        df = pd.DataFrame({'A': self.y, 'B': self.x % 7, 'C': (self.x % 3).astype(str)})
+        
+        hist = aggregation.chart_data(df, 'histogram', 'A')
+        self.assertEqual(sum(hist['counts']), len(df))
+        self.assertEqual(len(hist['edges']), 31)
+        box = aggregation.chart_data(df, 'boxplot', 'B')
+        self.assertEqual((box['q1'], box['median'], box['q3']), (1.0, 3.0, 5.0))
+        self.assertEqual(aggregation.chart_data(df, 'bar', 'C')['labels'], ['0', '1', '2'])
+        self.assertEqual(aggregation.chart_data(df, 'scatter', numeric_columns=['A', 'B'])['mode'], 'density')
+        self.assertLessEqual(len(aggregation.chart_data(df, 'line', 'A')['y']), aggregation.PIXEL_WIDTH)
+        json.dumps(aggregation.chart_data(df, 'correlation'), allow_nan=False)
+
+
+class TestCorrelation(unittest.TestCase):
+    """Test the blocked correlation engine"""
+    
+    def setUp(self):
+        """Setup test data"""
+        rng = np.random.default_rng(2)
+        self.df = pd.DataFrame(rng.normal(size=(500, 6)), columns=list('abcdef'))
+        self.df['g'] = 3 * self.df['a'] + rng.normal(size=500) * 0.1
+        self.df['h'] = 1.0
+        self.df['label'] = 'x'
+    
+    def test_matches_pandas(self):
+        """Test blocked Pearson and Spearman agree with DataFrame.corr()"""
+        numeric = self.df.drop(columns='label')
+        gappy = numeric.copy()
+        gappy.iloc[::7, 1] = np.nan
+        gappy.iloc[::5, 6] = np.nan
+        
+        cases = [(numeric, 'pearson'), (gappy, 'pearson'), (numeric, 'spearman')]
+        for frame, method in cases:
+            result = correlation.correlation_matrix(frame, method, block_rows=64)
+            pd.testing.assert_frame_equal(result, frame.corr(method=method), atol=1e-12)
+    
+    def test_pearson_memory_bounded_by_block(self):
+        """Test Pearson converts one block at a time, not the whole frame"""
+        frame = pd.DataFrame(np.random.default_rng(0).normal(size=(200_000, 8)).astype(np.float32))
+        tracemalloc.start()
+        try:
+            correlation.correlation_matrix(frame, block_rows=1000)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, frame.shape[0] * frame.shape[1] * 8 / 4)
+    
+    def test_top_pairs_and_heatmap(self):
+        """Test strongest pairs come first and wide heatmaps are cut"""
+        corr = correlation.correlation_matrix(self.df)
+        pairs = correlation.top_pairs(corr, 3)
+        
+        self.assertEqual((pairs[0]['x'], pairs[0]['y']), ('a', 'g'))
+        self.assertEqual(len(pairs), 3)
+        self.assertNotIn('h', [p['x'] for p in pairs] + [p['y'] for p in pairs])
+        shown = correlation.heatmap_matrix(corr, max_columns=4)
+        self.assertEqual(len(shown), 4)
+        self.assertIn('a', shown.columns)
+        self.assertEqual(list(shown.index), list(shown.columns))
+    
+    def test_shared_per_dataset_version(self):
+        """Test analyzers of one file version reuse the cached matrix"""
+        test_dir = tempfile.mkdtemp()
+        try:
+            csv_file = os.path.join(test_dir, 'wide.csv')
+            self.df.to_csv(csv_file, index=False)
+            cache = DatasetCache()
+            first = DataAnalyzer(csv_file, cache=cache).correlation_matrix()
+            second = DataAnalyzer(csv_file, cache=cache).correlation_matrix()
+            
+            self.assertIs(first, second)
+            self.assertEqual(DataAnalyzer(csv_file, cache=cache).get_top_correlations(1)[0]['y'], 'g')
+        finally:
+            shutil.rmtree(test_dir)
+
+
+class TestGrouping(unittest.TestCase):
+    """Test group-by aggregation"""
+    
+    def setUp(self):
+        """Setup test data"""
+        rng = np.random.default_rng(3)
+        n = 2000
+        self.df = pd.DataFrame({
+            'Dept': rng.choice(['Sales', 'IT', 'HR', None], n),
+            'Level': pd.Categorical(rng.choice(['junior', 'senior'], n)),
+            'Salary': rng.normal(50000, 8000, n).round(2),
+            'Age': rng.integers(20, 65, n),
+            'Joined': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730, n), unit='D')
+        })
+        self.df.loc[::13, 'Salary'] = np.nan
+    
+    def test_matches_pandas_groupby(self):
+        """Test every aggregation agrees with DataFrame.groupby()"""
+        funcs = ['count', 'sum', 'mean', 'min', 'max', 'median', 'std', 'nunique']
+        result = grouping.aggregate(self.df, {
+            'by': ['Dept', 'Level'],
+            'aggregations': {'Salary': funcs, 'Age': ['sum', 'max']}
+        })
+        expected = self.df.groupby(['Dept', 'Level'], observed=True).agg(
+            **{f'Salary_{f}': ('Salary', f) for f in funcs},
+            Age_sum=('Age', 'sum'), Age_max=('Age', 'max')).reset_index()
+        
+        self.assertEqual(list(result['Dept']), list(expected['Dept']))
+        self.assertEqual(list(result['Level']), list(expected['Level']))
+        pd.testing.assert_frame_equal(result.iloc[:, 2:], expected.iloc[:, 2:],
+                                      check_dtype=False, atol=1e-6)
+    
+    def test_time_buckets_pivot_and_sort(self):
+        """Test monthly buckets, pivoted columns and top-N sorting"""
+        monthly = grouping.aggregate(self.df, {
+            'bucket': {'column': 'Joined', 'freq': 'month'},
+            'pivot': 'Level',
+            'aggregations': {'Salary': ['count']}
+        })
+        self.assertEqual(len(monthly), 24)
+        self.assertEqual(list(monthly.columns), ['Joined', 'junior', 'senior'])
+        self.assertEqual(monthly[['junior', 'senior']].to_numpy().sum(), self.df['Salary'].count())
+        
+        top = grouping.aggregate(self.df, {'by': 'Dept', 'sort': 'count', 'limit': 2})
+        self.assertEqual(len(top), 2)
+        self.assertEqual(top['count'].iloc[0], self.df['Dept'].value_counts().iloc[0])
+        with self.assertRaises(ValueError):
+            grouping.aggregate(self.df, {'by': 'Dept', 'aggregations': {'Dept': ['mean']}})
+        with self.assertRaises(ValueError):
+            grouping.parse_query({'by': 'Dept', 'limit': -1})
+
+    def test_integer_sum_stays_exact(self):
+        """Test integer sums past 2**53 are not rounded through float64"""
+        big = 2**53 + 1
+        df = pd.DataFrame({'k': ['a', 'a', 'b'], 'v': np.array([big, 2, 1], dtype=np.int64)})
+        result = grouping.aggregate(df, {'by': 'k', 'aggregations': {'v': 'sum'}})
+        
+        self.assertEqual(list(result['v_sum']), [big + 2, 1])
+    
+    def test_analyzer_caches_per_query(self):
+        """Test repeated queries on one file version reuse the cached result"""
+        test_dir = tempfile.mkdtemp()
+        try:
+            csv_file = os.path.join(test_dir, 'staff.csv')
+            self.df.to_csv(csv_file, index=False)
+            cache = DatasetCache()
+            query = {'by': 'Dept', 'aggregations': {'Salary': 'mean'}}
+            first = DataAnalyzer(csv_file, cache=cache).aggregate(query)
+            second = DataAnalyzer(csv_file, cache=cache).aggregate(dict(query))
+            pivot = DataAnalyzer(csv_file, cache=cache).pivot('Dept', 'Level', 'Age', 'max')
+            
+            self.assertIs(first, second)
+            self.assertEqual(list(pivot.columns), ['Dept', 'junior', 'senior'])
+        finally:
+            shutil.rmtree(test_dir)
+
+
+class TestMetrics(unittest.TestCase):
+    """Test the metrics registry and stage timing"""
+    
+    def test_histogram_render(self):
+        """Test histograms render as cumulative Prometheus buckets"""
+        registry = metrics.MetricsRegistry()
+        for value in (0.002, 0.02, 3.0):
+            registry.observe('stage_duration_seconds', value, stage='parse')
+        registry.inc('bytes_read_total', 100, source='csv')
+        text = registry.render()
+        
+        self.assertIn('stage_duration_seconds_bucket{stage="parse",le="0.0025"} 1', text)
+        self.assertIn('stage_duration_seconds_bucket{stage="parse",le="0.025"} 2', text)
+        self.assertIn('stage_duration_seconds_bucket{stage="parse",le="+Inf"} 3', text)
+        self.assertIn('stage_duration_seconds_count{stage="parse"} 3', text)
+        self.assertIn('bytes_read_total{source="csv"} 100', text)
+    
+    def test_request_trace_collects_stages(self):
+        """Test stages timed during a request are attached to its trace"""
+        trace = metrics.RequestTrace()
+        with metrics.timed('resolve'):
+            pass
+        
+        @metrics.timed('build')
+        def build():
+            return 1
+        
+        build()
+        trace.finish('GET', '/x', 200)
+        with metrics.timed('after'):
+            pass
+        self.assertEqual([stage for stage, _ in trace.stages], ['resolve', 'build'])
+
+
+class TestLogging(unittest.TestCase):
+    """Test the queued, rate-limited logging configuration"""
+    
+    def tearDown(self):
+        logconfig.configure_logging(mode=logconfig.LOG_MODE, rate=logconfig.LOG_RATE)
+    
+    def test_rate_limit_filter(self):
+        """Test repeated lines are limited per template while warnings pass"""
+        limiter = logconfig.RateLimitFilter(rate=0.001, burst=3)
+        
+        def record(msg, level=logging.INFO):
+            return logging.LogRecord('app', level, __file__, 1, msg, ('x',), None)
+        
+        passed = [limiter.filter(record('GET /analysis/%s')) for _ in range(10)]
+        self.assertEqual(sum(passed), 3)
+        self.assertTrue(limiter.filter(record('GET /api/rows/%s')))
+        self.assertTrue(all(limiter.filter(record('⚠ %s', logging.WARNING)) for _ in range(10)))
+        self.assertEqual(limiter.suppressed, 7)
+    
+    def test_production_mode(self):
+        """Test production mode rate-limits info lines but keeps every warning"""
+        stream = io.StringIO()
+        logconfig.configure_logging(mode='production', stream=stream, rate=0.001)
+        log = logging.getLogger('test_production_mode')
+        for _ in range(50):
+            log.info('GET /analysis/%s', 'x.csv')
+        for _ in range(20):
+            log.warning('⚠ File not found: %s', 'x.csv')
+        log.debug('Not written')
+        logconfig.shutdown_logging()
+        lines = stream.getvalue().splitlines()
+        
+        self.assertEqual(sum('GET /analysis/x.csv' in line for line in lines), logconfig.LOG_BURST)
+        self.assertEqual(sum('File not found' in line for line in lines), 20)
+        self.assertNotIn('Not written', stream.getvalue())
+        self.assertRegex(lines[0], r'^\d{4}-\d{2}-\d{2} .* INFO test_production_mode: ')
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Test the synthetic dataset generator and baseline comparison"""
+    
+    def setUp(self):
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+        self.test_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        sys.path.pop(0)
+        shutil.rmtree(self.test_dir)
+    
+    def test_synthetic_dataset(self):
+        """Test generated datasets follow their spec and are reproducible"""
+        import synthetic
+        spec = synthetic.DatasetSpec(rows=2000, numeric=4, categorical=1, datetime=1,
+                                     cardinality=7, null_rate=0.1, seed=3)
+        first = synthetic.dataset(self.test_dir, spec)
+        second = synthetic.generate_csv(os.path.join(self.test_dir, 'again.csv'), spec)
+        df = pd.read_csv(first)
+        
+        with open(first, 'rb') as a, open(second, 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+        self.assertEqual(df.shape, (2000, 6))
+        self.assertEqual(df['cat_0'].nunique(), 7)
+        self.assertEqual(df['float_0'].isna().sum(), 0)
+        self.assertAlmostEqual(df['int_1'].isna().mean(), 0.1, delta=0.03)
+    
+    def test_baseline_comparison(self):
+        """Test slowdowns beyond the tolerance are flagged as regressions"""
+        import run as bench
+        baseline = {'results': [
+            {'id': 'a[10]', 'median_seconds': 1.0, 'peak_bytes': 100},
+            {'id': 'b[10]', 'median_seconds': 1.0, 'peak_bytes': 100}]}
+        results = [
+            {'id': 'a[10]', 'median_seconds': 1.1, 'peak_bytes': 100},
+            {'id': 'b[10]', 'median_seconds': 1.0, 'peak_bytes': 200},
+            {'id': 'c[10]', 'median_seconds': 9.0, 'peak_bytes': 100}]
+        regressions = bench.compare(results, baseline, tolerance=0.25)
+        
+        self.assertEqual([record['id'] for record in regressions], ['b[10]'])
+        self.assertAlmostEqual(results[0]['time_ratio'], 1.1)
+        self.assertNotIn('time_ratio', results[2])
+
+
+class TestIngest(unittest.TestCase):
+    """Test streaming upload ingest"""
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.test_dir, 'upload.csv')
+        df = pd.DataFrame({
+            'a': np.arange(300),
+            'b': np.linspace(0, 1, 300),
+            'c': ['say "hi"\nthen; stop' if i % 7 == 0 else f'v{i}' for i in range(300)]
+        })
+        self.raw = df.to_csv(index=False, sep=';').encode()
+        self.parse_bytes = ingest.PARSE_BYTES
+        ingest.PARSE_BYTES = 256
+    
+    def tearDown(self):
+        ingest.PARSE_BYTES = self.parse_bytes
+        shutil.rmtree(self.test_dir)
+    
+    def test_incremental_parse_matches_full_read(self):
+        """Test batches split on record boundaries, including quoted newlines"""
+        upload = ingest.ingest_upload(io.BytesIO(self.raw), self.filepath, 10**9)
+        
+        self.assertEqual(upload.options['sep'], ';')
+        expected = DataAnalyzer(self.filepath, cache=None).df
+        pd.testing.assert_frame_equal(upload.frame, expected)
+    
+    def test_large_upload_is_streamed(self):
+        """Test uploads over the frame limit are summarized, not kept"""
+        upload = ingest.ingest_upload(io.BytesIO(self.raw), self.filepath, 1000)
+        
+        self.assertIsNone(upload.frame)
+        self.assertEqual(upload.analyzer.get_overview()['rows'], 300)
+    
+    def test_identical_upload_is_deduplicated(self):
+        """Test re-uploading the same bytes keeps the stored file"""
+        first = ingest.ingest_upload(io.BytesIO(self.raw), self.filepath, 10**9)
+        mtime = os.stat(self.filepath).st_mtime_ns
+        second = ingest.ingest_upload(io.BytesIO(self.raw), self.filepath, 10**9)
+        
+        self.assertEqual(first.sha256, second.sha256)
+        self.assertTrue(second.unchanged)
+        self.assertEqual(os.stat(self.filepath).st_mtime_ns, mtime)
+        self.assertEqual(len(os.listdir(os.path.join(self.test_dir, '.blobs'))), 1)
+
+
+class TestIncrementalAppend(unittest.TestCase):
+    """Test appending rows with stored summaries"""
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.test_dir, 'daily.csv')
+        pd.DataFrame({'day': [1, 2, 3], 'sales': [10.0, 12.5, 9.0],
+                      'region': ['N', 'S', 'N']}).to_csv(self.csv_file, index=False)
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+    
+    def test_append_matches_full_recompute(self):
+        """Test summaries after appends equal a pass over the whole file"""
+        # A second link stands in for a deduplicated upload blob
+        os.link(self.csv_file, os.path.join(self.test_dir, 'blob.csv'))
+        append_rows(self.csv_file, b'day,sales,region\n4,11.0,S\n5,,E\n')
+        analyzer, added = append_rows(self.csv_file, b'day,sales,region\n1,10.0,N\n')
+        
+        self.assertEqual(added, 1)
+        self.assertEqual(len(pd.read_csv(os.path.join(self.test_dir, 'blob.csv'))), 3)
+        full = DataAnalyzer(self.csv_file, cache=None)
+        overview = analyzer.get_overview()
+        self.assertEqual(overview['rows'], 6)
+        self.assertEqual(overview['duplicate_rows'], full.get_overview()['duplicate_rows'])
+        self.assertEqual(overview['missing_values'], full.get_overview()['missing_values'])
+        self.assertAlmostEqual(analyzer.get_statistics()['sales']['mean'],
+                               full.get_statistics()['sales']['mean'])
+        self.assertIsNotNone(SummaryStore.load(self.csv_file))
+    
+    def test_append_keeps_text_columns_text(self):
+        """Test zero-padded codes appended to a text column are not read as numbers"""
+        with open(self.csv_file, 'w') as f:
+            f.write('code,n\n02134,1\n02134,2\nA1,3\n')
+        analyzer, _ = append_rows(self.csv_file, b'code,n\n02134,4\n02134,5\n')
+        full = StreamingAnalyzer(self.csv_file)
+        
+        self.assertEqual(analyzer.get_column_stats('code'), full.get_column_stats('code'))
+        self.assertEqual(analyzer.get_column_stats('code')['value_counts'], {'02134': 4, 'A1': 1})
+        self.assertEqual(analyzer.get_overview(), full.get_overview())
+    
+    def test_append_text_into_numeric_column_restreams(self):
+        """Test text appended to a numeric column gives the summaries of a full pass"""
+        analyzer, added = append_rows(self.csv_file, b'day,sales,region\nfive,11.0,S\n')
+        full = StreamingAnalyzer(self.csv_file)
+        
+        self.assertEqual(added, 1)
+        self.assertEqual(analyzer.dtypes['day'], object)
+        self.assertEqual(analyzer.get_column_stats('day'), full.get_column_stats('day'))
+        self.assertEqual(analyzer.get_numeric_columns(), full.get_numeric_columns())
+    
+    def test_mismatched_columns_rejected(self):
+        """Test appends must carry the dataset's columns"""
+        with self.assertRaises(ValueError):
+            append_rows(self.csv_file, b'day,revenue\n4,1\n')
+        self.assertEqual(len(pd.read_csv(self.csv_file)), 3)
+
+
+class TestJobManager(unittest.TestCase):
+    """Test background job queue"""
+    
+    def test_job_reports_result_and_errors(self):
+        """Test jobs record progress, results and failures"""
+        manager = JobManager(max_workers=1)
+        
+        def work(job, value):
+            job.progress('working', 50)
+            if value is None:
+                raise ValueError('no value')
+            return value * 2
+        
+        ok, failed = manager.submit(work, 21), manager.submit(work, None)
+        manager._executor.shutdown(wait=True)
+        
+        self.assertEqual(manager.get(ok)['result'], 42)
+        self.assertEqual(manager.get(ok)['status'], 'done')
+        self.assertEqual(manager.get(failed)['status'], 'failed')
+        self.assertEqual(manager.get(failed)['error'], 'no value')
+        self.assertIsNone(manager.get('missing'))
+    
+    def test_queue_full(self):
+        """Test submissions beyond the queue bound are rejected"""
+        manager = JobManager(max_workers=1, max_queued=1)
+        release = threading.Event()
+        manager.submit(lambda job: release.wait())
+        
+        with self.assertRaises(JobQueueFull):
+            manager.submit(lambda job: None)
+        release.set()
 
 
 class TestFlaskApp(unittest.TestCase):
@@ -122,6 +1003,9 @@ class TestFlaskApp(unittest.TestCase):
         self.app = app
         self.client = self.app.test_client()
         self.app.config['TESTING'] = True
+        self.app.config['RENDER_WORKERS'] = 0
+        self.upload_folder = self.app.config['UPLOAD_FOLDER']
+        self.chart_folder = self.app.config['CHART_FOLDER']
         
         # Create test CSV
         self.test_dir = tempfile.mkdtemp()
@@ -136,6 +1020,8 @@ class TestFlaskApp(unittest.TestCase):
     
     def tearDown(self):
         """Clean up"""
+        self.app.config['UPLOAD_FOLDER'] = self.upload_folder
+        self.app.config['CHART_FOLDER'] = self.chart_folder
         shutil.rmtree(self.test_dir)
     
     def test_home_page(self):
@@ -151,11 +1037,382 @@ class TestFlaskApp(unittest.TestCase):
         data = json.loads(response.data)
         self.assertEqual(data['status'], 'healthy')
     
+    def test_metrics_endpoint(self):
+        """Test request, stage and cache metrics are exposed for Prometheus"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        self.client.get('/api/correlations/test_data.csv')
+        response = self.client.get('/metrics')
+        text = response.get_data(as_text=True)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('route="/api/correlations/<filename>"', text)
+        self.assertIn('stage_duration_seconds_count{stage="resolve"}', text)
+        self.assertIn('cache_hit_ratio{cache="dataset"}', text)
+    
+    def test_slow_request_profile(self):
+        """Test slow requests leave a cProfile report when profiling is on"""
+        self.app.config['PROFILE_SLOW_REQUESTS'] = True
+        self.app.config['SLOW_REQUEST_SECONDS'] = 0
+        self.app.config['PROFILE_DIR'] = self.test_dir
+        try:
+            self.client.get('/health')
+        finally:
+            self.app.config['PROFILE_SLOW_REQUESTS'] = False
+            self.app.config['SLOW_REQUEST_SECONDS'] = metrics.SLOW_REQUEST_SECONDS
+        reports = [name for name in os.listdir(self.test_dir) if name.endswith('.txt')]
+        
+        self.assertEqual(len(reports), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, reports[0][:-4] + '.prof')))
+    
+    def test_default_upload_cap_allows_streaming(self):
+        """Test the default upload cap admits files large enough to be streamed"""
+        code = ("from app import app; "
+                "print(app.config['MAX_CONTENT_LENGTH'] > app.config['STREAMING_THRESHOLD'])")
+        env = {k: v for k, v in os.environ.items()
+               if k not in ('MAX_FILE_SIZE', 'STREAMING_THRESHOLD')}
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+        self.assertEqual(result.stdout.strip(), 'True')
+        self.assertIn(b'Max file size: 4.0 GiB', self.client.get('/').data)
+    
     def test_upload_no_file(self):
         """Test upload with no file"""
         response = self.client.post('/upload')
         self.assertEqual(response.status_code, 400)
     
+    def test_upload_writes_columnar_copy(self):
+        """Test upload analyzes the file and stores a columnar copy"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        with open(self.csv_file, 'rb') as f:
+            response = self.client.post('/upload', data={'file': (f, 'upload.csv')})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['overview']['rows'], 5)
+        self.assertIsNotNone(ColumnarStore.open(os.path.join(self.test_dir, 'upload.csv')))
+    
+    def test_large_upload_writes_columnar_copy(self):
+        """Test uploads above the streaming threshold also get a columnar copy"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        threshold = self.app.config['STREAMING_THRESHOLD']
+        self.app.config['STREAMING_THRESHOLD'] = 10
+        try:
+            with open(self.csv_file, 'rb') as f:
+                response = self.client.put('/upload/large.csv', data=f.read())
+        finally:
+            self.app.config['STREAMING_THRESHOLD'] = threshold
+        
+        self.assertEqual(response.status_code, 200)
+        store = ColumnarStore.open(os.path.join(self.test_dir, 'large.csv'))
+        self.assertIsNotNone(store)
+        self.assertEqual(store.to_frame()['C'].tolist(), ['x', 'y', 'z', 'x', 'y'])
+    
+    def test_streaming_upload(self):
+        """Test a raw request body upload is analyzed like a form upload"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        with open(self.csv_file, 'rb') as f:
+            response = self.client.put('/upload/raw.csv', data=f.read())
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['overview']['rows'], 5)
+        self.assertEqual(self.client.put('/upload/raw.txt', data=b'x').status_code, 400)
+    
+    def test_approximate_mode(self):
+        """Test approx mode serves sketch estimates with error bounds"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        response = self.client.get('/analysis/test_data.csv?mode=approx')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Approximate mode', response.data)
+        
+        data = json.loads(self.client.get('/api/columns/test_data.csv/B/stats?mode=approx').data)
+        self.assertEqual(data['mode'], 'approx')
+        self.assertEqual(data['stats']['unique']['estimate'], 5)
+        self.assertEqual(data['stats']['quantiles']['50%'], 30)
+        self.assertEqual(data['stats']['quantile_rank_error'], 0.0)
+        
+        exact = json.loads(self.client.get('/api/columns/test_data.csv/C/stats').data)
+        self.assertEqual(exact['mode'], 'exact')
+        self.assertEqual(exact['stats']['unique'], 3)
+        self.assertEqual(self.client.get('/api/columns/test_data.csv/Z/stats').status_code, 404)
+    
+    def test_column_filter_endpoint(self):
+        """Test filter queries return the count and a page of matching rows"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        response = self.client.get('/api/columns/test_data.csv/B/filter?op=ge&value=30&limit=2')
+        data = json.loads(response.data)
+        
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['row_ids'], [2, 3])
+        self.assertEqual([row['B'] for row in data['rows']], [30, 40])
+        top = json.loads(self.client.get('/api/columns/test_data.csv/C/top?n=1').data)
+        self.assertEqual(top['top'], [{'value': 'x', 'count': 2}])
+        none = json.loads(self.client.get('/api/columns/test_data.csv/C/top?n=-1').data)
+        self.assertEqual(none['top'], [])
+        bad = self.client.get('/api/columns/test_data.csv/B/filter?op=like&value=1')
+        self.assertEqual(bad.status_code, 400)
+    
+    def test_rows_endpoint(self):
+        """Test row windows come back as one array per column"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        data = json.loads(self.client.get('/api/rows/test_data.csv?offset=3&limit=5&columns=C,A').data)
+        
+        self.assertEqual(data['total_rows'], 5)
+        self.assertEqual(data['columns'], ['C', 'A'])
+        self.assertEqual(data['data'], {'C': ['x', 'y'], 'A': [4, 5]})
+        missing = self.client.get('/api/rows/test_data.csv?columns=Z')
+        self.assertEqual(missing.status_code, 404)
+    
+    def test_rows_seek_into_large_file(self):
+        """Test windows of a large file without a columnar copy seek to indexed rows"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        with open(self.csv_file, 'w') as f:
+            f.write('A,C\n' + ''.join(f'{i},"v\n{i}"\n' for i in range(25)))
+        threshold, step = self.app.config['STREAMING_THRESHOLD'], rows.ROW_INDEX_STEP
+        self.app.config['STREAMING_THRESHOLD'] = 10
+        rows.ROW_INDEX_STEP = 4
+        try:
+            self.assertEqual(rows.row_offsets(self.csv_file, 4)[:2], [4, 36])
+            for offset in (0, 3, 9, 24):
+                data = json.loads(self.client.get(f'/api/rows/test_data.csv?offset={offset}&limit=3').data)
+                self.assertEqual(data['data']['A'], list(range(offset, min(offset + 3, 25))))
+                self.assertEqual(data['data']['C'][0], f'v\n{offset}')
+            data = json.loads(self.client.get('/api/rows/test_data.csv?offset=40').data)
+            self.assertEqual(data['data']['A'], [])
+        finally:
+            self.app.config['STREAMING_THRESHOLD'] = threshold
+            rows.ROW_INDEX_STEP = step
+    
+    def test_correlations_endpoint(self):
+        """Test the strongest correlated pairs are listed"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        data = json.loads(self.client.get('/api/correlations/test_data.csv?method=spearman').data)
+        
+        self.assertEqual(data['pairs'], [{'x': 'A', 'y': 'B', 'r': 1.0}])
+        bad = self.client.get('/api/correlations/test_data.csv?method=kendall')
+        self.assertEqual(bad.status_code, 400)
+    
+    def test_aggregate_endpoint(self):
+        """Test group-by results come back as column arrays with a chart"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        self.app.config['CHART_FOLDER'] = self.test_dir
+        response = self.client.post('/api/aggregate', json={
+            'filename': 'test_data.csv', 'by': ['C'],
+            'aggregations': {'A': ['sum'], 'B': ['max']}, 'chart': 'bar'})
+        data = json.loads(response.data)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['data'], {'C': ['x', 'y', 'z'], 'A_sum': [5, 7, 3], 'B_max': [40, 50, 30]})
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, data['chart'])))
+        bad = self.client.post('/api/aggregate', json={
+            'filename': 'test_data.csv', 'by': ['C'], 'aggregations': {'A': ['mode']}})
+        self.assertEqual(bad.status_code, 400)
+    
+    def test_aggregate_chart_timeout(self):
+        """Test a timed-out aggregate chart answers 504, not 400"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        self.app.config['CHART_FOLDER'] = self.test_dir
+        payload = {'filename': 'test_data.csv', 'by': ['C'],
+                   'aggregations': {'A': ['sum']}, 'chart': 'bar'}
+        with mock.patch.object(RenderPool, 'render', side_effect=TimeoutError()):
+            response = self.client.post('/api/aggregate', json=payload)
+        
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(json.loads(response.data)['error'], 'Chart generation timed out')
+    
+    def test_append_endpoint(self):
+        """Test appended rows show up in the dataset overview"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        response = self.client.post('/api/datasets/test_data.csv/append',
+                                    data=b'A,B,C\n6,60,z\n7,70,x\n')
+        data = json.loads(response.data)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['appended_rows'], 2)
+        self.assertEqual(data['overview']['rows'], 7)
+        self.assertEqual(self.client.post('/api/datasets/missing.csv/append',
+                                          data=b'A\n1\n').status_code, 404)
+    
+    def test_append_keeps_exact_profile(self):
+        """Test the analysis profile after an append is computed from the data, not sketches"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        rng = np.random.default_rng(0)
+        pd.DataFrame({'A': rng.standard_normal(5000)}).to_csv(self.csv_file, index=False)
+        rows = '\n'.join(f'{v:.6f}' for v in rng.standard_normal(50))
+        response = self.client.post('/api/datasets/test_data.csv/append',
+                                    data=f'A\n{rows}\n'.encode())
+        self.assertEqual(json.loads(response.data)['overview']['rows'], 5050)
+        
+        exact = DataAnalyzer(self.csv_file, cache=None).get_statistics()
+        profile = app_module.get_profile(self.csv_file)
+        for stat in ('25%', '50%', '75%'):
+            self.assertAlmostEqual(profile['statistics']['A'][stat], exact['A'][stat])
+    
+    def test_async_upload_job(self):
+        """Test async upload returns a job that finishes with the overview"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        self.app.config['CHART_FOLDER'] = self.test_dir
+        with open(self.csv_file, 'rb') as f:
+            response = self.client.post('/upload', data={'file': (f, 'upload.csv'), 'async': '1'})
+        self.assertEqual(response.status_code, 202)
+        status_url = json.loads(response.data)['status_url']
+        
+        for _ in range(200):
+            job = json.loads(self.client.get(status_url).data)
+            if job['status'] in ('done', 'failed'):
+                break
+            time.sleep(0.05)
+        
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['result']['overview']['rows'], 5)
+        self.assertTrue(job['result']['charts'])
+        self.assertEqual(self.client.get('/api/jobs/unknown').status_code, 404)
+    
+    def test_analysis_page(self):
+        """Test analysis page renders from the profile"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        response = self.client.get('/analysis/test_data.csv')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Statistical Summary', response.data)
+    
+    def test_visualize_serves_cached_chart(self):
+        """Test repeated chart requests return the same cached file"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        self.app.config['CHART_FOLDER'] = self.test_dir
+        payload = {'filename': 'test_data.csv', 'chart_type': 'histogram', 'column': 'A'}
+        first = json.loads(self.client.post('/api/visualize', json=payload).data)
+        second = json.loads(self.client.post('/api/visualize', json=payload).data)
+        
+        self.assertEqual(first['status'], 'success')
+        self.assertEqual(first['chart'], second['chart'])
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, first['chart'])))
+    
+    def test_visualize_chart_data(self):
+        """Test data format returns aggregated JSON instead of a PNG"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        payload = {'filename': 'test_data.csv', 'chart_type': 'histogram',
+                   'column': 'B', 'format': 'data'}
+        data = json.loads(self.client.post('/api/visualize', json=payload).data)
+        
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(data['data']['type'], 'histogram')
+        self.assertEqual(sum(data['data']['counts']), 5)
+    
+    def test_visualize_page_request(self):
+        """Test the analysis page's server-render request still gets a JSON file name"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        self.app.config['CHART_FOLDER'] = self.test_dir
+        payload = {'filename': 'test_data.csv', 'chart_type': 'histogram',
+                   'column': 'A', 'format': 'image'}
+        response = self.client.post('/api/visualize', json=payload)
+        
+        self.assertEqual(response.mimetype, 'application/json')
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'success')
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, data['chart'])))
+    
+    def test_client_charts_escape_dataset_text(self):
+        """Test the page escapes dataset labels and column names it draws as SVG"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        page = self.client.get('/analysis/test_data.csv').data.decode()
+        
+        self.assertIn('${escapeHtml(title)}', page)
+        self.assertIn('${escapeHtml(d.labels[i])}', page)
+        self.assertIn('${escapeHtml(data.error)}', page)
+        self.assertNotIn('>${d.labels[i]}<', page)
+    
+    def test_visualize_image_in_memory(self):
+        """Test image format returns the encoded chart without storing it"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        self.app.config['CHART_FOLDER'] = self.test_dir
+        payload = {'filename': 'test_data.csv', 'chart_type': 'histogram', 'column': 'A',
+                   'format': 'bytes', 'image_format': 'webp'}
+        response = self.client.post('/api/visualize', json=payload)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/webp')
+        self.assertEqual(response.data[8:12], b'WEBP')
+        self.assertEqual(os.listdir(self.test_dir), ['test_data.csv'])
+        payload['image_format'] = 'bmp'
+        self.assertEqual(self.client.post('/api/visualize', json=payload).status_code, 400)
+    
+    def test_conditional_requests(self):
+        """Test repeat requests with a current ETag get 304 until the data changes"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        url = '/api/rows/test_data.csv?limit=2'
+        first = self.client.get(url)
+        etag = first.headers['ETag']
+        
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers['Cache-Control'], 'no-cache')
+        self.assertIsNotNone(first.last_modified)
+        repeat = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.data, b'')
+        other = self.client.get('/api/rows/test_data.csv?limit=3', headers={'If-None-Match': etag})
+        self.assertEqual(other.status_code, 200)
+        
+        with open(self.csv_file, 'a') as f:
+            f.write('6,60,z\n')
+        changed = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+    
+    def test_compressed_analysis(self):
+        """Test large HTML responses are gzipped and still revalidate"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        response = self.client.get('/analysis/test_data.csv',
+                                   headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertIn(b'test_data.csv', gzip.decompress(response.data))
+        repeat = self.client.get('/analysis/test_data.csv',
+                                 headers={'If-None-Match': response.headers['ETag'],
+                                          'Accept-Encoding': 'gzip'})
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.headers['ETag'], response.headers['ETag'])
+        self.assertTrue(response.headers['ETag'].endswith('-gzip"'))
+        plain = self.client.get('/analysis/test_data.csv')
+        self.assertNotIn('Content-Encoding', plain.headers)
+    
+    def test_chart_immutable(self):
+        """Test content-addressed chart files are served as immutable"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        payload = {'filename': 'test_data.csv', 'chart_type': 'histogram', 'column': 'B'}
+        chart = json.loads(self.client.post('/api/visualize', json=payload).data)['chart']
+        try:
+            response = self.client.get(f'/static/images/{chart}')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('immutable', response.headers['Cache-Control'])
+            response.close()
+        finally:
+            os.remove(os.path.join(self.chart_folder, chart))
+    
+    def test_batch_visualize(self):
+        """Test batch endpoint renders every requested chart"""
+        self.app.config['UPLOAD_FOLDER'] = self.test_dir
+        self.app.config['CHART_FOLDER'] = self.test_dir
+        payload = {'filename': 'test_data.csv', 'charts': [
+            {'chart_type': 'histogram', 'column': 'A'},
+            {'chart_type': 'bogus', 'column': 'A'},
+            {'chart_type': 'correlation'}
+        ]}
+        data = json.loads(self.client.post('/api/visualize/batch', json=payload).data)
+        
+        self.assertEqual([r['index'] for r in data['charts']], [0, 1, 2])
+        self.assertEqual(data['charts'][0]['status'], 'success')
+        self.assertIn('error', data['charts'][1])
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, data['charts'][2]['chart'])))
+        
+        payload['stream'] = True
+        response = self.client.post('/api/visualize/batch', json=payload)
+        lines = response.data.decode().strip().split('\n')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(len(lines), 3)
+    
     def test_404_error(self):
         """Test 404 error handling"""
         response = self.client.get('/nonexistent')
@@ -191,11 +1448,75 @@ class TestDataVisualizer(unittest.TestCase):
         self.assertIsNotNone(result)
         self.assertTrue(os.path.exists(os.path.join(self.test_dir, result)))
     
+    def test_aggregate_chart_creation(self):
+        """Test line chart of an aggregation"""
+        query = {'by': 'Z', 'aggregations': {'X': ['mean'], 'Y': ['mean']}}
+        result = self.visualizer.aggregate_chart(query, 'line', 'test_agg.png')
+        self.assertIsNotNone(result)
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, result)))
+    
+    def test_plotting_loads_on_first_render(self):
+        """Test importing the app leaves matplotlib and seaborn unloaded"""
+        code = "import sys, app; print(any(m in sys.modules for m in ('matplotlib', 'seaborn')))"
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.stdout.strip(), 'False')
+    
+    def test_chart_cache_reuses_rendered_file(self):
+        """Test identical chart requests are served from the cache"""
+        cache = ChartCache()
+        visualizer = DataVisualizer(self.df, output_dir=self.test_dir, cache=cache,
+                                    dataset_version='v1', dataset='data.csv')
+        first = visualizer.histogram('X', 'hist.png')
+        second = visualizer.histogram('X', 'hist.png')
+        
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, 'hist.png')
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+        
+        visualizer.dataset_version = 'v2'
+        self.assertNotEqual(visualizer.histogram('X', 'hist.png'), first)
+        cache.invalidate('data.csv')
+        self.assertEqual(os.listdir(self.test_dir), [])
+    
+    def test_large_charts_render_from_aggregates(self):
+        """Test scatter, line and distribution charts on many rows"""
+        big = pd.DataFrame({'X': np.random.rand(20000), 'Y': np.random.rand(20000)})
+        visualizer = DataVisualizer(big, output_dir=self.test_dir)
+        
+        for result in [visualizer.scatter_plot('X', 'Y', 'big_scatter.png'),
+                       visualizer.line_chart('X', 'big_line.png'),
+                       visualizer.distribution_plot('X', 'big_dist.png')]:
+            self.assertIsNotNone(result)
+            self.assertTrue(os.path.exists(os.path.join(self.test_dir, result)))
+    
     def test_boxplot_creation(self):
         """Test box plot creation"""
         result = self.visualizer.box_plot('X', 'test_boxplot.png')
         self.assertIsNotNone(result)
         self.assertTrue(os.path.exists(os.path.join(self.test_dir, result)))
+    
+    def test_image_formats(self):
+        """Test the file extension picks the encoder and no pyplot figures leak"""
+        import visualizer
+        signatures = {'png': b'\x89PNG', 'jpg': b'\xff\xd8\xff', 'svg': b'<?xml', 'webp': b'RIFF'}
+        for ext, signature in signatures.items():
+            result = self.visualizer.box_plot('X', f'box.{ext}')
+            with open(os.path.join(self.test_dir, result), 'rb') as f:
+                self.assertEqual(f.read(len(signature)), signature)
+        self.assertEqual(visualizer.plt.get_fignums(), [])
+        with self.assertRaises(ValueError):
+            DataVisualizer(self.df, output_dir=self.test_dir, image_format='bmp')
+    
+    def test_in_memory_chart(self):
+        """Test charts are returned as bytes when there is no output folder"""
+        visualizer = DataVisualizer(self.df, output_dir=None, image_format='svg')
+        result = visualizer.bar_chart('Z')
+        
+        self.assertIsInstance(result, bytes)
+        self.assertIn(b'<svg', result[:500])
+        self.assertEqual(os.listdir(self.test_dir), [])
 
 
 if __name__ == '__main__':
@@ -1,178 +1,508 @@
-import matplotlib
-
-matplotlib.use("Agg")
 # visualizer.py - Data Visualization Module
 
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# import pandas as pd
+import io
 import numpy as np
 import logging
 import os
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+import aggregation
+import correlation
+import grouping
+from cache import dataset_cache
+from metrics import timed
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump when chart styling changes so cached images are re-rendered
+STYLE_VERSION = 4
+
+# Above these sizes charts are drawn from aggregated data, not raw rows
+MAX_SCATTER_POINTS = aggregation.MAX_SCATTER_POINTS
+MAX_LINE_POINTS = 2 * aggregation.PIXEL_WIDTH
+# Bar charts of aggregations show at most this many groups
+MAX_BAR_GROUPS = 50
+
+# Output formats, by file extension, and their encoder settings
+IMAGE_FORMATS = {
+    "png": "png",
+    "webp": "webp",
+    "jpg": "jpeg",
+    "jpeg": "jpeg",
+    "svg": "svg",
+}
+MIMETYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "svg": "image/svg+xml",
+}
+# Format of charts whose file name is not given
+CHART_FORMAT = os.environ.get("CHART_FORMAT", "png")
+DPI = 100
+# zlib level 1 encodes several times faster than the default 6, for
+# files about a fifth larger
+PNG_COMPRESS_LEVEL = int(os.environ.get("PNG_COMPRESS_LEVEL", 1))
+JPEG_QUALITY = int(os.environ.get("JPEG_QUALITY", 85))
+WEBP_QUALITY = int(os.environ.get("WEBP_QUALITY", 80))
+# WebP encoder effort, 0 (fastest) to 6 (smallest)
+WEBP_METHOD = int(os.environ.get("WEBP_METHOD", 2))
+# Figures kept per thread for reuse, one per figure size
+MAX_CACHED_FIGURES = 8
+
+# Set by load_plotting() on first render
+plt = sns = Figure = FigureCanvasAgg = None
+_plotting_lock = threading.Lock()
+_figures = threading.local()
+
+
+def load_plotting():
+    """Import the plotting stack and apply the chart style, once per process
+
+    Importing matplotlib and seaborn takes longer than most renders, so it
+    waits for the first chart that is not served from the cache, or for a
+    pre-warm hook in a renderer process.
+    """
+    global plt, sns, Figure, FigureCanvasAgg
+    with _plotting_lock:
+        if plt is None:
+            with timed("plotting_import"):
+                import matplotlib
+
+                matplotlib.use("Agg")
+                import matplotlib.pyplot as pyplot
+                import seaborn
+                from matplotlib.figure import Figure as figure
+                from matplotlib.backends.backend_agg import FigureCanvasAgg as canvas
+
+                seaborn.set_style("whitegrid")
+                pyplot.rcParams["figure.figsize"] = (10, 6)
+                Figure, FigureCanvasAgg = figure, canvas
+                plt, sns = pyplot, seaborn
+            logger.info("✓ Plotting libraries loaded")
+    return plt
+
+
+def image_format(filename):
+    """Output format named by a chart file name's extension
+
+    Raises ValueError for an extension that is not an image format.
+    """
+    ext = os.path.splitext(filename)[1].lower().lstrip(".")
+    if ext not in IMAGE_FORMATS:
+        raise ValueError(f"Invalid image format: {ext or filename}")
+    return IMAGE_FORMATS[ext]
+
+
+def _encoder_options(fmt):
+    if fmt == "png":
+        return {"pil_kwargs": {"compress_level": PNG_COMPRESS_LEVEL}}
+    if fmt == "jpeg":
+        return {"pil_kwargs": {"quality": JPEG_QUALITY, "optimize": False}}
+    if fmt == "webp":
+        return {"pil_kwargs": {"quality": WEBP_QUALITY, "method": WEBP_METHOD}}
+    return {}
+
+
+def _figure(width, height):
+    """A blank figure with an Agg canvas, reused by this thread's later charts
+
+    Reusing a figure of the same size keeps its canvas and pixel buffer,
+    and avoids pyplot's global figure registry altogether.
+    """
+    figures = getattr(_figures, "by_size", None)
+    if figures is None:
+        figures = _figures.by_size = OrderedDict()
+    size = (round(width, 2), round(height, 2))
+    fig = figures.pop(size, None)
+    if fig is None:
+        fig = Figure(figsize=size, dpi=DPI)
+        FigureCanvasAgg(fig)
+    else:
+        fig.clear()
+    figures[size] = fig
+    while len(figures) > MAX_CACHED_FIGURES:
+        figures.popitem(last=False)
+    return fig
+
+
+def _text_inches(labels, fontsize=10):
+    """Approximate rendered width of the longest label"""
+    longest = max((len(str(label)) for label in labels), default=0)
+    return longest * fontsize * 0.6 / 72
+
+
+def _layout(fig, left=0.9, right=0.3, bottom=0.7, top=0.6):
+    """Place the axes with margins given in inches
+
+    Margins are computed from the labels before drawing, which saves the
+    extra draw pass that ``bbox_inches="tight"`` makes at save time.
+    """
+    width, height = fig.get_size_inches()
+    fig.subplots_adjust(
+        left=min(left / width, 0.45),
+        right=1 - right / width,
+        bottom=min(bottom / height, 0.45),
+        top=1 - top / height,
+    )
+
+
+def cached_chart(chart_type):
+    """Serve a chart method from the visualizer's chart cache when possible
+
+    The method's bound arguments (columns and render options), the output
+    format and the dataset version form the cache key. The key is appended
+    to the output file name, so a hit returns the existing file without
+    calling matplotlib. Without a file name, the chart is written in the
+    visualizer's image format.
+    """
+
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            named = "filename" in bound.arguments
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            del arguments["self"]
+            filename = arguments.pop("filename")
+            if not named:
+                stem = os.path.splitext(filename)[0]
+                filename = f"{stem}.{self.image_format}"
+            fmt = image_format(filename)
+
+            if self.cache is None or self.output_dir is None:
+                load_plotting()
+                with timed(f"chart.{chart_type}"):
+                    return method(self, filename=filename, **arguments)
+
+            version = [self.dataset_version, STYLE_VERSION]
+            key = self.cache.key(version, chart_type, dict(arguments, format=fmt))
+            stem, ext = os.path.splitext(filename)
+            filename = f"{stem}_{key}{ext}"
+            filepath = os.path.join(self.output_dir, filename)
+
+            if self.cache.lookup(key, filepath, self.dataset):
+                logger.debug("✓ Chart cache hit: %s", filename)
+                return filename
+
+            load_plotting()
+            with timed(f"chart.{chart_type}"):
+                result = method(self, filename=filename, **arguments)
+            if result:
+                self.cache.add(key, filepath, self.dataset)
+            return result
+
+        return wrapper
+
+    return decorator
+
 
 class DataVisualizer:
-    """Class for creating data visualizations"""
+    """Class for creating data visualizations
+
+    Chart methods write an image to ``output_dir`` and return its file
+    name. With ``output_dir=None`` nothing is written and they return the
+    encoded image bytes instead. The file name's extension picks the
+    format (png, webp, jpg or svg); ``image_format`` is used when no file
+    name is given.
+    """
 
-    def __init__(self, df, output_dir="static/images/"):
+    def __init__(
+        self,
+        df,
+        output_dir="static/images/",
+        cache=None,
+        dataset_version=None,
+        dataset=None,
+        image_format=CHART_FORMAT,
+    ):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Invalid image format: {image_format}")
         self.df = df
         self.output_dir = output_dir
-        sns.set_style("whitegrid")
-        plt.rcParams["figure.figsize"] = (10, 6)
+        self.cache = cache
+        self.dataset_version = dataset_version
+        self.dataset = dataset
+        self.image_format = image_format
 
         # Create output directory if it doesn't exist
-        os.makedirs(output_dir, exist_ok=True)
-        logger.info(f"✓ Visualizer initialized. Output: {output_dir}")
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+        logger.debug("✓ Visualizer initialized. Output: %s", output_dir)
+
+    def _result_cache(self):
+        """Cache for results computed from the frame, when it mirrors a file"""
+        if self.dataset and os.path.exists(self.dataset):
+            return dataset_cache
+        return None
+
+    def _save(self, fig, filename):
+        """Encode fig in filename's format; returns filename, or the bytes in memory"""
+        fmt = image_format(filename)
+        if self.output_dir is None:
+            target = io.BytesIO()
+        else:
+            target = os.path.join(self.output_dir, filename)
+        with timed("encode"):
+            fig.savefig(target, format=fmt, dpi=DPI, **_encoder_options(fmt))
+        return target.getvalue() if self.output_dir is None else filename
 
+    @cached_chart("histogram")
     def histogram(self, column, filename="histogram.png"):
         """Create histogram"""
         try:
-            plt.figure(figsize=(10, 6))
-            self.df[column].hist(bins=30, edgecolor="black", color="skyblue")
-            plt.title(f"Histogram of {column}", fontsize=14, fontweight="bold")
-            plt.xlabel(column)
-            plt.ylabel("Frequency")
-            plt.grid(True, alpha=0.3)
-
-            filepath = os.path.join(self.output_dir, filename)
-            plt.savefig(filepath, dpi=100, bbox_inches="tight")
-            plt.close()
+            fig = _figure(10, 6)
+            ax = fig.add_subplot()
+            values = self.df[column].dropna().to_numpy(dtype=np.float64)
+            counts, edges = aggregation.histogram(values, bins=30)
+            ax.hist(
+                edges[:-1],
+                bins=edges,
+                weights=counts,
+                edgecolor="black",
+                color="skyblue",
+            )
+            ax.set_title(f"Histogram of {column}", fontsize=14, fontweight="bold")
+            ax.set_xlabel(column)
+            ax.set_ylabel("Frequency")
+            ax.grid(True, alpha=0.3)
+            _layout(fig)
 
-            logger.info(f"✓ Histogram saved: {filename}")
-            return filename
+            result = self._save(fig, filename)
+            logger.info("✓ Histogram saved: %s", filename)
+            return result
         except Exception as e:
-            logger.error(f"✗ Error creating histogram: {str(e)}")
+            logger.error("✗ Error creating histogram: %s", e)
             return None
 
+    @cached_chart("scatter")
     def scatter_plot(self, x_col, y_col, filename="scatter.png"):
         """Create scatter plot"""
         try:
-            plt.figure(figsize=(10, 6))
-            plt.scatter(self.df[x_col], self.df[y_col], alpha=0.6, color="coral")
-            plt.xlabel(x_col, fontsize=12)
-            plt.ylabel(y_col, fontsize=12)
-            plt.title(f"{x_col} vs {y_col}", fontsize=14, fontweight="bold")
-            plt.grid(True, alpha=0.3)
-
-            filepath = os.path.join(self.output_dir, filename)
-            plt.savefig(filepath, dpi=100, bbox_inches="tight")
-            plt.close()
+            fig = _figure(10, 6)
+            ax = fig.add_subplot()
+            x = self.df[x_col].to_numpy(dtype=np.float64)
+            y = self.df[y_col].to_numpy(dtype=np.float64)
+            if len(x) > MAX_SCATTER_POINTS:
+                # Too many points to see individually: draw point density
+                counts, xedges, yedges = aggregation.density_grid(x, y)
+                mesh = ax.pcolormesh(
+                    xedges, yedges, np.ma.masked_equal(counts.T, 0), cmap="OrRd"
+                )
+                fig.colorbar(mesh, ax=ax, label="Points")
+            else:
+                ax.scatter(x, y, alpha=0.6, color="coral")
+            ax.set_xlabel(x_col, fontsize=12)
+            ax.set_ylabel(y_col, fontsize=12)
+            ax.set_title(f"{x_col} vs {y_col}", fontsize=14, fontweight="bold")
+            ax.grid(True, alpha=0.3)
+            _layout(fig, right=0.6)
 
-            logger.info(f"✓ Scatter plot saved: {filename}")
-            return filename
+            result = self._save(fig, filename)
+            logger.info("✓ Scatter plot saved: %s", filename)
+            return result
         except Exception as e:
-            logger.error(f"✗ Error creating scatter plot: {str(e)}")
+            logger.error("✗ Error creating scatter plot: %s", e)
             return None
 
-    def correlation_heatmap(self, filename="heatmap.png"):
-        """Create correlation heatmap"""
+    @cached_chart("correlation")
+    def correlation_heatmap(self, filename="heatmap.png", method="pearson"):
+        """Create correlation heatmap
+
+        Wide tables are cut to their most correlated columns, ordered so
+        that correlated columns sit together, and drawn without labels.
+        """
         try:
-            numeric_df = self.df.select_dtypes(include=[np.number])
-            if numeric_df.empty:
+            cache = self._result_cache()
+            corr = correlation.dataset_correlation(self.dataset, self.df, method, cache)
+            if corr.empty:
                 logger.warning("⚠ No numeric columns for heatmap")
                 return None
 
-            plt.figure(figsize=(10, 8))
+            total = len(corr)
+            corr = correlation.heatmap_matrix(corr)
+            annotate = len(corr) <= correlation.MAX_ANNOTATED_COLUMNS
+            side = 8 if annotate else min(8 + 0.2 * len(corr), 16)
+            # Room for the row and (vertical) column labels around the square
+            labels = _text_inches(corr.columns)
+            fig = _figure(side + 2 + labels, side + labels)
+            ax = fig.add_subplot()
             sns.heatmap(
-                numeric_df.corr(),
-                annot=True,
+                corr,
+                ax=ax,
+                annot=annotate,
+                fmt=".2f",
                 cmap="coolwarm",
                 center=0,
+                vmin=-1,
+                vmax=1,
                 square=True,
-                linewidths=1,
+                linewidths=1 if annotate else 0,
             )
-            plt.title("Correlation Heatmap", fontsize=14, fontweight="bold")
-
-            filepath = os.path.join(self.output_dir, filename)
-            plt.savefig(filepath, dpi=100, bbox_inches="tight")
-            plt.close()
+            title = "Correlation Heatmap"
+            if len(corr) < total:
+                title += f" ({len(corr)} of {total} columns)"
+            ax.set_title(title, fontsize=14, fontweight="bold")
+            _layout(fig, left=labels + 0.4, right=0.4, bottom=labels + 0.4)
 
-            logger.info(f"✓ Heatmap saved: {filename}")
-            return filename
+            result = self._save(fig, filename)
+            logger.info("✓ Heatmap saved: %s", filename)
+            return result
         except Exception as e:
-            logger.error(f"✗ Error creating heatmap: {str(e)}")
+            logger.error("✗ Error creating heatmap: %s", e)
             return None
 
+    @cached_chart("boxplot")
     def box_plot(self, column, filename="boxplot.png"):
         """Create box plot"""
         try:
-            plt.figure(figsize=(10, 6))
-            self.df[column].plot(kind="box", figsize=(10, 6))
-            plt.title(f"Box Plot of {column}", fontsize=14, fontweight="bold")
-            plt.ylabel(column)
-            plt.grid(True, alpha=0.3)
+            fig = _figure(10, 6)
+            ax = fig.add_subplot()
+            self.df[column].plot(kind="box", ax=ax)
+            ax.set_title(f"Box Plot of {column}", fontsize=14, fontweight="bold")
+            ax.set_ylabel(column)
+            ax.grid(True, alpha=0.3)
+            _layout(fig)
 
-            filepath = os.path.join(self.output_dir, filename)
-            plt.savefig(filepath, dpi=100, bbox_inches="tight")
-            plt.close()
-
-            logger.info(f"✓ Box plot saved: {filename}")
-            return filename
+            result = self._save(fig, filename)
+            logger.info("✓ Box plot saved: %s", filename)
+            return result
         except Exception as e:
-            logger.error(f"✗ Error creating box plot: {str(e)}")
+            logger.error("✗ Error creating box plot: %s", e)
             return None
 
+    @cached_chart("line")
     def line_chart(self, column, filename="line_chart.png"):
         """Create line chart"""
         try:
-            plt.figure(figsize=(12, 6))
-            self.df[column].plot(figsize=(12, 6), color="green", linewidth=2)
-            plt.title(f"Line Chart of {column}", fontsize=14, fontweight="bold")
-            plt.ylabel(column)
-            plt.xlabel("Index")
-            plt.grid(True, alpha=0.3)
-
-            filepath = os.path.join(self.output_dir, filename)
-            plt.savefig(filepath, dpi=100, bbox_inches="tight")
-            plt.close()
+            fig = _figure(12, 6)
+            ax = fig.add_subplot()
+            y = self.df[column].to_numpy(dtype=np.float64)
+            x = np.arange(len(y))
+            if len(y) > MAX_LINE_POINTS:
+                keep = ~np.isnan(y)
+                x, y = aggregation.minmax_decimate(x[keep], y[keep])
+            ax.plot(x, y, color="green", linewidth=2)
+            ax.set_title(f"Line Chart of {column}", fontsize=14, fontweight="bold")
+            ax.set_ylabel(column)
+            ax.set_xlabel("Index")
+            ax.grid(True, alpha=0.3)
+            _layout(fig)
 
-            logger.info(f"✓ Line chart saved: {filename}")
-            return filename
+            result = self._save(fig, filename)
+            logger.info("✓ Line chart saved: %s", filename)
+            return result
         except Exception as e:
-            logger.error(f"✗ Error creating line chart: {str(e)}")
+            logger.error("✗ Error creating line chart: %s", e)
             return None
 
+    @cached_chart("bar")
     def bar_chart(self, column, filename="bar_chart.png"):
         """Create bar chart for categorical data"""
         try:
-            plt.figure(figsize=(12, 6))
+            fig = _figure(12, 6)
+            ax = fig.add_subplot()
             value_counts = self.df[column].value_counts().head(10)
-            value_counts.plot(kind="bar", color="purple", alpha=0.7)
-            plt.title(f"Bar Chart of {column}", fontsize=14, fontweight="bold")
-            plt.ylabel("Count")
-            plt.xlabel(column)
-            plt.xticks(rotation=45)
-            plt.grid(True, alpha=0.3, axis="y")
+            value_counts.plot(kind="bar", ax=ax, color="purple", alpha=0.7)
+            ax.set_title(f"Bar Chart of {column}", fontsize=14, fontweight="bold")
+            ax.set_ylabel("Count")
+            ax.set_xlabel(column)
+            ax.tick_params(axis="x", labelrotation=45)
+            ax.grid(True, alpha=0.3, axis="y")
+            # Labels rotated by 45 degrees reach down ~0.7 of their length
+            _layout(fig, bottom=0.8 + 0.7 * _text_inches(value_counts.index))
 
-            filepath = os.path.join(self.output_dir, filename)
-            plt.savefig(filepath, dpi=100, bbox_inches="tight")
-            plt.close()
-
-            logger.info(f"✓ Bar chart saved: {filename}")
-            return filename
+            result = self._save(fig, filename)
+            logger.info("✓ Bar chart saved: %s", filename)
+            return result
         except Exception as e:
-            logger.error(f"✗ Error creating bar chart: {str(e)}")
+            logger.error("✗ Error creating bar chart: %s", e)
             return None
 
+    @cached_chart("distribution")
     def distribution_plot(self, column, filename="distribution.png"):
         """Create distribution plot"""
         try:
-            plt.figure(figsize=(10, 6))
-            sns.histplot(self.df[column], kde=True, color="blue", alpha=0.6)
-            plt.title(f"Distribution of {column}", fontsize=14, fontweight="bold")
-            plt.xlabel(column)
-            plt.grid(True, alpha=0.3)
+            fig = _figure(10, 6)
+            ax = fig.add_subplot()
+            values = self.df[column].dropna().to_numpy(dtype=np.float64)
+            edges = np.histogram_bin_edges(values, bins="auto")
+            if len(edges) > 201:
+                edges = np.histogram_bin_edges(values, bins=200)
+            counts, edges = aggregation.histogram(values, bins=edges)
+            ax.hist(
+                edges[:-1],
+                bins=edges,
+                weights=counts,
+                color="blue",
+                alpha=0.6,
+                edgecolor="white",
+            )
+            grid, density = aggregation.binned_kde(values, edges)
+            if grid is not None:
+                inside = (grid >= edges[0]) & (grid <= edges[-1])
+                # Scale the density to the histogram's count axis
+                scale = len(values) * (edges[1] - edges[0])
+                ax.plot(grid[inside], density[inside] * scale, color="blue")
+            ax.set_ylabel("Count")
+            ax.set_title(f"Distribution of {column}", fontsize=14, fontweight="bold")
+            ax.set_xlabel(column)
+            ax.grid(True, alpha=0.3)
+            _layout(fig)
 
-            filepath = os.path.join(self.output_dir, filename)
-            plt.savefig(filepath, dpi=100, bbox_inches="tight")
-            plt.close()
+            result = self._save(fig, filename)
+            logger.info("✓ Distribution plot saved: %s", filename)
+            return result
+        except Exception as e:
+            logger.error("✗ Error creating distribution plot: %s", e)
+            return None
+
+    @cached_chart("aggregate")
+    def aggregate_chart(self, query, kind="bar", filename="aggregate.png"):
+        """Create a bar or line chart of a group-by aggregation
+
+        ``query`` is a grouping.aggregate() query; every output column is
+        drawn as one series against the group keys. Bar charts show the
+        first MAX_BAR_GROUPS groups in the query's order.
+        """
+        try:
+            cache = self._result_cache()
+            result = grouping.cached_aggregate(self.dataset, self.df, query, cache)
+            keys = grouping.key_columns(grouping.parse_query(query))
+            if kind == "bar":
+                result = result.head(MAX_BAR_GROUPS)
+            if len(keys) > 1:
+                labels = result[keys].astype(str).agg(" / ".join, axis=1)
+            else:
+                labels = result[keys[0]]
+            values = result.drop(columns=keys).set_index(labels)
+
+            fig = _figure(12, 6)
+            ax = fig.add_subplot()
+            values.plot(kind=kind, ax=ax, alpha=0.8, legend=values.shape[1] > 1)
+            ax.set_title(
+                f"{', '.join(map(str, values.columns[:3]))} by {', '.join(keys)}",
+                fontsize=14,
+                fontweight="bold",
+            )
+            ax.set_xlabel(" / ".join(keys))
+            ax.grid(True, alpha=0.3, axis="y")
+            bottom = 0.8
+            if kind == "bar":
+                ax.tick_params(axis="x", labelrotation=45)
+                for label in ax.get_xticklabels():
+                    label.set_horizontalalignment("right")
+                bottom += 0.7 * _text_inches(labels)
+            _layout(fig, bottom=bottom)
 
-            logger.info(f"✓ Distribution plot saved: {filename}")
-            return filename
+            output = self._save(fig, filename)
+            logger.info("✓ Aggregate chart saved: %s", filename)
+            return output
         except Exception as e:
-            logger.error(f"✗ Error creating distribution plot: {str(e)}")
+            logger.error("✗ Error creating aggregate chart: %s", e)
             return None